@@ -0,0 +1,73 @@
+"""Measure what perceptual clustering costs over the plain RGB path.
+
+Usage:
+    python benchmarks/bench_color_space.py [--megapixels 2] [--colors 6] [--repeat 3]
+
+Reports raw conversion throughput for each color space and the end-to-end
+time of sampled K-means (fit plus the full-image assignment pass), with
+the overhead relative to RGB.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import photographic_image  # noqa: E402
+from palette_core import (  # noqa: E402
+    COLOR_SPACES, KMEANS_SAMPLE_SIZE, KMEANS_SAMPLE_METHOD, extract_colors_kmeans, to_color_space
+)
+
+
+def median_seconds(func, repeat):
+    """Median wall time of repeat calls to func"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def median_stats(func, repeat, keys):
+    """Median of each stats entry in keys over repeat calls to func(stats)"""
+    runs = []
+    for _ in range(repeat):
+        stats = {}
+        func(stats)
+        runs.append(stats)
+    return {key: statistics.median(run[key] for run in runs) for key in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=2)
+    parser.add_argument("--colors", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    img_array = np.asarray(photographic_image(args.megapixels))
+    pixels = img_array.reshape((-1, 3))
+    # Warm up scikit-learn so the first timed space does not pay for the import
+    extract_colors_kmeans(img_array[:64, :64], args.colors)
+
+    print(f"{len(pixels):,} pixels, {args.colors} colors, median of {args.repeat}")
+    print(f"{'space':<8}{'convert (s)':>12}{'Mpx/s':>9}{'fit (s)':>9}{'assign (s)':>12}{'total (s)':>11}{'vs rgb':>9}")
+    rgb_seconds = None
+    for color_space in COLOR_SPACES:
+        convert = median_seconds(lambda: to_color_space(pixels, color_space), args.repeat)
+        timings = median_stats(lambda stats: extract_colors_kmeans(
+            img_array, args.colors, sample_size=KMEANS_SAMPLE_SIZE, sample_method=KMEANS_SAMPLE_METHOD,
+            color_space=color_space, stats=stats), args.repeat, ("fit_seconds", "assign_seconds", "seconds"))
+        rgb_seconds = rgb_seconds or timings["seconds"]
+        print(f"{color_space:<8}{convert:>12.3f}{len(pixels) / convert / 1e6:>9.0f}"
+              f"{timings['fit_seconds']:>9.3f}{timings['assign_seconds']:>12.3f}"
+              f"{timings['seconds']:>11.3f}{timings['seconds'] / rgb_seconds - 1:>+9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure what one rerun of the app costs: script time and browser payload.
+
+Usage:
+    python benchmarks/bench_rerun.py                  # 12-color palette, 10 reruns
+    python benchmarks/bench_rerun.py --colors 6 --repeat 20
+
+The app runs headless under Streamlit's AppTest with a palette already
+extracted, then reruns as if the user had clicked a widget. Every
+ForwardMsg the script produces is captured, so the report shows the
+number of delta messages and their serialized size, which is what goes
+over the websocket on each interaction. Deltas are also grouped by the
+st.fragment that produced them: an interaction inside a fragment (picking
+a harmony color, changing the export format) resends only that group.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import local_script_runner  # noqa: E402
+
+from benchmarks.corpus import generate  # noqa: E402
+from palette_core import build_palette_tree, PALETTE_TREE_MAX_COLORS  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "wild_pick_2.py")
+
+
+class MessageRecorder:
+    """Keep the ForwardMsgs of the most recent script run"""
+
+    def __init__(self):
+        self.messages = []
+        self._parse = local_script_runner.parse_tree_from_messages
+        local_script_runner.parse_tree_from_messages = self._record
+
+    def _record(self, messages):
+        self.messages = list(messages)
+        return self._parse(messages)
+
+    def payload(self):
+        """(delta message count, serialized delta bytes) of the last run"""
+        deltas = [msg for msg in self.messages if msg.WhichOneof("type") == "delta"]
+        return len(deltas), sum(msg.ByteSize() for msg in deltas)
+
+    def fragment_payloads(self):
+        """{fragment id: (delta count, bytes)} for deltas drawn inside fragments"""
+        payloads = {}
+        for msg in self.messages:
+            if msg.WhichOneof("type") == "delta" and msg.delta.fragment_id:
+                count, size = payloads.get(msg.delta.fragment_id, (0, 0))
+                payloads[msg.delta.fragment_id] = (count + 1, size + msg.ByteSize())
+        return payloads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--colors", type=int, default=PALETTE_TREE_MAX_COLORS, help="Palette size shown (default: 12)")
+    parser.add_argument("--repeat", type=int, default=10, help="Reruns to time (default: 10)")
+    args = parser.parse_args(argv)
+
+    image = np.asarray(generate("noisy-photo", 0.25))
+    tree = build_palette_tree(image)
+
+    recorder = MessageRecorder()
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    app.run()
+    app.session_state["palette_tree"] = tree
+    app.slider[0].set_value(args.colors).run()
+    # Open the Harmony Playground so its fragment is measured with content
+    [button for button in app.button if button.label.startswith("Select")][0].click().run()
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    if app.exception:
+        print(app.exception[0].message)
+        return 1
+
+    count, size = recorder.payload()
+    print(f"Rerun with a {args.colors}-color palette ({args.repeat} runs)")
+    print(f"  script time   median {statistics.median(timings) * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms")
+    print(f"  delta msgs    {count}")
+    print(f"  payload       {size / 1024:.1f} KB")
+    for count, size in sorted(recorder.fragment_payloads().values(), reverse=True):
+        print(f"  fragment      {count} delta msgs, {size / 1024:.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Compare full-pixel K-means against unique-color weighted K-means.
+
+Usage:
+    python benchmarks/bench_unique_colors.py [--megapixels 0.5] [--colors 6]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import photographic_image, flat_vector_image, screenshot_image  # noqa: E402
+from palette_core import extract_colors_kmeans, extract_colors_unique  # noqa: E402
+
+
+def time_call(func, *args, **kwargs):
+    """Run func once and return (result, seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=0.5)
+    parser.add_argument("--colors", type=int, default=6)
+    args = parser.parse_args()
+
+    generators = [
+        ("photographic", photographic_image),
+        ("flat-vector", flat_vector_image),
+        ("screenshot", screenshot_image),
+    ]
+
+    print(f"{'input':<14}{'pixels':>10}{'unique':>10}{'full (s)':>10}{'unique (s)':>12}{'speedup':>9}{'max dE':>8}")
+    for name, generator in generators:
+        image = generator(args.megapixels)
+        stats = {}
+        full, full_seconds = time_call(extract_colors_kmeans, image, args.colors)
+        compact, unique_seconds = time_call(extract_colors_unique, image, args.colors, stats=stats)
+
+        # Largest RGB distance from each full-fit color to its closest unique-fit color
+        full_centers = np.array([color for color, _ in full], dtype=np.float64)
+        compact_centers = np.array([color for color, _ in compact], dtype=np.float64)
+        distances = np.linalg.norm(full_centers[:, None] - compact_centers[None], axis=-1)
+        max_distance = distances.min(axis=1).max()
+
+        print(f"{name:<14}{stats['total_pixels']:>10,}{stats['unique_colors']:>10,}"
+              f"{full_seconds:>10.2f}{unique_seconds:>12.2f}{full_seconds / unique_seconds:>8.1f}x{max_distance:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Deterministic synthetic images for the extraction benchmarks.
+
+Every generator takes a size in megapixels and a seed and always returns
+the same image, so timings are comparable across runs and machines
+without shipping test assets. Large images are generated in row bands to
+keep peak memory close to the size of the final uint8 image.
+"""
+import numpy as np
+from PIL import Image, ImageDraw
+
+BAND_ROWS = 256
+
+
+def image_size(megapixels):
+    """Width and height of a 4:3 image with the given pixel count"""
+    width = int(np.sqrt(megapixels * 1_000_000 * 4 / 3))
+    return width, int(width * 3 / 4)
+
+
+def gradient_image(megapixels, seed=0):
+    """Smooth two-axis gradient with no noise"""
+    width, height = image_size(megapixels)
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    array = np.empty((height, width, 3), dtype=np.uint8)
+    for top in range(0, height, BAND_ROWS):
+        y = np.linspace(top / height, min(height, top + BAND_ROWS) / height,
+                        min(BAND_ROWS, height - top), endpoint=False, dtype=np.float32)[:, None]
+        array[top:top + BAND_ROWS, :, 0] = 40 + 200 * x
+        array[top:top + BAND_ROWS, :, 1] = 30 + 180 * y
+        array[top:top + BAND_ROWS, :, 2] = 220 - 160 * (x + y) / 2
+    return Image.fromarray(array)
+
+
+def photographic_image(megapixels, seed=0):
+    """Smooth gradients plus sensor-like noise: almost every pixel is a distinct color"""
+    width, height = image_size(megapixels)
+    rng = np.random.default_rng(seed)
+    x = np.arange(width, dtype=np.float32)[None, :]
+    array = np.empty((height, width, 3), dtype=np.uint8)
+    for top in range(0, height, BAND_ROWS):
+        y = np.arange(top, min(height, top + BAND_ROWS), dtype=np.float32)[:, None]
+        base = np.stack(np.broadcast_arrays(
+            128 + 100 * np.sin(x / width * 3.1),
+            128 + 100 * np.cos(y / height * 2.3),
+            128 + 80 * np.sin((x + y) / (width + height) * 5.0),
+        ), axis=-1)
+        noise = rng.normal(0, 10, base.shape).astype(np.float32)
+        array[top:top + len(y)] = np.clip(base + noise, 0, 255)
+    return Image.fromarray(array)
+
+
+def flat_vector_image(megapixels, seed=0):
+    """A handful of flat shapes with anti-aliased edges, like brand artwork"""
+    width, height = image_size(megapixels)
+    rng = np.random.default_rng(seed)
+    # Draw at 2x and downsample for anti-aliasing, capped so 50 MP stays affordable
+    scale = 2 if megapixels <= 12 else 1
+    canvas = Image.new("RGB", (width * scale, height * scale), (250, 248, 240))
+    draw = ImageDraw.Draw(canvas)
+    palette = [(214, 87, 69), (26, 26, 26), (0, 122, 204), (243, 156, 18), (46, 204, 113)]
+    for i in range(12):
+        x0, y0 = rng.integers(0, width * scale, 2)
+        size = rng.integers(width * scale // 16, width * scale // 4)
+        shape = draw.ellipse if i % 2 else draw.rectangle
+        shape([x0, y0, x0 + size, y0 + size], fill=palette[i % len(palette)])
+    if scale == 1:
+        return canvas
+    return canvas.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def screenshot_image(megapixels, seed=0):
+    """UI-like panels on a light background with small dark glyph noise"""
+    width, height = image_size(megapixels)
+    rng = np.random.default_rng(seed)
+    array = np.full((height, width, 3), 255, dtype=np.uint8)
+    array[: height // 12] = (36, 41, 46)
+    array[height // 12:, : width // 5] = (246, 248, 250)
+    for top in range(height // 8, height, height // 10):
+        array[top:top + height // 40, width // 4: width - width // 10] = (225, 228, 232)
+    for top in range(0, height, BAND_ROWS):
+        band = array[top:top + BAND_ROWS]
+        glyphs = rng.random(band.shape[:2]) < 0.03
+        band[glyphs] = rng.choice([20, 60, 90], size=(glyphs.sum(), 1)).astype(np.uint8)
+    return Image.fromarray(array)
+
+
+def alpha_logo_image(megapixels, seed=0):
+    """Logo on a fully transparent background, as exported from design tools"""
+    logo = flat_vector_image(megapixels, seed).convert("RGBA")
+    width, height = logo.size
+    alpha = Image.new("L", (width, height), 0)
+    ImageDraw.Draw(alpha).ellipse([width // 5, height // 5, width * 4 // 5, height * 4 // 5], fill=255)
+    logo.putalpha(alpha)
+    return logo
+
+
+GENERATORS = {
+    "gradient": gradient_image,
+    "flat-logo": flat_vector_image,
+    "noisy-photo": photographic_image,
+    "screenshot": screenshot_image,
+    "alpha-png": alpha_logo_image,
+}
+
+
+def generate(name, megapixels, seed=0):
+    """Build one corpus image by generator name"""
+    return GENERATORS[name](megapixels, seed)
@@ -0,0 +1,127 @@
+"""Measure cold-start import cost per dependency with `python -X importtime`.
+
+Usage:
+    python benchmarks/import_time.py                 # app shell report and budget check
+    python benchmarks/import_time.py --budget-ms 1500 --repeat 5
+
+Each measurement runs in a fresh interpreter. The app shell run executes
+the top-level import statements of wild_pick_2.py, read from its source,
+so the measurement follows the app as its imports change. Each lazy
+dependency (scikit-learn, ColorThief, reportlab) is then loaded on top
+of the shell, to show what it costs on first use. Time is attributed to
+a package by summing the self time of every module under it. The exit
+status is 1 when the shell goes over budget or pulls in a lazy dependency.
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SCRIPT = os.path.join(REPO_ROOT, "wild_pick_2.py")
+
+# Loaded only when their engine or exporter is first used
+LAZY_IMPORTS = {
+    "sklearn": "sklearn.cluster",
+    "colorthief": "colorthief",
+    "reportlab": "reportlab.platypus",
+}
+
+# Packages the shell must never import (SciPy and joblib arrive with scikit-learn)
+FORBIDDEN_IN_SHELL = {"sklearn", "scipy", "joblib", "colorthief", "reportlab"}
+
+
+def app_shell_imports(path=APP_SCRIPT):
+    """Source of the module-level import statements of the app script
+
+    These run before the app renders anything; imports inside functions are
+    the lazy ones and are left out.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(statements):
+    """Run import statements in a fresh interpreter and return the parsed importtime rows"""
+    code = "\n".join(statements)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def cost_by_package(rows):
+    """Total self time in milliseconds per top-level package"""
+    totals = defaultdict(float)
+    for name, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us / 1000
+    return dict(totals)
+
+
+def best_of(statements, repeat):
+    """Per-package minimum over several runs, to filter out disk-cache noise"""
+    best = {}
+    for _ in range(repeat):
+        for package, ms in cost_by_package(measure(statements)).items():
+            best[package] = min(ms, best.get(package, ms))
+    return best
+
+
+def print_table(title, costs, top):
+    """Print the most expensive packages of one measurement"""
+    print(f"\n{title}: {sum(costs.values()):.0f} ms total")
+    for package, ms in sorted(costs.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<28}{ms:>9.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if the app shell imports take longer")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement (default: 3)")
+    parser.add_argument("--top", type=int, default=15, help="Packages listed per table (default: 15)")
+    args = parser.parse_args(argv)
+
+    shell_imports = app_shell_imports()
+    shell = best_of(shell_imports, args.repeat)
+    print_table("App shell", shell, args.top)
+
+    print("\nFirst use of lazy dependencies (on top of the shell):")
+    for name, module in LAZY_IMPORTS.items():
+        with_dependency = best_of(shell_imports + [f"import {module}"], args.repeat)
+        # Everything the dependency adds, including what it pulls in transitively
+        extra = {package: ms for package, ms in with_dependency.items() if package not in shell}
+        heaviest = sorted((package for package in extra if package != name), key=lambda package: -extra[package])
+        pulled_in = ", ".join(f"{package} {extra[package]:.0f} ms" for package in heaviest[:4])
+        print(f"  {name:<28}{sum(extra.values()):>9.1f} ms  ({module}{'; incl. ' + pulled_in if pulled_in else ''})")
+
+    failed = False
+    leaked = sorted(FORBIDDEN_IN_SHELL & set(shell))
+    if leaked:
+        print(f"\nFAIL: the app shell imports lazy dependencies: {', '.join(leaked)}")
+        failed = True
+
+    shell_total = sum(shell.values())
+    if args.budget_ms is not None and shell_total > args.budget_ms:
+        print(f"\nFAIL: app shell imports take {shell_total:.0f} ms, budget is {args.budget_ms:.0f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
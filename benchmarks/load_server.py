@@ -0,0 +1,190 @@
+"""Load-test the palette HTTP service on localhost.
+
+Usage:
+    python benchmarks/load_server.py                        # start a server, hammer it, stop it
+    python benchmarks/load_server.py --url http://127.0.0.1:8765 --concurrency 32 --requests 500
+    python benchmarks/load_server.py --images photo.jpg logo.png --n-colors 8
+
+Without --url a palette_server is started on a free localhost port for the
+duration of the run. Request bodies are corpus images encoded as PNG and
+JPEG (or the given files); --distinct makes each request's bytes unique so
+the server's palette cache cannot answer them. The report shows throughput,
+latency percentiles, status codes and the server's batch size histogram.
+"""
+import argparse
+import io
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import GENERATORS, generate  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def corpus_bodies(megapixels, seed=0):
+    """Every corpus image encoded once as PNG and once as JPEG"""
+    bodies = []
+    for name in GENERATORS:
+        image = generate(name, megapixels, seed).convert("RGB")
+        for format in ("PNG", "JPEG"):
+            buffer = io.BytesIO()
+            image.save(buffer, format=format)
+            bodies.append((f"{name}.{format.lower()}", buffer.getvalue()))
+    return bodies
+
+
+def file_bodies(paths):
+    """Request bodies read from image files"""
+    bodies = []
+    for path in paths:
+        with open(path, "rb") as f:
+            bodies.append((os.path.basename(path), f.read()))
+    return bodies
+
+
+def make_distinct(body, index):
+    """Append a unique trailer so the bytes (and cache key) differ but the image decodes the same"""
+    return body + f"\0load-{index}".encode("ascii")
+
+
+def post(url, body, timeout):
+    """POST one body; returns (status, seconds)"""
+    request = urllib.request.Request(url, data=body, method="POST",
+                                     headers={"Content-Type": "application/octet-stream"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = "error"
+    return status, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_load(base_url, bodies, requests, concurrency, n_colors, distinct, timeout):
+    """Send requests bodies round-robin from concurrency threads; returns (results, wall seconds)"""
+    url = f"{base_url}/palette?n_colors={n_colors}"
+    results = []
+    lock = threading.Lock()
+
+    def send(index):
+        body = bodies[index % len(bodies)][1]
+        if distinct:
+            body = make_distinct(body, index)
+        result = post(url, body, timeout)
+        with lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(requests)))
+    return results, time.perf_counter() - start
+
+
+def batch_histogram(metrics_text):
+    """Pull the palette_batch_size buckets out of the server's /metrics output"""
+    buckets = []
+    for line in metrics_text.splitlines():
+        if line.startswith("palette_batch_size_bucket"):
+            bound = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets.append((bound, int(line.rsplit(" ", 1)[1])))
+    return buckets
+
+
+def start_server(workers, extra_args):
+    """Start palette_server.py on a free port and wait until /healthz answers"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    command = [sys.executable, os.path.join(REPO_ROOT, "palette_server.py"), "--port", str(port)]
+    if workers:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command + extra_args, cwd=REPO_ROOT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/healthz", timeout=1):
+                return process, base_url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("palette_server did not start within 30 seconds")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Server to test (default: start one on localhost)")
+    parser.add_argument("--images", nargs="+", default=None, help="Image files to send (default: the corpus)")
+    parser.add_argument("--megapixels", type=float, default=0.25, help="Corpus image size (default: 0.25)")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="Client threads (default: 16)")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="Total requests (default: 200)")
+    parser.add_argument("--n-colors", type=int, default=6, help="Colors per palette (default: 6)")
+    parser.add_argument("--distinct", action="store_true", help="Make every body unique to bypass the cache")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout per request (default: 60)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for a spawned server")
+    parser.add_argument("--server-args", nargs=argparse.REMAINDER, default=[],
+                        help="Extra options for a spawned server, e.g. --server-args --max-batch 4")
+    args = parser.parse_args(argv)
+
+    bodies = file_bodies(args.images) if args.images else corpus_bodies(args.megapixels)
+    process = None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        process, base_url = start_server(args.workers, args.server_args)
+
+    try:
+        results, wall = run_load(base_url, bodies, args.requests, args.concurrency, args.n_colors,
+                                 args.distinct, args.timeout)
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=10) as response:
+            metrics_text = response.read().decode("utf-8")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    statuses = Counter(status for status, _ in results)
+    ok = [seconds * 1000 for status, seconds in results if status == 200]
+    body_kb = statistics.mean(len(body) for _, body in bodies) / 1024
+    print(f"{len(results)} requests, {args.concurrency} concurrent, {len(bodies)} bodies (mean {body_kb:.0f} KB)")
+    print(f"  wall time    {wall:.2f} s")
+    print(f"  throughput   {len(ok) / wall:.1f} palettes/s")
+    print(f"  status       {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))}")
+    if ok:
+        print(f"  latency ms   p50 {percentile(ok, 0.5):.0f}  p95 {percentile(ok, 0.95):.0f}  "
+              f"p99 {percentile(ok, 0.99):.0f}  max {max(ok):.0f}")
+
+    buckets = batch_histogram(metrics_text)
+    if buckets:
+        previous = 0
+        counts = []
+        for bound, cumulative in buckets:
+            counts.append(f"<={bound}: {cumulative - previous}")
+            previous = cumulative
+        print(f"  batch sizes  {', '.join(counts)}")
+
+    return 0 if statuses.get(200, 0) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Time the extraction engines and export paths on the synthetic corpus.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # quick profile, compare to baseline
+    python benchmarks/run_benchmarks.py --profile full        # 0.1 to 50 MP
+    python benchmarks/run_benchmarks.py --save-baseline       # record this run as the baseline
+    python benchmarks/run_benchmarks.py --engines kmeans --colors 6 --images noisy-photo
+
+Results are written as JSON. When a baseline exists (by default
+benchmarks/baselines/<host>.json) every case whose median is more than
+--threshold slower than the baseline is reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import PIL  # noqa: E402
+import sklearn  # noqa: E402
+
+from benchmarks.corpus import GENERATORS, generate  # noqa: E402
+from palette_core import (  # noqa: E402
+    extract_palette, extract_colors_kmeans, extract_colors_colorthief, extract_colors_median_cut, extract_tile_palettes,
+    KMEANS_SAMPLE_SIZE, KMEANS_SAMPLE_METHOD
+)
+from palette_export import palette_to_dict, palette_to_css, palette_to_text, palette_to_pdf  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+PROFILES = {
+    "quick": [0.1, 1, 4],
+    "full": [0.1, 0.5, 1, 4, 12, 24, 50],
+}
+
+DEFAULT_COLORS = [3, 6, 9, 12]
+
+# Engine name -> (callable, largest image in megapixels it is timed on)
+ENGINES = {
+    "kmeans": (lambda image, n: extract_colors_kmeans(
+        image, n, sample_size=KMEANS_SAMPLE_SIZE, sample_method=KMEANS_SAMPLE_METHOD), None),
+    "kmeans-full": (lambda image, n: extract_colors_kmeans(image, n), 1),
+    "kmeans-lab": (lambda image, n: extract_colors_kmeans(
+        image, n, sample_size=KMEANS_SAMPLE_SIZE, sample_method=KMEANS_SAMPLE_METHOD, color_space="lab"), None),
+    "kmeans-oklab": (lambda image, n: extract_colors_kmeans(
+        image, n, sample_size=KMEANS_SAMPLE_SIZE, sample_method=KMEANS_SAMPLE_METHOD, color_space="oklab"), None),
+    "auto": (lambda image, n: extract_palette(image, n), None),
+    # ColorThief visits every pixel in pure Python, so it is only timed on small inputs
+    "colorthief": (lambda image, n: extract_colors_colorthief(image, n), 2),
+    "median-cut": (lambda image, n: extract_colors_median_cut(image, n), None),
+    # Tiles are extracted in parallel across cores, so compare it with "kmeans" on many-core machines
+    "tiles-4x4": (lambda image, n: extract_tile_palettes(image, (4, 4), n)["palette"], None),
+}
+
+EXPORTS = {
+    "json": lambda colors, image: json.dumps(palette_to_dict(colors), indent=2),
+    "css": lambda colors, image: palette_to_css(colors),
+    "text": lambda colors, image: palette_to_text(colors),
+    "pdf": lambda colors, image: palette_to_pdf(colors, image),
+}
+
+
+def time_repeated(func, repeat):
+    """Run func repeat times and return (last result, list of seconds)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def summarize(timings):
+    """Median/min/max summary of one case"""
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "runs": len(timings),
+    }
+
+
+def run_suite(sizes, colors, images, engines, exports, repeat, log=print):
+    """Time every engine and export for each corpus image, size and color count"""
+    results = {}
+    for name in images:
+        for megapixels in sizes:
+            image = generate(name, megapixels)
+            for engine in engines:
+                func, max_megapixels = ENGINES[engine]
+                if max_megapixels is not None and megapixels > max_megapixels:
+                    continue
+                for n_colors in colors:
+                    palette, timings = time_repeated(lambda: func(image, n_colors), repeat)
+                    case = f"extract/{engine}/{name}/{megapixels}mp/k{n_colors}"
+                    results[case] = summarize(timings)
+                    log(f"{case:<50}{results[case]['median']:>10.4f}s")
+
+                    if engine != "kmeans":
+                        continue
+                    for export in exports:
+                        _, timings = time_repeated(lambda: EXPORTS[export](palette, image), repeat)
+                        case = f"export/{export}/{name}/{megapixels}mp/k{n_colors}"
+                        results[case] = summarize(timings)
+                        log(f"{case:<50}{results[case]['median']:>10.4f}s")
+            image = None
+    return results
+
+
+def find_regressions(results, baseline, threshold, min_delta):
+    """Cases whose median grew by more than threshold (and min_delta seconds) over the baseline"""
+    regressions = []
+    for case, current in results.items():
+        previous = baseline.get("results", {}).get(case)
+        if previous is None:
+            continue
+        delta = current["median"] - previous["median"]
+        if delta > min_delta and current["median"] > previous["median"] * (1 + threshold):
+            regressions.append((case, previous["median"], current["median"]))
+    return regressions
+
+
+def machine_info():
+    """Environment details stored next to the timings"""
+    return {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "scikit-learn": sklearn.__version__,
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick", help="Image sizes to run (default: quick)")
+    parser.add_argument("--sizes", type=float, nargs="+", help="Explicit sizes in megapixels (overrides --profile)")
+    parser.add_argument("--colors", type=int, nargs="+", default=DEFAULT_COLORS, help="num_colors values (default: 3 6 9 12)")
+    parser.add_argument("--images", nargs="+", choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument("--exports", nargs="*", choices=sorted(EXPORTS), default=sorted(EXPORTS))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is compared (default: 3)")
+    parser.add_argument("--output", default=None, help="Write this run's results as JSON")
+    parser.add_argument("--baseline", default=os.path.join(BASELINE_DIR, f"{socket.gethostname()}.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (default: 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or PROFILES[args.profile]
+    results = run_suite(sizes, args.colors, args.images, args.engines, args.exports, args.repeat)
+    report = {
+        "machine": machine_info(),
+        "config": {"sizes": sizes, "colors": args.colors, "repeat": args.repeat},
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold, args.min_delta)
+    if not regressions:
+        print(f"No regressions above {args.threshold:.0%} against {args.baseline}")
+        return 0
+
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}:")
+    for case, previous, current in regressions:
+        print(f"  {case}: {previous:.4f}s -> {current:.4f}s ({current / previous - 1:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
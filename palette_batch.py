@@ -0,0 +1,251 @@
+"""Extract palettes for a directory or glob of images and stream them as JSONL.
+
+Usage:
+    python palette_batch.py catalog/ --colors 6 --workers 8 --output palettes.jsonl
+    python palette_batch.py "shots/**/*.jpg" --method unique
+    python palette_batch.py catalog/ --method budgeted --budget 0.5
+    python palette_batch.py catalog/ --index ~/.cache/wild_pick/palette_index.sqlite
+
+Each output line holds the image path, the palette in the same shape as
+the app's "JSON (Complete Data)" export, and the extraction time, or an
+error message when the image could not be processed. Transparent pixels
+(and, with --exclude-background, a flat background color) are left out
+before extraction; excluded_fraction reports how much of the image that was.
+
+Every record carries the image's perceptual fingerprint (dhash and
+color_signature). With --index, images whose fingerprint is within
+--max-distance bits of one already indexed for the same settings reuse its
+palette (the record names it in duplicate_of), and new palettes are added
+to the index in bulk as the run goes.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+
+from palette_core import (
+    decode_image, mask_pixels, WORKING_MAX_PIXELS, COLOR_SPACES, extract_palette, extract_colors_kmeans, extract_colors_unique, extract_colors_streaming,
+    extract_colors_median_cut, extract_colors_budgeted,
+    KMEANS_SAMPLE_SIZE, KMEANS_SAMPLE_METHOD, DEFAULT_BUDGET_SECONDS
+)
+from palette_export import palette_to_dict
+from palette_index import PaletteIndex, image_fingerprint, DEFAULT_MAX_DISTANCE
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+
+# New palettes are written to the near-duplicate index this many at a time, or at least this
+# often so later images of the same run can match them
+INDEX_FLUSH_RECORDS = 256
+INDEX_FLUSH_SECONDS = 2.0
+
+# Record fields that describe one file rather than its palette, left out of index entries
+INDEX_RECORD_SKIP = ("seconds", "dhash", "color_signature")
+
+# Same engines as the app; "kmeans" uses the app's sampling budget
+METHODS = {
+    "auto": extract_palette,
+    "kmeans": partial(extract_colors_kmeans, sample_size=KMEANS_SAMPLE_SIZE, sample_method=KMEANS_SAMPLE_METHOD),
+    "unique": extract_colors_unique,
+    "streaming": extract_colors_streaming,
+    "median-cut": extract_colors_median_cut,
+    "budgeted": extract_colors_budgeted,
+}
+
+
+def iter_image_paths(sources):
+    """Yield image paths from directories (walked recursively), globs and plain files"""
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        yield os.path.join(root, name)
+        elif os.path.isfile(source):
+            yield source
+        else:
+            for path in sorted(glob.iglob(source, recursive=True)):
+                if os.path.isfile(path) and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+                    yield path
+
+
+def index_method(n_colors, method, max_pixels=WORKING_MAX_PIXELS, color_space="rgb", budget=None,
+                 exclude_background=False):
+    """Near-duplicate index method for one set of batch settings"""
+    name = f"batch-{method}-{n_colors}-{color_space}-{max_pixels}"
+    if budget is not None:
+        name += f"-budget-{budget:g}"
+    return name + ("-no-background" if exclude_background else "")
+
+
+# Each worker process opens the near-duplicate index once
+_worker_indexes = {}
+
+
+def _worker_index(path, max_distance):
+    index = _worker_indexes.get(path)
+    if index is None:
+        index = _worker_indexes[path] = PaletteIndex(path, max_distance=max_distance)
+    return index
+
+
+def process_image(path, n_colors, method, max_pixels=WORKING_MAX_PIXELS, color_space="rgb", budget=None,
+                  exclude_background=False, index_path=None, max_distance=DEFAULT_MAX_DISTANCE):
+    """Extract one image's palette and return its JSONL record
+
+    With index_path, a near-duplicate's indexed record is returned instead
+    of extracting again.
+    """
+    start = time.perf_counter()
+    try:
+        stats = {}
+        image = decode_image(path, max_pixels=max_pixels, keep_alpha=True)
+        image_hash, signature = fingerprint = image_fingerprint(image)
+        fingerprint_fields = {"dhash": f"{image_hash:016x}", "color_signature": signature.hex()}
+        if index_path:
+            match = _worker_index(index_path, max_distance).lookup(
+                fingerprint, index_method(n_colors, method, max_pixels, color_space, budget, exclude_background)
+            )
+            if match is not None:
+                value, distance = match
+                return {
+                    **value,
+                    "path": path,
+                    "duplicate_of": value["path"],
+                    "hash_distance": distance,
+                    "seconds": round(time.perf_counter() - start, 4),
+                    **fingerprint_fields,
+                }
+        image = mask_pixels(image, exclude_background=exclude_background, stats=stats)
+        # median-cut has no color_space option, so RGB runs leave it out
+        options = {"color_space": color_space} if color_space != "rgb" else {}
+        if budget is not None:
+            options["budget"] = budget
+        colors = METHODS[method](image, n_colors, stats=stats, **options)
+        record = {
+            "path": path,
+            "n_colors": n_colors,
+            "method": method,
+            "color_space": color_space,
+            "palette": palette_to_dict(colors)["palette"],
+            "pixels": stats.get("total_pixels"),
+            "excluded_fraction": round(stats["excluded_fraction"], 4),
+            "seconds": round(time.perf_counter() - start, 4),
+            **fingerprint_fields,
+        }
+        if "n_init" in stats:
+            # Quality of a budgeted fit: restarts that fit the budget and inertia per sampled pixel
+            record["n_init"] = stats["n_init"]
+            record["inertia"] = round(stats["inertia"], 6)
+        return record
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+
+def run_batch(paths, n_colors=6, method="auto", workers=None, max_pending=None, max_pixels=WORKING_MAX_PIXELS,
+              color_space="rgb", budget=None, exclude_background=False, index_path=None,
+              max_distance=DEFAULT_MAX_DISTANCE):
+    """Yield records as workers finish, keeping at most max_pending images in flight
+
+    With index_path, near-duplicates of indexed images reuse their palettes
+    and newly extracted ones are added to the index in bulk.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    paths = iter(paths)
+    index = PaletteIndex(index_path) if index_path else None
+    method_name = index_method(n_colors, method, max_pixels, color_space, budget, exclude_background)
+    new_entries = []
+    last_flush = time.monotonic()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            exhausted = False
+            while pending or not exhausted:
+                # Top up the window so huge catalogs never queue every future at once
+                while not exhausted and len(pending) < max_pending:
+                    path = next(paths, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(
+                        process_image, path, n_colors, method, max_pixels, color_space, budget, exclude_background,
+                        index_path, max_distance
+                    ))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    if index is not None and "error" not in record and "duplicate_of" not in record:
+                        fingerprint = (int(record["dhash"], 16), bytes.fromhex(record["color_signature"]))
+                        value = {key: item for key, item in record.items() if key not in INDEX_RECORD_SKIP}
+                        new_entries.append((fingerprint, method_name, value))
+                        if (len(new_entries) >= INDEX_FLUSH_RECORDS
+                                or time.monotonic() - last_flush >= INDEX_FLUSH_SECONDS):
+                            index.add_many(new_entries)
+                            new_entries = []
+                            last_flush = time.monotonic()
+                    yield record
+    finally:
+        # Palettes extracted so far are kept even when the run stops early
+        if index is not None:
+            index.add_many(new_entries)
+            index.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract color palettes for many images in parallel and write them as JSONL."
+    )
+    parser.add_argument("sources", nargs="+", help="Directories, glob patterns or image files")
+    parser.add_argument("-n", "--colors", type=int, default=6, help="Number of colors per palette (default: 6)")
+    parser.add_argument("-m", "--method", choices=sorted(METHODS), default="auto", help="Extraction engine (default: auto)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--max-pixels", type=int, default=WORKING_MAX_PIXELS,
+                        help=f"Decode images to at most this many pixels, 0 for full resolution (default: {WORKING_MAX_PIXELS})")
+    parser.add_argument("--color-space", choices=COLOR_SPACES, default="rgb",
+                        help="Space to cluster in; lab and oklab are perceptual (default: rgb)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help=f"Seconds per image for --method auto or budgeted (budgeted default: {DEFAULT_BUDGET_SECONDS})")
+    parser.add_argument("--exclude-background", action="store_true",
+                        help="Also leave out a flat background color detected on the image border")
+    parser.add_argument("--index", metavar="PATH",
+                        help="SQLite near-duplicate index to reuse palettes from and add new ones to")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f"dHash bits (of 64) a near-duplicate may differ in (default: {DEFAULT_MAX_DISTANCE})")
+    args = parser.parse_args(argv)
+    if args.method == "median-cut" and args.color_space != "rgb":
+        parser.error("--method median-cut only supports --color-space rgb")
+    if args.budget is not None and args.method not in ("auto", "budgeted"):
+        parser.error("--budget only applies to --method auto or budgeted")
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    processed = failed = 0
+    start = time.perf_counter()
+    try:
+        for record in run_batch(iter_image_paths(args.sources), args.colors, args.method, args.workers,
+                                max_pixels=args.max_pixels, color_space=args.color_space, budget=args.budget,
+                                exclude_background=args.exclude_background, index_path=args.index,
+                                max_distance=args.max_distance):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            processed += 1
+            failed += "error" in record
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {processed} images ({failed} failed) in {elapsed:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""Content-addressed palette cache shared by every session.
+
+Results are keyed by a hash of the uploaded bytes plus the extraction
+settings. A bounded in-memory LRU sits in front of an optional on-disk
+tier that survives restarts; both evict by total size.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MEMORY_BYTES = 16 * 1024 * 1024
+DEFAULT_DISK_BYTES = 256 * 1024 * 1024
+
+
+def content_digest(data):
+    """Hex digest identifying a file's bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(data, n_colors, method):
+    """Build a cache key from image bytes, the number of colors and the extraction method"""
+    return make_digest_key(content_digest(data), n_colors, method)
+
+
+def make_digest_key(digest, n_colors, method):
+    """make_key() for callers that already hold the content digest"""
+    return f"{digest}-{n_colors}-{method}"
+
+
+def palette_digest(colors):
+    """Hex digest identifying a palette's colors and percentages"""
+    return content_digest(json.dumps(palette_to_payload(colors), separators=(",", ":")).encode("utf-8"))
+
+
+def palette_to_payload(colors):
+    """Convert a [(color, percentage), ...] palette into JSON-safe lists"""
+    return [[[float(c) for c in color], float(percentage)] for color, percentage in colors]
+
+
+def palette_from_payload(payload):
+    """Inverse of palette_to_payload, restoring numpy colors"""
+    return [(np.array(color, dtype=np.float64), percentage) for color, percentage in payload]
+
+
+def palette_tree_to_payload(tree):
+    """Convert a {n_colors: palette} tree into JSON-safe data (keys become strings)"""
+    return {str(n_colors): palette_to_payload(colors) for n_colors, colors in tree.items()}
+
+
+def palette_tree_from_payload(payload):
+    """Inverse of palette_tree_to_payload"""
+    return {int(n_colors): palette_from_payload(colors) for n_colors, colors in payload.items()}
+
+
+class PaletteCache:
+    """Two-tier LRU cache of JSON-serializable extraction results"""
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, disk_dir=None, disk_max_bytes=DEFAULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_files())
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(blob)
+
+        blob = self._disk_read(key)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, blob)
+        return json.loads(blob)
+
+    def put(self, key, value):
+        """Store value under key in memory and, when configured, on disk"""
+        blob = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._memory_put(key, blob)
+        self._disk_write(key, blob)
+
+    def get_palette(self, key):
+        """get() for [(color, percentage), ...] palettes"""
+        payload = self.get(key)
+        return None if payload is None else palette_from_payload(payload)
+
+    def put_palette(self, key, colors):
+        """put() for [(color, percentage), ...] palettes"""
+        self.put(key, palette_to_payload(colors))
+
+    def get_palette_tree(self, key):
+        """get() for {n_colors: palette} trees"""
+        payload = self.get(key)
+        return None if payload is None else palette_tree_from_payload(payload)
+
+    def put_palette_tree(self, key, tree):
+        """put() for {n_colors: palette} trees"""
+        self.put(key, palette_tree_to_payload(tree))
+
+    def clear(self):
+        """Drop every in-memory entry (the disk tier is left alone)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current sizes of both tiers"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    # Memory tier (callers hold self._lock)
+    def _memory_put(self, key, blob):
+        if len(blob) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = blob
+        self._bytes += len(blob)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    # Disk tier: one JSON file per key, least recently used by mtime
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_files(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((info.st_mtime, path, info.st_size))
+        return entries
+
+    def _disk_read(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            # Touch the file so eviction treats it as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return blob
+
+    def _disk_write(self, key, blob):
+        if not self.disk_dir or len(blob) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            previous_size = os.path.getsize(path)
+        except FileNotFoundError:
+            previous_size = 0
+        with open(temp_path, "wb") as f:
+            f.write(blob)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._disk_bytes += len(blob) - previous_size
+            if self._disk_bytes > self.disk_max_bytes:
+                self._disk_evict()
+
+    def _disk_evict(self):
+        for _, path, size in sorted(self._disk_files()):
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._disk_bytes -= size
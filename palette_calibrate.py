@@ -0,0 +1,60 @@
+"""Fit the cost model behind latency-budgeted extraction to this machine.
+
+Usage:
+    python palette_calibrate.py                       # saves to ~/.cache/wild_pick/cost_model.json
+    python palette_calibrate.py --output model.json --check 2.0
+
+Times single K-means restarts and nearest-centroid coverage passes at
+several sizes on a synthetic photo-like image, fits the linear cost model
+extract_colors_budgeted() plans with, and saves it where the app, the
+batch CLI and the palette service look for it (WILD_PICK_COST_MODEL
+overrides the path). Rerun it after moving to different hardware or
+changing worker counts. --check then runs budgeted extractions of a 2 MP
+and a 12 MP image and reports how long they took against the budget.
+"""
+import argparse
+import sys
+import time
+
+from palette_core import (
+    COST_MODEL_PATH, COLOR_SPACES, PALETTE_TREE_MAX_COLORS, calibrate_cost_model, calibration_image,
+    extract_colors_budgeted
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default=COST_MODEL_PATH, help=f"Model file to write (default: {COST_MODEL_PATH})")
+    parser.add_argument("--repeat", type=int, default=2, help="Timings per configuration (default: 2)")
+    parser.add_argument("--color-spaces", nargs="+", choices=COLOR_SPACES, default=list(COLOR_SPACES),
+                        help="Spaces to time coverage passes in (default: all)")
+    parser.add_argument("--check", type=float, metavar="SECONDS",
+                        help="After saving, run budgeted extractions with this budget and report the result")
+    args = parser.parse_args(argv)
+
+    def report(stage, fraction):
+        print(f"\rTiming {stage:<6} {fraction:4.0%}", end="", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    model = calibrate_cost_model(color_spaces=args.color_spaces, repeat=args.repeat, progress=report)
+    print(f"\rCalibrated in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    model.save(args.output)
+    print(f"Saved cost model to {args.output}", file=sys.stderr)
+
+    a, b, c = model.fit
+    print(f"  fit     {a * 1000:.2f} ms + {b * 1e9:.2f} ns/(pixel*cluster) + {c * 1e9:.3f} ns/(pixel*cluster*iteration)")
+    for color_space, (a, b, c) in model.assign.items():
+        print(f"  assign  {color_space:<6}{a * 1000:.2f} ms + {b * 1e9:.2f} ns/pixel + {c * 1e9:.3f} ns/(pixel*cluster)")
+
+    if args.check:
+        for label, (width, height) in (("2 MP", (1632, 1224)), ("12 MP", (4000, 3000))):
+            image = calibration_image(width, height, seed=1)
+            stats = {}
+            extract_colors_budgeted(image, PALETTE_TREE_MAX_COLORS, args.check, cost_model=model, stats=stats)
+            print(f"  check   {label:<6} {stats['seconds']:.2f}s of {args.check:g}s: sample {stats['sample_size']:,}, "
+                  f"coverage {stats['coverage_pixels']:,}, {stats['n_init']} restarts, inertia {stats['inertia']:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1618 @@
+"""Headless color math and palette extraction engines.
+
+Everything here works on PIL images and NumPy arrays with no Streamlit
+dependency, so the app, the batch CLI and scripts can share it.
+"""
+import colorsys
+import importlib.util
+import io
+import json
+import os
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from palette_metrics import stage
+
+# scikit-learn (with SciPy and joblib behind it) and ColorThief are imported
+# inside the engines that use them, so importing this module stays cheap.
+
+# Optional libraries
+COLORTHIEF_AVAILABLE = importlib.util.find_spec("colorthief") is not None
+
+# Pixel budget for fitting K-means centroids (coverage is still measured on every pixel)
+KMEANS_SAMPLE_SIZE = 100_000
+KMEANS_SAMPLE_METHOD = "stratified"
+
+# Uploads above this size use the streaming engine so memory scales with the tile, not the image
+STREAMING_THRESHOLD_PIXELS = 12_000_000
+STREAMING_TILE_PIXELS = 262_144
+
+# Pixels per chunk of a nearest-centroid pass; bounds its float32 distance matrix to this many rows
+ASSIGN_CHUNK_PIXELS = 262_144
+
+# Latency-budgeted K-means: candidate sample sizes (largest preferred) and iteration caps, the
+# most restarts run, and the share of the budget held back for overheads the cost model misses
+BUDGET_SAMPLE_SIZES = (200_000, 100_000, 50_000, 25_000, 10_000, 5_000, 2_000)
+BUDGET_MAX_ITERS = (100, 50, 25)
+BUDGET_FLOOR_MAX_ITER = 10
+BUDGET_MAX_INIT = 10
+BUDGET_HEADROOM = 0.15
+# At most this share of the budget goes to the coverage pass; beyond it coverage is measured on a subsample
+BUDGET_ASSIGN_SHARE = 0.3
+DEFAULT_BUDGET_SECONDS = 2.0
+
+# Calibrated cost model written by palette_calibrate.py, and the coefficients used until it exists
+COST_MODEL_PATH = os.environ.get(
+    "WILD_PICK_COST_MODEL", os.path.join(os.path.expanduser("~"), ".cache", "wild_pick", "cost_model.json")
+)
+DEFAULT_FIT_COST = (0.004, 1.0e-7, 2.5e-9)
+DEFAULT_ASSIGN_COST = {
+    "rgb": (0.001, 2.5e-8, 4.0e-9),
+    "lab": (0.003, 6.5e-8, 4.0e-9),
+    "oklab": (0.001, 6.0e-8, 3.0e-9),
+}
+
+# Pixel masking before clustering: pixels less opaque than this are dropped, and a background color is
+# one that at least BACKGROUND_BORDER_SHARE of the opaque border pixels match within BACKGROUND_TOLERANCE
+ALPHA_MIN_OPACITY = 128
+BACKGROUND_TOLERANCE = 12
+BACKGROUND_BORDER_SHARE = 0.6
+
+# Palettes need nowhere near full resolution: uploads are decoded to at most this many pixels
+WORKING_MAX_PIXELS = 2_000_000
+
+# Largest palette in a palette tree; every smaller size is derived from it
+PALETTE_TREE_MAX_COLORS = 12
+
+# Smallest K-means sample per tile when a tile grid splits KMEANS_SAMPLE_SIZE, and the
+# restarts per tile (tiles are small and nearly uniform, so few restarts converge alike)
+TILE_MIN_SAMPLE_SIZE = 5_000
+TILE_KMEANS_N_INIT = 3
+
+# Animated uploads: at most this many frames are analysed, each shrunk to this many pixels
+ANIMATION_MAX_FRAMES = 120
+ANIMATION_FRAME_PIXELS = 250_000
+
+# EXIF orientation tag values and the transpose that undoes each one
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Color math and helper functions
+def rgb_to_hex(rgb):
+    """Convert RGB tuple to hex string"""
+    return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
+
+def hex_to_rgb(hex_color):
+    """Convert hex string to RGB tuple"""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+def rgb_to_cmyk(r, g, b):
+    """Convert RGB values to CMYK"""
+    if r == 0 and g == 0 and b == 0:
+        return 0, 0, 0, 100
+    
+    # Normalize RGB values to 0-1 range
+    r_norm = r / 255.0
+    g_norm = g / 255.0 
+    b_norm = b / 255.0
+    
+    # Calculate K (black)
+    k = 1 - max(r_norm, g_norm, b_norm)
+    
+    # Calculate CMY
+    c = (1 - r_norm - k) / (1 - k) if (1 - k) != 0 else 0
+    m = (1 - g_norm - k) / (1 - k) if (1 - k) != 0 else 0
+    y = (1 - b_norm - k) / (1 - k) if (1 - k) != 0 else 0
+    
+    # Convert to percentages
+    return round(c * 100), round(m * 100), round(y * 100), round(k * 100)
+
+def get_color_name(rgb):
+    """Get approximate color name based on RGB values"""
+    r, g, b = rgb
+    
+    # Convert to HSV for better color classification
+    h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
+    h *= 360
+    s *= 100
+    v *= 100
+    
+    if v < 20:
+        return "Black"
+    elif v > 80 and s < 20:
+        return "White"
+    elif s < 20:
+        return "Gray"
+    elif h < 15 or h > 345:
+        return "Red"
+    elif h < 45:
+        return "Orange"
+    elif h < 75:
+        return "Yellow"
+    elif h < 150:
+        return "Green"
+    elif h < 210:
+        return "Cyan"
+    elif h < 270:
+        return "Blue"
+    elif h < 330:
+        return "Purple"
+    else:
+        return "Pink"
+
+def create_tint(rgb, percentage):
+    """Create a tint (lighter version) of a color"""
+    r, g, b = rgb
+    # Mix with white
+    factor = percentage / 100
+    new_r = r + (255 - r) * (1 - factor)
+    new_g = g + (255 - g) * (1 - factor)
+    new_b = b + (255 - b) * (1 - factor)
+    return (int(new_r), int(new_g), int(new_b))
+
+def create_color_harmony(base_color, harmony_type="complementary"):
+    """Generate color harmony based on a base color"""
+    r, g, b = base_color
+    h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
+    
+    harmonies = []
+    
+    if harmony_type == "complementary":
+        # Complementary color (180 degrees opposite)
+        comp_h = (h + 0.5) % 1.0
+        comp_r, comp_g, comp_b = colorsys.hsv_to_rgb(comp_h, s, v)
+        harmonies.append((int(comp_r*255), int(comp_g*255), int(comp_b*255)))
+        
+    elif harmony_type == "triadic":
+        # Triadic colors (120 degrees apart)
+        for offset in [1/3, 2/3]:
+            tri_h = (h + offset) % 1.0
+            tri_r, tri_g, tri_b = colorsys.hsv_to_rgb(tri_h, s, v)
+            harmonies.append((int(tri_r*255), int(tri_g*255), int(tri_b*255)))
+            
+    elif harmony_type == "analogous":
+        # Analogous colors (30 degrees apart)
+        for offset in [-30/360, 30/360]:
+            ana_h = (h + offset) % 1.0
+            ana_r, ana_g, ana_b = colorsys.hsv_to_rgb(ana_h, s, v)
+            harmonies.append((int(ana_r*255), int(ana_g*255), int(ana_b*255)))
+    
+    return harmonies
+
+# Image decoding
+def decode_image(source, max_pixels=WORKING_MAX_PIXELS, stats=None, progress=None, keep_alpha=False):
+    """Decode an image file straight to a working-resolution H x W x 3 uint8 array
+    
+    JPEGs are decoded with draft() DCT scaling at 1/2, 1/4 or 1/8 size, and
+    anything still too large is shrunk with reduce() before a final box resize.
+    EXIF orientation is applied once, on the small image. With keep_alpha,
+    images with transparency decode to H x W x 4 RGBA instead (see mask_pixels).
+    """
+    start = time.perf_counter()
+    if progress is not None:
+        progress("decode", 0.0)
+    
+    with Image.open(source) as image:
+        original_size = image.size
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        frames = getattr(image, "n_frames", 1)
+        width, height = original_size
+        target = original_size
+        
+        with stage("decode.open", pixels=width * height, format=image.format) as timer:
+            if max_pixels and width * height > max_pixels:
+                scale = np.sqrt(max_pixels / (width * height))
+                target = (max(1, int(width * scale)), max(1, int(height * scale)))
+                if image.format == 'JPEG':
+                    # DCT scaling picks the smallest 1/2, 1/4 or 1/8 size covering the requested
+                    # size; asking for half the target keeps the result within 1/4x-1x of the budget
+                    image.draft('RGB', (max(1, target[0] // 2), max(1, target[1] // 2)))
+            
+            image.load()
+            draft_size = image.size
+            timer.set(draft_pixels=draft_size[0] * draft_size[1])
+        
+        with stage("decode.resize", pixels=draft_size[0] * draft_size[1]):
+            if image.mode.startswith("I;16"):
+                # 16-bit grayscale: reduce() rejects it and convert() clips at 255, so keep the high byte
+                image = Image.fromarray((np.asarray(image) >> 8).astype(np.uint8), 'L')
+            factor = int(np.sqrt(image.size[0] * image.size[1] / (target[0] * target[1])))
+            if factor >= 2:
+                image = image.reduce(factor)
+            if image.size[0] * image.size[1] > target[0] * target[1]:
+                image = image.resize(target, Image.Resampling.BOX)
+            
+            if orientation in ORIENTATION_TRANSPOSE:
+                image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+        
+        with stage("decode.convert") as timer:
+            has_alpha = image.has_transparency_data
+            mode = 'RGBA' if keep_alpha and has_alpha else 'RGB'
+            working = np.ascontiguousarray(np.asarray(image.convert(mode), dtype=np.uint8))
+            timer.set(pixels=working.shape[0] * working.shape[1], array_bytes=working.nbytes)
+    
+    if stats is not None:
+        stats.update({
+            "original_size": original_size,
+            "draft_size": draft_size,
+            "reduce_factor": max(factor, 1),
+            "working_size": (working.shape[1], working.shape[0]),
+            "frames": frames,
+            "has_alpha": has_alpha,
+            "decode_seconds": time.perf_counter() - start,
+        })
+    
+    return working
+
+def as_rgb_array(image):
+    """H x W x 3 uint8 array for a PIL image or an already decoded working array (RGBA arrays lose alpha)"""
+    if isinstance(image, np.ndarray):
+        return image[..., :3] if image.shape[-1] == 4 else image
+    return np.asarray(image.convert('RGB'))
+
+def image_dimensions(image):
+    """(width, height) of a PIL image or an H x W x 3 array"""
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+# Pixel masking: transparent and flat-background pixels never reach the engines
+def split_alpha(image):
+    """(H x W x 3 RGB array, H x W opacity plane or None) for a PIL image or an RGB/RGBA array"""
+    if isinstance(image, Image.Image):
+        if not image.has_transparency_data:
+            return np.asarray(image.convert('RGB')), None
+        image = np.asarray(image.convert('RGBA'))
+    if image.shape[-1] == 4:
+        return image[..., :3], image[..., 3]
+    return image, None
+
+def detect_background(image, alpha=None, min_opacity=ALPHA_MIN_OPACITY, tolerance=BACKGROUND_TOLERANCE,
+                      min_share=BACKGROUND_BORDER_SHARE):
+    """The flat background color of an image as an (r, g, b) tuple, or None
+    
+    Looks only at the outermost ring of opaque pixels: the most common color
+    there (bucketed at 4 bits per channel, then averaged) is the background
+    when at least min_share of the ring lies within tolerance of it.
+    """
+    rgb = as_rgb_array(image)
+    ring = np.concatenate([rgb[0], rgb[-1], rgb[1:-1, 0], rgb[1:-1, -1]]).astype(np.int16)
+    if alpha is not None:
+        ring = ring[np.concatenate([alpha[0], alpha[-1], alpha[1:-1, 0], alpha[1:-1, -1]]) >= min_opacity]
+    if len(ring) == 0:
+        return None
+    keys = ((ring[:, 0] >> 4) << 8) | ((ring[:, 1] >> 4) << 4) | (ring[:, 2] >> 4)
+    values, counts = np.unique(keys, return_counts=True)
+    candidate = ring[keys == values[counts.argmax()]].mean(axis=0)
+    if (np.abs(ring - candidate).max(axis=1) <= tolerance).mean() < min_share:
+        return None
+    return tuple(int(round(c)) for c in candidate)
+
+def pixel_mask(rgb, alpha=None, min_opacity=ALPHA_MIN_OPACITY, exclude_background=False):
+    """Which pixels of an H x W x 3 array to cluster, as (keep, transparent, background pixels, background color)
+    
+    keep is an H x W boolean mask, or None when nothing (or everything)
+    would be dropped; the counts are zero then.
+    """
+    total_pixels = rgb.shape[0] * rgb.shape[1]
+    keep = None
+    transparent = 0
+    if alpha is not None:
+        keep = alpha >= min_opacity
+        transparent = total_pixels - int(np.count_nonzero(keep))
+    
+    background = detect_background(rgb, alpha, min_opacity) if exclude_background else None
+    background_pixels = 0
+    if background is not None:
+        near = (np.abs(rgb.astype(np.int16) - np.array(background, dtype=np.int16)) <= BACKGROUND_TOLERANCE).all(axis=-1)
+        if keep is not None:
+            near &= keep
+        background_pixels = int(np.count_nonzero(near))
+        keep = ~near if keep is None else keep & ~near
+    
+    excluded = transparent + background_pixels
+    if excluded == 0 or excluded == total_pixels:
+        # Nothing to drop, or nothing would be left to cluster
+        return None, 0, 0, background
+    return keep, transparent, background_pixels, background
+
+def mask_pixels(image, alpha=None, min_opacity=ALPHA_MIN_OPACITY, exclude_background=False, stats=None):
+    """Drop transparent and, optionally, flat-background pixels before any engine sees them
+    
+    alpha is an H x W opacity plane; RGBA arrays and PIL images carry their
+    own. Pixels less opaque than min_opacity are dropped, and with
+    exclude_background so is every pixel within BACKGROUND_TOLERANCE of the
+    color detect_background() finds. Returns the H x W x 3 image unchanged
+    when nothing (or everything) would be dropped, otherwise the remaining
+    pixels as a 1 x N x 3 array every engine accepts. stats receives the
+    excluded fraction and what it was made of.
+    """
+    rgb, own_alpha = split_alpha(image)
+    alpha = own_alpha if alpha is None else alpha
+    total_pixels = rgb.shape[0] * rgb.shape[1]
+    
+    with stage("mask", pixels=total_pixels) as timer:
+        keep, transparent, background_pixels, background = pixel_mask(rgb, alpha, min_opacity, exclude_background)
+        excluded = transparent + background_pixels
+        masked = rgb if keep is None else rgb[keep][None]
+        timer.set(array_bytes=masked.nbytes if masked is not rgb else 0, excluded=excluded)
+    
+    if stats is not None:
+        stats.update({
+            "masked_pixels": total_pixels,
+            "excluded_fraction": excluded / total_pixels if total_pixels else 0.0,
+            "transparent_pixels": transparent,
+            "background_pixels": background_pixels,
+            "background_color": background,
+        })
+    
+    return masked
+
+# Vectorized color math: N x 3 arrays in, arrays out, matching the scalar functions exactly
+COLOR_NAMES = ("Black", "White", "Gray", "Red", "Orange", "Yellow", "Green", "Cyan", "Blue", "Purple", "Pink")
+
+HARMONY_OFFSETS = {
+    "complementary": (0.5,),
+    "triadic": (1/3, 2/3),
+    "analogous": (-30/360, 30/360),
+}
+
+_HEX_DIGITS = np.array([f"{i:02x}" for i in range(256)])
+
+def _as_color_array(colors):
+    """View any palette-like input as an N x 3 float64 array"""
+    return np.asarray(colors, dtype=np.float64).reshape((-1, 3))
+
+def rgb_to_hex_array(colors):
+    """Vectorized rgb_to_hex: N x 3 colors to an array of hex strings"""
+    rgb = _as_color_array(colors).astype(np.int64)
+    hex_colors = np.char.add(_HEX_DIGITS[rgb[:, 0]], _HEX_DIGITS[rgb[:, 1]])
+    return np.char.add("#", np.char.add(hex_colors, _HEX_DIGITS[rgb[:, 2]]))
+
+def rgb_to_cmyk_array(colors):
+    """Vectorized rgb_to_cmyk: N x 3 colors to an N x 4 int array of percentages"""
+    rgb = _as_color_array(colors)
+    norm = rgb / 255.0
+    k = 1 - norm.max(axis=1)
+    denominator = 1 - k
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cmy = (1 - norm - k[:, None]) / denominator[:, None]
+    cmy = np.where(denominator[:, None] != 0, cmy, 0.0)
+    
+    cmyk = np.rint(np.column_stack([cmy * 100, k * 100])).astype(np.int64)
+    cmyk[(rgb == 0).all(axis=1)] = (0, 0, 0, 100)
+    return cmyk
+
+def rgb_to_hsv_array(colors):
+    """Vectorized colorsys.rgb_to_hsv on 0-255 colors: returns N x 3 floats in 0-1"""
+    norm = _as_color_array(colors) / 255
+    r, g, b = norm[:, 0], norm[:, 1], norm[:, 2]
+    maxc = norm.max(axis=1)
+    minc = norm.min(axis=1)
+    rangec = maxc - minc
+    grey = rangec == 0
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = rangec / maxc
+        rc = (maxc - r) / rangec
+        gc = (maxc - g) / rangec
+        bc = (maxc - b) / rangec
+    
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.mod(h / 6.0, 1.0)
+    return np.column_stack([np.where(grey, 0.0, h), np.where(grey, 0.0, s), maxc])
+
+def hsv_to_rgb_array(hsv):
+    """Vectorized colorsys.hsv_to_rgb: N x 3 floats in 0-1 to N x 3 floats in 0-1"""
+    hsv = np.asarray(hsv, dtype=np.float64).reshape((-1, 3))
+    h, s, v = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+    i = np.trunc(h * 6.0)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i.astype(np.int64) % 6
+    
+    # Rows of (r, g, b) for each hue sector, as in colorsys
+    sectors = np.stack([
+        np.column_stack([v, t, p]),
+        np.column_stack([q, v, p]),
+        np.column_stack([p, v, t]),
+        np.column_stack([p, q, v]),
+        np.column_stack([t, p, v]),
+        np.column_stack([v, p, q]),
+    ])
+    rgb = sectors[i, np.arange(len(hsv))]
+    return np.where((s == 0.0)[:, None], v[:, None], rgb)
+
+def get_color_name_index_array(colors):
+    """Vectorized get_color_name: N x 3 colors to indices into COLOR_NAMES"""
+    hsv = rgb_to_hsv_array(colors)
+    h = hsv[:, 0] * 360
+    s = hsv[:, 1] * 100
+    v = hsv[:, 2] * 100
+    
+    conditions = [
+        v < 20,
+        (v > 80) & (s < 20),
+        s < 20,
+        (h < 15) | (h > 345),
+        h < 45,
+        h < 75,
+        h < 150,
+        h < 210,
+        h < 270,
+        h < 330,
+    ]
+    return np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+
+def create_tint_array(colors, percentage):
+    """Vectorized create_tint: N x 3 colors to an N x 3 int array"""
+    rgb = _as_color_array(colors)
+    factor = percentage / 100
+    return (rgb + (255 - rgb) * (1 - factor)).astype(np.int64)
+
+def create_color_harmony_array(colors, harmony_type="complementary"):
+    """Vectorized create_color_harmony: N x 3 colors to an N x M x 3 int array"""
+    hsv = rgb_to_hsv_array(colors)
+    harmonies = []
+    for offset in HARMONY_OFFSETS[harmony_type]:
+        shifted = hsv.copy()
+        shifted[:, 0] = np.mod(hsv[:, 0] + offset, 1.0)
+        harmonies.append((hsv_to_rgb_array(shifted) * 255).astype(np.int64))
+    return np.stack(harmonies, axis=1)
+
+# Perceptual color spaces: sRGB is linearized through a 256-entry table, so
+# converting uint8 pixels costs one lookup plus a 3 x 3 matrix product
+COLOR_SPACES = ("rgb", "lab", "oklab")
+
+SRGB_TO_LINEAR = np.array([
+    c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+    for c in np.arange(256) / 255
+], dtype=np.float32)
+
+# Linear sRGB -> CIE XYZ, rows divided by the D65 white point so white maps to (1, 1, 1)
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+]) / _D65_WHITE[:, None]
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ)
+
+# OKLab (Björn Ottosson): linear sRGB -> LMS, then cube roots -> Lab
+_RGB_TO_LMS = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+_LMS_TO_OKLAB = np.array([
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259040371, 0.7827717662, -0.8086757660],
+])
+_LMS_TO_RGB = np.linalg.inv(_RGB_TO_LMS)
+_OKLAB_TO_LMS = np.linalg.inv(_LMS_TO_OKLAB)
+
+_LAB_EPSILON = (6 / 29) ** 3
+
+# f(X), f(Y), f(Z) -> L, a, b as one matrix product plus an offset
+_F_TO_LAB = np.array([
+    [0, 500, 0],
+    [116, -500, 200],
+    [0, 0, -200],
+], dtype=np.float32)
+_LAB_OFFSET = np.array([-16, 0, 0], dtype=np.float32)
+
+def srgb_to_linear_array(colors):
+    """Linearize N x 3 sRGB colors (0-255); uint8 input goes through the lookup table"""
+    colors = np.asarray(colors).reshape((-1, 3))
+    if colors.dtype == np.uint8:
+        return SRGB_TO_LINEAR[colors]
+    c = colors.astype(np.float32) / 255
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+def linear_to_srgb_array(linear):
+    """Inverse of srgb_to_linear_array, clipped to the sRGB gamut as 0-255 floats"""
+    c = np.clip(np.asarray(linear, dtype=np.float64), 0, 1)
+    c = np.where(c <= 0.0031308, c * 12.92, 1.055 * c ** (1 / 2.4) - 0.055)
+    return np.clip(c * 255, 0, 255)
+
+def rgb_to_lab_array(colors):
+    """N x 3 sRGB colors (0-255) to CIELAB (D65)"""
+    xyz = srgb_to_linear_array(colors) @ _RGB_TO_XYZ.T.astype(np.float32)
+    f = np.cbrt(xyz)
+    # Only near-black channels take the linear segment, so patch them in place
+    dark = xyz <= _LAB_EPSILON
+    f[dark] = xyz[dark] / (3 * (6 / 29) ** 2) + 4 / 29
+    return f @ _F_TO_LAB + _LAB_OFFSET
+
+def lab_to_rgb_array(lab):
+    """CIELAB colors back to sRGB as 0-255 floats"""
+    lab = np.asarray(lab, dtype=np.float64).reshape((-1, 3))
+    fy = (lab[:, 0] + 16) / 116
+    f = np.stack([fy + lab[:, 1] / 500, fy, fy - lab[:, 2] / 200], axis=1)
+    xyz = np.where(f > 6 / 29, f ** 3, 3 * (6 / 29) ** 2 * (f - 4 / 29))
+    return linear_to_srgb_array(xyz @ _XYZ_TO_RGB.T)
+
+def rgb_to_oklab_array(colors):
+    """N x 3 sRGB colors (0-255) to OKLab"""
+    lms = srgb_to_linear_array(colors) @ _RGB_TO_LMS.T.astype(np.float32)
+    return np.cbrt(lms) @ _LMS_TO_OKLAB.T.astype(np.float32)
+
+def oklab_to_rgb_array(oklab):
+    """OKLab colors back to sRGB as 0-255 floats"""
+    lms = np.asarray(oklab, dtype=np.float64).reshape((-1, 3)) @ _OKLAB_TO_LMS.T
+    return linear_to_srgb_array(lms ** 3 @ _LMS_TO_RGB.T)
+
+def to_color_space(colors, color_space="rgb"):
+    """Convert N x 3 sRGB colors into the float32 coordinates clustered in color_space"""
+    if color_space == "rgb":
+        return np.asarray(colors).reshape((-1, 3)).astype(np.float32)
+    if color_space == "lab":
+        return rgb_to_lab_array(colors).astype(np.float32, copy=False)
+    if color_space == "oklab":
+        return rgb_to_oklab_array(colors).astype(np.float32, copy=False)
+    raise ValueError(f"Unknown color space: {color_space}")
+
+def from_color_space(values, color_space="rgb"):
+    """Map cluster centers from color_space back to sRGB (0-255 floats) for display"""
+    if color_space == "rgb":
+        return np.asarray(values, dtype=np.float64).reshape((-1, 3))
+    if color_space == "lab":
+        return lab_to_rgb_array(values)
+    if color_space == "oklab":
+        return oklab_to_rgb_array(values)
+    raise ValueError(f"Unknown color space: {color_space}")
+
+def sample_pixels(img_array, sample_size, method="uniform", random_state=42):
+    """Sample up to sample_size pixels from an H x W x 3 image array"""
+    h, w = img_array.shape[:2]
+    total = h * w
+    if sample_size is None or sample_size >= total:
+        return img_array.reshape((-1, 3))
+    
+    rng = np.random.default_rng(random_state)
+    
+    if method == "uniform":
+        indices = rng.choice(total, size=sample_size, replace=False)
+        return img_array.reshape((-1, 3))[indices]
+    
+    if method == "stratified":
+        # One random pixel per grid cell so every region of the image is represented
+        cell = max(1, int(np.sqrt(total / sample_size)))
+        rows = np.arange(0, h, cell)
+        cols = np.arange(0, w, cell)
+        row_idx = np.minimum(rows[:, None] + rng.integers(0, cell, (len(rows), len(cols))), h - 1)
+        col_idx = np.minimum(cols[None, :] + rng.integers(0, cell, (len(rows), len(cols))), w - 1)
+        sample = img_array[row_idx, col_idx].reshape((-1, 3))
+        # The grid rounds up, so trim back to the budget
+        if len(sample) > sample_size:
+            sample = sample[rng.choice(len(sample), size=sample_size, replace=False)]
+        return sample
+
+    raise ValueError(f"Unknown sample method: {method}")
+
+def nearest_centroid_counts(pixels, centroids, chunk_size=ASSIGN_CHUNK_PIXELS, color_space="rgb", progress=None):
+    """Count how many pixels fall closest to each centroid, in fixed-size chunks
+    
+    Pixels are sRGB; centroids are coordinates in color_space, and each chunk
+    is converted just before its distances are taken. progress, if given, is
+    called as progress("assign", fraction) before every chunk.
+    """
+    centroids = np.asarray(centroids, dtype=np.float32)
+    centroid_sq = (centroids ** 2).sum(axis=1)
+    counts = np.zeros(len(centroids), dtype=np.int64)
+    
+    for start in range(0, len(pixels), chunk_size):
+        if progress is not None:
+            progress("assign", start / len(pixels))
+        chunk = to_color_space(pixels[start:start + chunk_size], color_space)
+        # |x - c|^2 without the |x|^2 term, which does not change the argmin
+        distances = centroid_sq - 2 * chunk @ centroids.T
+        counts += np.bincount(distances.argmin(axis=1), minlength=len(centroids))
+    
+    return counts
+
+def extract_colors_kmeans(image, n_colors=5, sample_size=None, sample_method="uniform", color_space="rgb", stats=None,
+                          progress=None, n_init=10):
+    """Extract dominant colors using K-means clustering
+    
+    With sample_size set, centroids are fitted on a pixel sample and coverage
+    percentages come from one nearest-centroid pass over the whole image.
+    color_space "lab" or "oklab" clusters perceptually and maps the centers
+    back to sRGB. Pass a dict as stats to receive the sample size and timings,
+    and a progress(stage, fraction) callable to hear about the fit and assign stages.
+    """
+    from sklearn.cluster import KMeans
+    
+    start = time.perf_counter()
+    if progress is not None:
+        progress("fit", 0.0)
+    
+    # Convert image to RGB array
+    img_array = as_rgb_array(image)
+    total_pixels = img_array.shape[0] * img_array.shape[1]
+    
+    if sample_size is None or sample_size >= total_pixels:
+        img_array = img_array.reshape((-1, 3))
+        if color_space != "rgb":
+            img_array = to_color_space(img_array, color_space).astype(np.float64)
+        
+        # Apply K-means clustering
+        with stage("kmeans.fit", pixels=total_pixels, array_bytes=img_array.nbytes) as timer:
+            kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=n_init)
+            kmeans.fit(img_array)
+            timer.set(iterations=int(kmeans.n_iter_))
+        fit_done = time.perf_counter()
+        
+        colors = from_color_space(kmeans.cluster_centers_, color_space)
+        
+        # Get the percentage of each color
+        with stage("kmeans.assign", pixels=total_pixels):
+            label_counts = np.bincount(kmeans.labels_, minlength=len(colors))
+        fitted_pixels = total_pixels
+    else:
+        sample = sample_pixels(img_array, sample_size, sample_method)
+        if color_space != "rgb":
+            # Fit in float64, as scikit-learn does for the uint8 RGB sample
+            sample = to_color_space(sample, color_space).astype(np.float64)
+        
+        with stage("kmeans.fit", pixels=len(sample), array_bytes=sample.nbytes) as timer:
+            kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=n_init)
+            kmeans.fit(sample)
+            timer.set(iterations=int(kmeans.n_iter_))
+        fit_done = time.perf_counter()
+        
+        centers = kmeans.cluster_centers_
+        distance_bytes = min(total_pixels, ASSIGN_CHUNK_PIXELS) * len(centers) * 4
+        with stage("kmeans.assign", pixels=total_pixels, array_bytes=distance_bytes):
+            label_counts = nearest_centroid_counts(
+                img_array.reshape((-1, 3)), centers, color_space=color_space, progress=progress
+            )
+        colors = from_color_space(centers, color_space)
+        fitted_pixels = len(sample)
+    
+    percentages = label_counts / total_pixels * 100
+    
+    # Sort by percentage (most dominant first)
+    sorted_indices = np.argsort(percentages)[::-1]
+    
+    if stats is not None:
+        end = time.perf_counter()
+        stats.update({
+            "sample_size": fitted_pixels,
+            "total_pixels": total_pixels,
+            "sample_method": sample_method if fitted_pixels < total_pixels else "full",
+            "color_space": color_space,
+            "fit_seconds": fit_done - start,
+            "assign_seconds": end - fit_done,
+            "seconds": end - start,
+        })
+    
+    return [(colors[i], percentages[i]) for i in sorted_indices]
+
+def _color_keys(pixels):
+    # Pack each RGB triple into one uint32 key so np.unique works on a flat array
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape((-1, 3))
+    return (pixels[:, 0].astype(np.uint32) << 16) | (pixels[:, 1].astype(np.uint32) << 8) | pixels[:, 2]
+
+def unique_colors(pixels):
+    """Collapse an N x 3 uint8 pixel array to its distinct colors and their counts"""
+    keys, counts = np.unique(_color_keys(pixels), return_counts=True)
+    colors = np.stack([(keys >> 16) & 0xFF, (keys >> 8) & 0xFF, keys & 0xFF], axis=1).astype(np.uint8)
+    return colors, counts
+
+def has_few_colors(image, limit):
+    """Check whether the image has at most limit distinct colors (PIL stops counting past it)"""
+    if isinstance(image, np.ndarray):
+        # Sorting packed keys is several times faster than getcolors() on a converted copy
+        return len(np.unique(_color_keys(as_rgb_array(image)))) <= limit
+    return image.convert('RGB').getcolors(maxcolors=limit) is not None
+
+def cluster_weighted_colors(colors, weights, n_colors, color_space="rgb", budget=None, cost_model=None, stats=None):
+    """Weighted K-means over distinct colors, returning (centers, cluster weights)
+    
+    With budget (seconds), restarts run one at a time as in
+    extract_colors_budgeted() instead of a fixed n_init=10, and stats
+    receives the same restart and convergence fields.
+    """
+    from sklearn.cluster import KMeans
+    
+    if len(colors) <= n_colors:
+        # Nothing to cluster: every distinct color is its own palette entry
+        return np.asarray(colors, dtype=np.float64), np.asarray(weights)
+    
+    data = to_color_space(colors, color_space).astype(np.float64)
+    if budget is None:
+        kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10).fit(data, sample_weight=weights)
+    else:
+        start = time.perf_counter()
+        model = cost_model or load_cost_model()
+        usable = budget * (1 - BUDGET_HEADROOM)
+        max_iter = next(
+            (max_iter for max_iter in BUDGET_MAX_ITERS if model.fit_seconds(len(data), n_colors, max_iter) <= usable),
+            BUDGET_FLOOR_MAX_ITER,
+        )
+        kmeans, fit_stats = budgeted_restarts(data, n_colors, max_iter, start + usable, sample_weight=weights)
+        if stats is not None:
+            stats.update(fit_stats, budget_seconds=budget, calibrated=model.calibrated)
+    centers = from_color_space(kmeans.cluster_centers_, color_space)
+    # Percentages come straight from the weights of each cluster's members
+    return centers, np.bincount(kmeans.labels_, weights=weights, minlength=n_colors)
+
+def extract_colors_unique(image, n_colors=5, color_space="rgb", stats=None, progress=None, budget=None):
+    """Extract dominant colors with weighted K-means over the image's distinct colors
+    
+    Equivalent to clustering every pixel, but each distinct color is one
+    weighted row, so flat artwork and screenshots cluster in a fraction of the time.
+    With budget (seconds), restarts stop when the next one would not fit.
+    """
+    start = time.perf_counter()
+    if progress is not None:
+        progress("fit", 0.0)
+    
+    img_array = as_rgb_array(image)
+    total_pixels = img_array.shape[0] * img_array.shape[1]
+    with stage("unique.compress", pixels=total_pixels, array_bytes=total_pixels * 4) as timer:
+        colors, counts = unique_colors(img_array)
+        timer.set(unique_colors=len(colors))
+    compress_done = time.perf_counter()
+    
+    fit_stats = {}
+    with stage("unique.fit", colors=len(colors)):
+        remaining = None if budget is None else budget - (compress_done - start)
+        centers, label_counts = cluster_weighted_colors(colors, counts, n_colors, color_space, remaining,
+                                                        stats=fit_stats)
+    if fit_stats:
+        fit_stats["budget_seconds"] = budget
+    
+    percentages = label_counts / total_pixels * 100
+    
+    # Sort by percentage (most dominant first)
+    sorted_indices = np.argsort(percentages)[::-1]
+    
+    if stats is not None:
+        end = time.perf_counter()
+        stats.update({
+            "sample_size": len(colors),
+            "total_pixels": total_pixels,
+            "sample_method": "unique",
+            "unique_colors": len(colors),
+            "color_space": color_space,
+            **fit_stats,
+            "compress_seconds": compress_done - start,
+            "fit_seconds": end - compress_done,
+            "seconds": end - start,
+        })
+    
+    return [(centers[i], percentages[i]) for i in sorted_indices]
+
+def iter_row_bands(image, tile_pixels=STREAMING_TILE_PIXELS):
+    """Yield (top, bottom) row ranges covering roughly tile_pixels pixels each"""
+    width, height = image_dimensions(image)
+    band_rows = max(1, tile_pixels // max(1, width))
+    for top in range(0, height, band_rows):
+        yield top, min(height, top + band_rows)
+
+def read_row_band(image, top, bottom):
+    """Decode one row band of the image as an N x 3 uint8 array"""
+    if isinstance(image, np.ndarray):
+        return image[top:bottom].reshape((-1, 3))
+    band = image.crop((0, top, image.size[0], bottom)).convert('RGB')
+    return np.asarray(band).reshape((-1, 3))
+
+def extract_colors_streaming(image, n_colors=5, tile_pixels=STREAMING_TILE_PIXELS, color_space="rgb", stats=None,
+                             progress=None, budget=None, cost_model=None):
+    """Extract dominant colors with MiniBatchKMeans fed one row band at a time
+    
+    Only a single band is ever converted to an array, so peak working memory
+    depends on tile_pixels rather than on the image size. With budget
+    (seconds), fitting stops at a deadline and coverage is measured on as
+    many randomly ordered bands as plan_budgeted_fit() allows.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    
+    start = time.perf_counter()
+    width, height = image_dimensions(image)
+    bands = list(iter_row_bands(image, tile_pixels))
+    
+    # Visit bands in a shuffled order so early batches are not all from the top of the image
+    rng = np.random.default_rng(42)
+    order = rng.permutation(len(bands))
+    
+    coverage_pixels = width * height
+    fit_deadline = None
+    budget_exhausted = False
+    if budget is not None:
+        model = cost_model or load_cost_model()
+        _, _, coverage_pixels = plan_budgeted_fit(width * height, n_colors, budget, color_space, model)
+        fit_deadline = start + budget * (1 - BUDGET_HEADROOM) - model.assign_seconds(coverage_pixels, n_colors, color_space)
+    
+    kmeans = MiniBatchKMeans(n_clusters=n_colors, random_state=42, n_init=3)
+    pending = None
+    peak_band_bytes = 0
+    with stage("streaming.fit", pixels=width * height) as timer:
+        for step, band_index in enumerate(order):
+            if fit_deadline is not None and hasattr(kmeans, "cluster_centers_") and time.perf_counter() >= fit_deadline:
+                budget_exhausted = True
+                break
+            if progress is not None:
+                progress("fit", step / len(order))
+            pixels = to_color_space(read_row_band(image, *bands[band_index]), color_space)
+            peak_band_bytes = max(peak_band_bytes, pixels.nbytes)
+            # The first partial_fit needs at least n_colors rows, so tiny bands are merged with the next one
+            if pending is not None:
+                pixels = np.concatenate([pending, pixels])
+                pending = None
+            if len(pixels) < n_colors:
+                pending = pixels
+                continue
+            kmeans.partial_fit(pixels)
+        if pending is not None:
+            kmeans.partial_fit(pending)
+        timer.set(iterations=int(kmeans.n_steps_), array_bytes=peak_band_bytes, tiles=len(bands))
+    fit_done = time.perf_counter()
+    
+    centers = kmeans.cluster_centers_
+    
+    # Build up label counts band by band; under a budget, from the shuffled bands until coverage_pixels
+    label_counts = np.zeros(len(centers), dtype=np.int64)
+    coverage_bands = bands if coverage_pixels >= width * height else [bands[i] for i in order]
+    distance_bytes = min(tile_pixels, ASSIGN_CHUNK_PIXELS) * len(centers) * 4
+    with stage("streaming.assign", array_bytes=distance_bytes) as timer:
+        for step, (top, bottom) in enumerate(coverage_bands):
+            if label_counts.sum() >= coverage_pixels:
+                break
+            if progress is not None:
+                progress("assign", step / len(coverage_bands))
+            label_counts += nearest_centroid_counts(read_row_band(image, top, bottom), centers, color_space=color_space)
+        timer.set(pixels=int(label_counts.sum()))
+    colors = from_color_space(centers, color_space)
+    
+    total_pixels = width * height
+    percentages = label_counts / label_counts.sum() * 100
+    
+    # Sort by percentage (most dominant first)
+    sorted_indices = np.argsort(percentages)[::-1]
+    
+    if stats is not None:
+        end = time.perf_counter()
+        stats.update({
+            "sample_size": total_pixels,
+            "total_pixels": total_pixels,
+            "sample_method": "streaming",
+            "tiles": len(bands),
+            "color_space": color_space,
+            "peak_tile_bytes": peak_band_bytes,
+            "coverage_pixels": int(label_counts.sum()),
+            "fit_seconds": fit_done - start,
+            "assign_seconds": end - fit_done,
+            "seconds": end - start,
+        })
+        if budget is not None:
+            stats.update({"budget_seconds": budget, "budget_exhausted": budget_exhausted})
+    
+    return [(colors[i], percentages[i]) for i in sorted_indices]
+
+class CostModel:
+    """Predicted seconds for the parts of a K-means extraction on this machine
+    
+    fit: one K-means restart of n pixels into k clusters running `iterations`
+    Lloyd iterations, a + b*n*k + c*n*k*iterations. assign: one nearest-centroid
+    coverage pass over n pixels, a + b*n + c*n*k, per color space (b covers
+    the color conversion). Fitted by calibrate_cost_model().
+    """
+    
+    def __init__(self, fit=DEFAULT_FIT_COST, assign=None, calibrated=False, info=None):
+        self.fit = tuple(fit)
+        self.assign = {color_space: tuple(cost) for color_space, cost in (assign or DEFAULT_ASSIGN_COST).items()}
+        self.calibrated = calibrated
+        self.info = info or {}
+    
+    def fit_seconds(self, n, k, iterations):
+        a, b, c = self.fit
+        return a + b * n * k + c * n * k * iterations
+    
+    def assign_seconds(self, n, k, color_space="rgb"):
+        a, b, c = self.assign.get(color_space, self.assign["rgb"])
+        return a + b * n + c * n * k
+    
+    def to_dict(self):
+        return {"fit": list(self.fit), "assign": {space: list(cost) for space, cost in self.assign.items()},
+                "calibrated": self.calibrated, "info": self.info}
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["fit"], data["assign"], data.get("calibrated", True), data.get("info"))
+    
+    def save(self, path=None):
+        """Write the model as JSON (to COST_MODEL_PATH by default)"""
+        path = path or COST_MODEL_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(temp_path, path)
+
+def load_cost_model(path=None):
+    """The calibrated cost model at path (COST_MODEL_PATH by default), or the built-in defaults"""
+    try:
+        with open(path or COST_MODEL_PATH, encoding="utf-8") as f:
+            return CostModel.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return CostModel()
+
+def calibration_image(width=1000, height=1000, seed=0):
+    """Synthetic photo-like H x W x 3 uint8 image: smooth color waves plus sensor-style noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width] / max(width, height)
+    waves = [np.sin(x * rng.uniform(2, 8) + y * rng.uniform(2, 8) + rng.uniform(0, 6)) for _ in range(3)]
+    image = (np.stack(waves, axis=-1) + 1) * 110 + rng.normal(0, 12, (height, width, 3))
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def _fit_relative(rows, seconds):
+    """Non-negative least squares on relative error, so short runs count as much as long ones"""
+    from scipy.optimize import nnls
+    
+    rows = np.asarray(rows, dtype=np.float64)
+    seconds = np.asarray(seconds, dtype=np.float64)
+    coefficients, _ = nnls(rows / seconds[:, None], np.ones(len(seconds)))
+    return tuple(float(c) for c in coefficients)
+
+def calibrate_cost_model(sample_sizes=(5_000, 20_000, 50_000, 100_000), cluster_counts=(3, 6, 12),
+                         coverage_sizes=(250_000, 1_000_000), color_spaces=COLOR_SPACES, repeat=2, progress=None):
+    """Time K-means restarts and coverage passes on a synthetic image and fit a CostModel to them
+    
+    progress, if given, is called as progress(stage, fraction) as the
+    "fit" and "assign" timings proceed.
+    """
+    from sklearn.cluster import KMeans
+    
+    image = calibration_image()
+    pixels = image.reshape((-1, 3))
+    
+    fit_rows, fit_seconds = [], []
+    runs = [(n, k, seed) for n in sample_sizes for k in cluster_counts for seed in range(repeat)]
+    for step, (n, k, seed) in enumerate(runs):
+        if progress is not None:
+            progress("fit", step / len(runs))
+        sample = sample_pixels(image, n, KMEANS_SAMPLE_METHOD, random_state=seed).astype(np.float64)
+        start = time.perf_counter()
+        kmeans = KMeans(n_clusters=k, n_init=1, random_state=seed).fit(sample)
+        fit_seconds.append(time.perf_counter() - start)
+        fit_rows.append((1.0, n * k, n * k * kmeans.n_iter_))
+    
+    assign = {}
+    runs = [(n, k, seed) for n in coverage_sizes for k in cluster_counts for seed in range(repeat)]
+    for space_index, color_space in enumerate(color_spaces):
+        assign_rows, assign_seconds = [], []
+        for step, (n, k, seed) in enumerate(runs):
+            if progress is not None:
+                progress("assign", (space_index * len(runs) + step) / (len(color_spaces) * len(runs)))
+            centers = to_color_space(pixels[np.random.default_rng(seed).choice(len(pixels), k)], color_space)
+            start = time.perf_counter()
+            nearest_centroid_counts(pixels[:n], centers, color_space=color_space)
+            assign_seconds.append(time.perf_counter() - start)
+            assign_rows.append((1.0, n, n * k))
+        assign[color_space] = _fit_relative(assign_rows, assign_seconds)
+    
+    info = {"calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "cpu_count": os.cpu_count()}
+    return CostModel(_fit_relative(fit_rows, fit_seconds), assign, calibrated=True, info=info)
+
+def plan_budgeted_fit(total_pixels, n_colors, budget, color_space="rgb", cost_model=None):
+    """Choose (sample_size, max_iter, coverage_pixels) so one restart plus coverage fits the budget
+    
+    Coverage gets every pixel unless that would take more than
+    BUDGET_ASSIGN_SHARE of the budget. The fit then takes the largest
+    sample whose worst-case restart (at one of BUDGET_MAX_ITERS) fits the
+    rest, falling back to the smallest sample at BUDGET_FLOOR_MAX_ITER.
+    """
+    model = cost_model or load_cost_model()
+    usable = budget * (1 - BUDGET_HEADROOM)
+    
+    coverage_pixels = total_pixels
+    assign_cost = model.assign_seconds(total_pixels, n_colors, color_space)
+    if assign_cost > usable * BUDGET_ASSIGN_SHARE:
+        per_pixel = (assign_cost - model.assign_seconds(0, n_colors, color_space)) / total_pixels
+        affordable = int(usable * BUDGET_ASSIGN_SHARE / per_pixel) if per_pixel > 0 else total_pixels
+        coverage_pixels = min(total_pixels, max(BUDGET_SAMPLE_SIZES[-1], affordable))
+        assign_cost = model.assign_seconds(coverage_pixels, n_colors, color_space)
+    fit_budget = usable - assign_cost
+    
+    sizes = sorted({min(size, total_pixels) for size in BUDGET_SAMPLE_SIZES}, reverse=True)
+    for size in sizes:
+        for max_iter in BUDGET_MAX_ITERS:
+            if model.fit_seconds(size, n_colors, max_iter) <= fit_budget:
+                return size, max_iter, coverage_pixels
+    return sizes[-1], BUDGET_FLOOR_MAX_ITER, coverage_pixels
+
+def budgeted_restarts(data, n_colors, max_iter, deadline, sample_weight=None, progress=None):
+    """Run K-means restarts one at a time until deadline (a perf_counter() time), returning (best fit, stats)
+    
+    Each restart gets a fresh seed. Restarts stop after BUDGET_MAX_INIT or
+    when the time left no longer covers as many iterations (at the slowest
+    rate measured so far) as a typical (median) earlier restart needed. Each
+    later restart's max_iter is lowered to what the time left allows, so it
+    cannot overrun the deadline. The lowest-inertia fit wins. The first
+    restart always runs, so an impossible deadline still returns a fit.
+    stats holds max_iter, n_init, whether the best fit converged within the
+    cap it ran with, its inertia per row and whether the deadline cut
+    refinement short.
+    """
+    from sklearn.cluster import KMeans
+    
+    start = time.perf_counter()
+    best = None
+    best_max_iter = max_iter
+    restarts = 0
+    iterations = 0
+    budget_exhausted = False
+    # Slowest measured seconds per iteration (initialization included) and the iterations each restart needed
+    iteration_seconds = 0.0
+    restart_iterations = []
+    with stage("budget.fit", pixels=len(data), array_bytes=data.nbytes) as timer:
+        while restarts < BUDGET_MAX_INIT:
+            now = time.perf_counter()
+            restart_max_iter = max_iter
+            if restarts:
+                # Predict the next restart from the ones that ran, and cap it to the time left
+                restart_max_iter = min(max_iter, int((deadline - now) / iteration_seconds))
+                if restart_max_iter < np.median(restart_iterations):
+                    budget_exhausted = True
+                    break
+            if progress is not None:
+                progress("fit", min(1.0, (now - start) / max(deadline - start, 1e-9)))
+            kmeans = KMeans(n_clusters=n_colors, n_init=1, max_iter=restart_max_iter, random_state=42 + restarts)
+            kmeans.fit(data, sample_weight=sample_weight)
+            iteration_seconds = max(iteration_seconds, (time.perf_counter() - now) / kmeans.n_iter_)
+            restart_iterations.append(kmeans.n_iter_)
+            restarts += 1
+            iterations += kmeans.n_iter_
+            if best is None or kmeans.inertia_ < best.inertia_:
+                best, best_max_iter = kmeans, restart_max_iter
+        timer.set(iterations=iterations, restarts=restarts)
+    
+    weight_total = len(data) if sample_weight is None else float(np.sum(sample_weight))
+    return best, {
+        "max_iter": max_iter,
+        "n_init": restarts,
+        "converged": bool(best.n_iter_ < best_max_iter),
+        "inertia": float(best.inertia_ / weight_total),
+        "budget_exhausted": budget_exhausted,
+    }
+
+def extract_colors_budgeted(image, n_colors=5, budget=DEFAULT_BUDGET_SECONDS, color_space="rgb", cost_model=None,
+                            stats=None, progress=None):
+    """Extract dominant colors with K-means sized by a cost model to finish within budget seconds
+    
+    plan_budgeted_fit() picks the sample size, iteration cap and coverage
+    pass, and budgeted_restarts() runs as many restarts as the time before
+    the coverage pass allows. stats reports the quality of the result:
+    sample and coverage sizes, restarts, inertia per sampled pixel, whether
+    the best fit converged and whether the deadline cut refinement short.
+    """
+    start = time.perf_counter()
+    model = cost_model or load_cost_model()
+    img_array = as_rgb_array(image)
+    pixels = img_array.reshape((-1, 3))
+    total_pixels = len(pixels)
+    sample_size, max_iter, coverage_pixels = plan_budgeted_fit(total_pixels, n_colors, budget, color_space, model)
+    
+    fit_deadline = start + budget * (1 - BUDGET_HEADROOM) - model.assign_seconds(coverage_pixels, n_colors, color_space)
+    sample = sample_pixels(img_array, sample_size, KMEANS_SAMPLE_METHOD)
+    data = to_color_space(sample, color_space).astype(np.float64)
+    best, fit_stats = budgeted_restarts(data, n_colors, max_iter, fit_deadline, progress=progress)
+    fit_done = time.perf_counter()
+    
+    if coverage_pixels < total_pixels:
+        coverage = pixels[np.random.default_rng(42).integers(0, total_pixels, coverage_pixels)]
+    else:
+        coverage = pixels
+    distance_bytes = min(len(coverage), ASSIGN_CHUNK_PIXELS) * n_colors * 4
+    with stage("budget.assign", pixels=len(coverage), array_bytes=distance_bytes):
+        label_counts = nearest_centroid_counts(coverage, best.cluster_centers_, color_space=color_space, progress=progress)
+    colors = from_color_space(best.cluster_centers_, color_space)
+    
+    percentages = label_counts / len(coverage) * 100
+    
+    # Sort by percentage (most dominant first)
+    sorted_indices = np.argsort(percentages)[::-1]
+    
+    if stats is not None:
+        end = time.perf_counter()
+        stats.update({
+            "sample_size": len(data),
+            "total_pixels": total_pixels,
+            "sample_method": KMEANS_SAMPLE_METHOD if len(data) < total_pixels else "full",
+            "color_space": color_space,
+            "budget_seconds": budget,
+            "coverage_pixels": len(coverage),
+            **fit_stats,
+            "calibrated": model.calibrated,
+            "fit_seconds": fit_done - start,
+            "assign_seconds": end - fit_done,
+            "seconds": end - start,
+        })
+    
+    return [(colors[i], percentages[i]) for i in sorted_indices]
+
+def extract_palette(image, n_colors=5, color_space="rgb", stats=None, progress=None, budget=None):
+    """Extract colors with the engine best suited to the image
+    
+    K-Means Clustering by default; very large uploads stream through MiniBatchKMeans
+    and artwork with few distinct colors clusters its color histogram instead.
+    With budget (seconds), every engine is sized to finish within it
+    (extract_colors_budgeted for sampled K-means).
+    """
+    width, height = image_dimensions(image)
+    if width * height > STREAMING_THRESHOLD_PIXELS:
+        return extract_colors_streaming(image, n_colors, color_space=color_space, stats=stats, progress=progress,
+                                        budget=budget)
+    if has_few_colors(image, KMEANS_SAMPLE_SIZE):
+        return extract_colors_unique(image, n_colors, color_space=color_space, stats=stats, progress=progress,
+                                     budget=budget)
+    if budget is not None:
+        return extract_colors_budgeted(image, n_colors, budget, color_space=color_space, stats=stats, progress=progress)
+    return extract_colors_kmeans(
+        image,
+        n_colors,
+        sample_size=KMEANS_SAMPLE_SIZE,
+        sample_method=KMEANS_SAMPLE_METHOD,
+        color_space=color_space,
+        stats=stats,
+        progress=progress
+    )
+
+def ward_merge_levels(centers, weights):
+    """Agglomerate weighted cluster centers with Ward's criterion
+    
+    Yields (centers, weights) for every cluster count from len(centers) down
+    to 1. Each step joins the pair whose merge adds the least within-cluster
+    variance, w_i * w_j / (w_i + w_j) * |c_i - c_j|^2.
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape((-1, 3))
+    weights = np.asarray(weights, dtype=np.float64)
+    yield centers, weights
+    
+    while len(centers) > 1:
+        distances = ((centers[:, None] - centers[None]) ** 2).sum(axis=-1)
+        totals = weights[:, None] + weights[None]
+        costs = np.divide(weights[:, None] * weights[None] * distances, totals,
+                          out=np.zeros_like(distances), where=totals > 0)
+        np.fill_diagonal(costs, np.inf)
+        i, j = np.unravel_index(costs.argmin(), costs.shape)
+        
+        total = weights[i] + weights[j]
+        merged = (centers[i] * weights[i] + centers[j] * weights[j]) / total if total > 0 else centers[i]
+        keep = np.ones(len(centers), dtype=bool)
+        keep[[i, j]] = False
+        centers = np.vstack([centers[keep], merged])
+        weights = np.append(weights[keep], total)
+        yield centers, weights
+
+def build_palette_tree(image, max_colors=PALETTE_TREE_MAX_COLORS, color_space="rgb", stats=None, progress=None,
+                       budget=None):
+    """Extract max_colors once and derive every smaller palette by merging
+    
+    Returns {n_colors: [(color, percentage), ...]} for 1..max_colors (fewer
+    when the image has fewer distinct colors). The levels nest: each palette
+    joins two colors of the next larger one, merged by pixel weight in
+    color_space, so any palette size is a dictionary lookup. budget is
+    passed on to extract_palette().
+    """
+    start = time.perf_counter()
+    colors = extract_palette(image, max_colors, color_space=color_space, stats=stats, progress=progress, budget=budget)
+    merge_start = time.perf_counter()
+    
+    with stage("tree.merge") as timer:
+        tree = {len(colors): colors}
+        centers = to_color_space(np.array([color for color, _ in colors], dtype=np.float64), color_space)
+        percentages = np.array([percentage for _, percentage in colors], dtype=np.float64)
+        for level_centers, level_percentages in ward_merge_levels(centers, percentages):
+            if len(level_centers) in tree:
+                continue
+            level_colors = from_color_space(level_centers, color_space)
+            order = np.argsort(level_percentages)[::-1]
+            tree[len(level_centers)] = [(level_colors[i], level_percentages[i]) for i in order]
+        timer.set(iterations=len(tree))
+    
+    if stats is not None:
+        end = time.perf_counter()
+        stats.update({
+            "tree_levels": len(tree),
+            "merge_seconds": end - merge_start,
+            "seconds": end - start,
+        })
+    
+    return tree
+
+def palette_from_tree(tree, n_colors):
+    """Look up the n_colors palette, or the largest one when the tree is smaller"""
+    return tree[min(n_colors, max(tree))]
+
+def tile_boxes(image, rows, cols):
+    """(row, col, (left, top, right, bottom)) for a rows x cols grid over the image"""
+    width, height = image_dimensions(image)
+    xs = np.linspace(0, width, cols + 1).astype(int)
+    ys = np.linspace(0, height, rows + 1).astype(int)
+    return [
+        (row, col, (int(xs[col]), int(ys[row]), int(xs[col + 1]), int(ys[row + 1])))
+        for row in range(rows) for col in range(cols)
+    ]
+
+def _tile_palette(tile, n_colors, sample_size, color_space):
+    """Extract one tile's palette: unique colors for flat tiles, sampled K-means otherwise"""
+    if has_few_colors(tile, sample_size):
+        return extract_colors_unique(tile, n_colors, color_space=color_space)
+    return extract_colors_kmeans(
+        tile, n_colors, sample_size=sample_size, sample_method=KMEANS_SAMPLE_METHOD, color_space=color_space,
+        n_init=TILE_KMEANS_N_INIT
+    )
+
+# Set in each tile worker process by its pool initializer
+_native_thread_limit = None
+
+def _limit_native_threads():
+    """Tile pool initializer: cap BLAS/OpenMP at one thread in this worker process only"""
+    global _native_thread_limit
+    from threadpoolctl import threadpool_limits
+    _native_thread_limit = threadpool_limits(limits=1)
+
+def extract_tile_palettes(image, grid=(4, 4), n_colors=5, tile_colors=4, color_space="rgb", workers=None,
+                          alpha=None, exclude_background=False, stats=None, progress=None):
+    """Extract a palette per grid tile in parallel and merge them into a global palette
+    
+    Each worker process clusters a single tile (with native thread pools
+    capped at one thread in the workers only, so parallelism comes from the
+    tiles while other extractions in the calling process keep their
+    threads), sampling its share of KMEANS_SAMPLE_SIZE. The tile colors,
+    weighted by the pixels they cover, are Ward-merged into n_colors global
+    colors. alpha and exclude_background drop the same pixels mask_pixels()
+    would, tile by tile, so the tile map agrees with the global palette; a
+    tile with nothing left has an empty palette.
+    
+    Returns {"grid", "size", "palette", "tiles"}, where every tile has its
+    "box", its own "palette" and "shares", the percentage of the tile
+    covered by each global color.
+    """
+    start = time.perf_counter()
+    img_array, own_alpha = split_alpha(image)
+    keep, _, _, _ = pixel_mask(img_array, own_alpha if alpha is None else alpha, exclude_background=exclude_background)
+    rows, cols = grid
+    boxes = tile_boxes(img_array, rows, cols)
+    sample_size = max(TILE_MIN_SAMPLE_SIZE, KMEANS_SAMPLE_SIZE // len(boxes))
+    # The pool is shared by every call, so its size does not depend on this grid
+    workers = workers or os.cpu_count() or 1
+    
+    # loky (shipped with scikit-learn's joblib) keeps one worker pool alive between calls and, unlike
+    # multiprocessing's spawn, does not re-run the Streamlit script in the workers
+    from joblib.externals.loky import get_reusable_executor
+    
+    tile_results = [[] for _ in boxes]
+    tile_pixels = []
+    executor = get_reusable_executor(max_workers=workers, initializer=_limit_native_threads)
+    futures = {}
+    try:
+        for i, (_, _, (left, top, right, bottom)) in enumerate(boxes):
+            tile = img_array[top:bottom, left:right]
+            if keep is not None:
+                # Masked tiles are clustered as the 1 x N x 3 array of their remaining pixels
+                tile = tile[keep[top:bottom, left:right]][None]
+            tile_pixels.append(tile.shape[0] * tile.shape[1])
+            if tile_pixels[-1]:
+                futures[executor.submit(_tile_palette, tile, tile_colors, sample_size, color_space)] = i
+        for done, future in enumerate(as_completed(futures)):
+            tile_results[futures[future]] = future.result()
+            if progress is not None:
+                progress("fit", (done + 1) / len(futures))
+    except BaseException:
+        # A cancelled job (progress raised) leaves no queued tiles behind in the shared pool
+        for future in futures:
+            future.cancel()
+        raise
+    fit_done = time.perf_counter()
+    
+    # Weight every tile color by the share of the (kept) image it covers
+    total_pixels = sum(tile_pixels)
+    centers = []
+    weights = []
+    for pixels, palette in zip(tile_pixels, tile_results):
+        for color, percentage in palette:
+            centers.append(color)
+            weights.append(percentage * pixels / total_pixels)
+    
+    # Tiles that found the same 8-bit color contribute one center, so a flat image yields one global color
+    # instead of n_colors identical swatches (joining identical centers costs nothing, so Ward would stop early)
+    colors = np.array(centers, dtype=np.float64)
+    weights = np.array(weights, dtype=np.float64)
+    _, group = np.unique(np.round(colors).astype(np.int16), axis=0, return_inverse=True)
+    group = group.ravel()
+    group_weights = np.bincount(group, weights=weights)
+    group_colors = np.stack([np.bincount(group, weights=colors[:, c] * weights) for c in range(3)], axis=1)
+    group_colors /= np.where(group_weights > 0, group_weights, 1)[:, None]
+    centers = to_color_space(group_colors, color_space)
+    
+    for global_centers, global_weights in ward_merge_levels(centers, group_weights):
+        if len(global_centers) <= n_colors:
+            break
+    order = np.argsort(global_weights)[::-1]
+    global_centers = global_centers[order]
+    global_colors = from_color_space(global_centers, color_space)
+    
+    # Attribute each tile color to its nearest global color
+    tiles = []
+    for (row, col, box), palette in zip(boxes, tile_results):
+        tile_centers = to_color_space(np.array([color for color, _ in palette], dtype=np.float64).reshape((-1, 3)), color_space)
+        nearest = ((tile_centers[:, None] - global_centers[None]) ** 2).sum(axis=-1).argmin(axis=1)
+        shares = np.bincount(nearest, weights=[percentage for _, percentage in palette], minlength=len(global_centers))
+        tiles.append({"row": row, "col": col, "box": box, "palette": palette, "shares": shares})
+    
+    if stats is not None:
+        end = time.perf_counter()
+        stats.update({
+            "tiles": len(boxes),
+            "workers": workers,
+            "tile_sample_size": sample_size,
+            "total_pixels": total_pixels,
+            "color_space": color_space,
+            "fit_seconds": fit_done - start,
+            "merge_seconds": end - fit_done,
+            "seconds": end - start,
+        })
+    
+    return {
+        "grid": (rows, cols),
+        "size": image_dimensions(img_array),
+        "palette": [(global_colors[i], global_weights[j]) for i, j in enumerate(order)],
+        "tiles": tiles,
+    }
+
+def _median_cut_boxes(coords, counts, n_boxes, volume_phase=0.75):
+    """Split occupied histogram bins into up to n_boxes boxes by median cut
+    
+    coords is an M x 3 array of bin coordinates and counts their pixel counts.
+    The first volume_phase of the splits pick the most populated box, the rest
+    weigh population by box volume (as in MMCQ), so large sparse regions of
+    color space still get their own entry.
+    """
+    boxes = [np.arange(len(coords))]
+    count_phase_boxes = max(1, int(n_boxes * volume_phase))
+    
+    while len(boxes) < n_boxes:
+        use_volume = len(boxes) >= count_phase_boxes
+        best, best_priority = None, -1
+        for i, box in enumerate(boxes):
+            if len(box) < 2:
+                continue
+            priority = counts[box].sum()
+            if use_volume:
+                extent = coords[box].max(axis=0) - coords[box].min(axis=0) + 1
+                priority *= int(np.prod(extent))
+            if priority > best_priority:
+                best, best_priority = i, priority
+        if best is None:
+            break  # every box is a single bin
+        
+        box = boxes.pop(best)
+        box_coords = coords[box]
+        axis = np.argmax(box_coords.max(axis=0) - box_coords.min(axis=0))
+        box = box[np.argsort(box_coords[:, axis], kind='stable')]
+        
+        # Cut at the pixel-weighted median, keeping both halves non-empty
+        cumulative = np.cumsum(counts[box])
+        cut = int(np.searchsorted(cumulative, cumulative[-1] / 2)) + 1
+        cut = min(max(cut, 1), len(box) - 1)
+        boxes.extend([box[:cut], box[cut:]])
+    
+    return boxes
+
+def color_histogram(pixels):
+    """5-bit-per-channel histogram of N x 3 uint8 pixels
+    
+    Returns (counts, sums): pixel counts for all 32768 bins and the per-bin
+    channel sums (32768 x 3), so histograms of several images can be added
+    together and every bin still knows the mean of its actual pixels.
+    """
+    quantized = (pixels >> 3).astype(np.int32)
+    keys = (quantized[:, 0] << 10) | (quantized[:, 1] << 5) | quantized[:, 2]
+    counts = np.bincount(keys, minlength=1 << 15)
+    sums = np.stack([np.bincount(keys, weights=pixels[:, c], minlength=1 << 15) for c in range(3)], axis=1)
+    return counts, sums
+
+def median_cut_histogram(counts, sums, n_colors):
+    """Median-cut a color_histogram() into (centers, box_counts)"""
+    occupied = np.flatnonzero(counts)
+    coords = np.stack([occupied >> 10, (occupied >> 5) & 31, occupied & 31], axis=1)
+    occupied_counts = counts[occupied]
+    occupied_sums = sums[occupied]
+    
+    boxes = _median_cut_boxes(coords, occupied_counts, n_colors)
+    box_counts = np.array([occupied_counts[box].sum() for box in boxes])
+    centers = np.array([occupied_sums[box].sum(axis=0) for box in boxes]) / box_counts[:, None]
+    return centers, box_counts
+
+def extract_colors_median_cut(image, n_colors=5, quality=1, stats=None):
+    """Extract dominant colors with an in-process median-cut quantizer
+    
+    Pixels are binned into a 5-bit-per-channel histogram and the occupied bins
+    are split by median cut. quality is a pixel stride (1 visits every pixel).
+    Each pixel belongs to exactly one box, so percentages are real coverage.
+    """
+    start = time.perf_counter()
+    
+    img_array = as_rgb_array(image).reshape((-1, 3))
+    pixels = img_array[::max(1, int(quality))]
+    
+    with stage("median_cut.histogram", pixels=len(pixels), array_bytes=len(pixels) * 4):
+        hist, sums = color_histogram(pixels)
+    with stage("median_cut.split", n_colors=n_colors):
+        centers, box_counts = median_cut_histogram(hist, sums, n_colors)
+    
+    percentages = box_counts / len(pixels) * 100
+    
+    # Sort by percentage (most dominant first)
+    sorted_indices = np.argsort(percentages)[::-1]
+    
+    if stats is not None:
+        stats.update({
+            "sample_size": len(pixels),
+            "total_pixels": len(img_array),
+            "sample_method": "stride" if len(pixels) < len(img_array) else "full",
+            "histogram_bins": int(np.count_nonzero(hist)),
+            "seconds": time.perf_counter() - start,
+        })
+    
+    return [(centers[i], percentages[i]) for i in sorted_indices]
+
+def iter_animation_frames(source, frame_step=1, max_frames=ANIMATION_MAX_FRAMES, max_pixels=ANIMATION_FRAME_PIXELS):
+    """Yield (frame_index, duration_ms, H x W x 3 uint8 array) for an animated GIF, APNG or WebP
+    
+    Every frame_step-th frame is converted, up to max_frames of them, each
+    shrunk with reduce() to about max_pixels. Frames are decoded one at a
+    time, so memory does not grow with the length of the animation. Frames
+    with transparency are H x W x 4 RGBA instead (see split_alpha).
+    """
+    with Image.open(source) as image:
+        yielded = 0
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            if index % frame_step:
+                continue
+            if yielded >= max_frames:
+                break
+            duration = frame.info.get("duration", 0) or 0
+            converted = frame.convert("RGBA" if frame.has_transparency_data else "RGB")
+            factor = int(np.sqrt(converted.size[0] * converted.size[1] / max_pixels)) if max_pixels else 1
+            if factor >= 2:
+                converted = converted.reduce(factor)
+            yield index, duration, np.asarray(converted)
+            yielded += 1
+
+def extract_animation_palette(source, n_colors=5, frame_colors=None, frame_step=1, max_frames=ANIMATION_MAX_FRAMES,
+                              max_pixels=ANIMATION_FRAME_PIXELS, color_space="rgb", stats=None, progress=None):
+    """Extract the overall palette of an animation plus a palette for every sampled frame
+    
+    Frames are streamed into one running color_histogram(), weighted by how
+    long each frame stays on screen, and only the histogram is kept. Pixels
+    less opaque than ALPHA_MIN_OPACITY are left out, so a frame counts in
+    proportion to its visible area. The aggregate palette is weighted
+    K-means over the occupied bins. Each frame also gets a quick median-cut
+    palette of frame_colors (default n_colors) colors of its visible pixels
+    for the timeline; a fully transparent frame gets an empty one.
+    
+    Returns {"palette", "timeline", "frames", "sampled_frames"}, where each
+    timeline entry holds the "frame" index, its "duration" in ms and its "palette".
+    """
+    start = time.perf_counter()
+    frame_colors = frame_colors or n_colors
+    
+    with Image.open(source) as image:
+        total_frames = getattr(image, "n_frames", 1)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    budget = min(max_frames, -(-total_frames // frame_step))
+    
+    counts = np.zeros(1 << 15, dtype=np.float64)
+    sums = np.zeros((1 << 15, 3), dtype=np.float64)
+    timeline = []
+    total_pixels = transparent_pixels = 0
+    for step, (index, duration, frame) in enumerate(
+        iter_animation_frames(source, frame_step, max_frames, max_pixels)
+    ):
+        if progress is not None:
+            progress("decode", step / budget)
+        rgb, alpha = split_alpha(frame)
+        pixels = rgb.reshape((-1, 3))
+        frame_pixels = len(pixels)
+        if alpha is not None:
+            pixels = pixels[alpha.ravel() >= ALPHA_MIN_OPACITY]
+        total_pixels += frame_pixels
+        transparent_pixels += frame_pixels - len(pixels)
+        entry = {"frame": index, "duration": duration, "palette": []}
+        timeline.append(entry)
+        if not len(pixels):
+            continue
+        frame_counts, frame_sums = color_histogram(pixels)
+        
+        # Frames without a duration (stills, some encoders) count as one unit of screen
+        # time, spread over the whole frame so transparent areas add nothing
+        weight = (duration or 1) / frame_pixels
+        counts += frame_counts * weight
+        sums += frame_sums * weight
+        
+        centers, box_counts = median_cut_histogram(frame_counts, frame_sums, frame_colors)
+        order = np.argsort(box_counts)[::-1]
+        entry["palette"] = [(centers[i], box_counts[i] / len(pixels) * 100) for i in order]
+    decode_done = time.perf_counter()
+    
+    if progress is not None:
+        progress("fit", 0.0)
+    occupied = np.flatnonzero(counts)
+    palette = []
+    if len(occupied):
+        bin_colors = sums[occupied] / counts[occupied, None]
+        centers, weights = cluster_weighted_colors(bin_colors, counts[occupied], n_colors, color_space)
+        percentages = weights / weights.sum() * 100
+        palette = [(centers[i], percentages[i]) for i in np.argsort(percentages)[::-1]]
+    
+    if stats is not None:
+        end = time.perf_counter()
+        stats.update({
+            "frames": total_frames,
+            "sampled_frames": len(timeline),
+            "frame_step": frame_step,
+            "histogram_bins": len(occupied),
+            "excluded_fraction": transparent_pixels / total_pixels if total_pixels else 0.0,
+            "color_space": color_space,
+            "decode_seconds": decode_done - start,
+            "fit_seconds": end - decode_done,
+            "seconds": end - start,
+        })
+    
+    return {
+        "palette": palette,
+        "timeline": timeline,
+        "frames": total_frames,
+        "sampled_frames": len(timeline),
+    }
+
+def extract_colors_colorthief(image, n_colors=5):
+    """Extract colors using ColorThief library"""
+    if not COLORTHIEF_AVAILABLE:
+        return []
+    
+    from colorthief import ColorThief
+    
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    
+    # Save losslessly with any alpha channel, so ColorThief skips transparent pixels itself
+    temp_buffer = io.BytesIO()
+    image.convert('RGBA' if image.has_transparency_data else 'RGB').save(temp_buffer, format='PNG')
+    temp_buffer.seek(0)
+    
+    try:
+        color_thief = ColorThief(temp_buffer)
+        palette = color_thief.get_palette(color_count=n_colors, quality=1)
+        
+        # Calculate approximate percentages (ColorThief doesn't provide this)
+        # We'll use a simple approach based on order
+        total = sum(range(1, len(palette) + 1))
+        percentages = [(len(palette) - i) / total * 100 for i in range(len(palette))]
+        
+        return [(color, percentages[i]) for i, color in enumerate(palette)]
+    except Exception:
+        return []
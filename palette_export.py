@@ -0,0 +1,630 @@
+"""Palette and harmony exporters (JSON, CSS, text, PDF and ZIP bundle).
+
+Each exporter takes a [(color, percentage), ...] palette as returned by
+the extraction engines and produces the file contents, with no Streamlit
+dependency.
+"""
+import importlib.util
+import io
+import json
+import zipfile
+import zlib
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+from palette_core import (
+    decode_image, rgb_to_hex, rgb_to_cmyk, get_color_name, create_tint, create_color_harmony,
+    COLOR_NAMES, rgb_to_hex_array, rgb_to_cmyk_array, rgb_to_hsv_array,
+    get_color_name_index_array, create_tint_array
+)
+from palette_metrics import stage
+
+REPORTLAB_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+
+# File name and MIME type of each palette export, by the name shown in the app
+EXPORT_FORMATS = {
+    "JSON (Complete Data)": ("wild_pick_2_palette.json", "application/json"),
+    "PDF Report": ("wild_pick_2_palette_report.pdf", "application/pdf"),
+    "CSS Variables": ("wild_pick_2_palette.css", "text/css"),
+    "Text List": ("wild_pick_2_palette.txt", "text/plain"),
+}
+BUNDLE_FORMAT = "ZIP Bundle (All Formats)"
+BUNDLE_FILE = ("wild_pick_2_palette.zip", "application/zip")
+
+# Batch report layout: US letter page and palettes per page, thumbnail box in points and its JPEG quality
+REPORT_PAGE_SIZE = (612, 792)
+REPORT_PER_PAGE = 4
+REPORT_THUMBNAIL_SIZE = (160, 120)
+REPORT_THUMBNAIL_QUALITY = 80
+
+
+def harmony_to_dict(base_color, harmony_types=("complementary", "analogous", "triadic")):
+    """Build the harmony export for one base color"""
+    r, g, b = [int(c) for c in base_color]
+    harmony_data = {
+        "base_color": {
+            "name": get_color_name((r, g, b)),
+            "hex": rgb_to_hex((r, g, b)),
+            "rgb": [r, g, b],
+            "cmyk": list(rgb_to_cmyk(r, g, b))
+        },
+        "harmonies": {}
+    }
+
+    for harmony_type in harmony_types:
+        harmony_data["harmonies"][harmony_type] = [
+            {"hex": rgb_to_hex(c), "rgb": list(c)} for c in create_color_harmony((r, g, b), harmony_type)
+        ]
+
+    return harmony_data
+
+
+def _palette_centers(colors):
+    """Stack palette colors into an N x 3 float array"""
+    return np.array([color for color, _ in colors], dtype=np.float64).reshape((-1, 3))
+
+
+def palette_to_dict(colors):
+    """Build the "JSON (Complete Data)" export"""
+    palette_data = {
+        "palette": [],
+        "extracted_from": "Wild Pick 2.0",
+        "timestamp": str(datetime.now())
+    }
+
+    # Derive every value for the whole palette in one pass
+    centers = _palette_centers(colors)
+    rgb = centers.astype(np.int64)
+    names = get_color_name_index_array(centers)
+    hex_colors = rgb_to_hex_array(centers)
+    hsv = (rgb_to_hsv_array(rgb) * (360, 100, 100)).astype(np.int64)
+    cmyk = rgb_to_cmyk_array(rgb)
+    tints_75 = rgb_to_hex_array(create_tint_array(rgb, 75))
+    tints_50 = rgb_to_hex_array(create_tint_array(rgb, 50))
+
+    for i, (_, percentage) in enumerate(colors):
+        palette_data["palette"].append({
+            "name": COLOR_NAMES[names[i]],
+            "hex": str(hex_colors[i]),
+            "rgb": rgb[i].tolist(),
+            "hsv": hsv[i].tolist(),
+            "cmyk": cmyk[i].tolist(),
+            "percentage": round(float(percentage), 1),
+            "tints": {
+                "75%": str(tints_75[i]),
+                "50%": str(tints_50[i])
+            }
+        })
+
+    return palette_data
+
+
+def palette_to_css(colors):
+    """Build the "CSS Variables" export"""
+    centers = _palette_centers(colors)
+    names = get_color_name_index_array(centers)
+    hex_colors = rgb_to_hex_array(centers)
+    tints_75 = rgb_to_hex_array(create_tint_array(centers, 75))
+    tints_50 = rgb_to_hex_array(create_tint_array(centers, 50))
+
+    css_vars = ":root {\n"
+    for i in range(len(centers)):
+        color_name = COLOR_NAMES[names[i]].lower()
+        css_vars += f"  --color-{color_name}-{i+1}: {hex_colors[i]};\n"
+        # Add tints
+        css_vars += f"  --color-{color_name}-{i+1}-75: {tints_75[i]};\n"
+        css_vars += f"  --color-{color_name}-{i+1}-50: {tints_50[i]};\n"
+    css_vars += "}"
+    return css_vars
+
+
+def palette_to_text(colors):
+    """Build the "Text List" export"""
+    centers = _palette_centers(colors)
+    rgb = centers.astype(np.int64)
+    names = get_color_name_index_array(centers)
+    hex_colors = rgb_to_hex_array(centers)
+
+    text_list = "Wild Pick 2.0 - Color Palette\n"
+    text_list += "=" * 30 + "\n\n"
+
+    for i, (_, percentage) in enumerate(colors):
+        r, g, b = rgb[i].tolist()
+
+        text_list += f"{i + 1}. {COLOR_NAMES[names[i]]}\n"
+        text_list += f"   {hex_colors[i]}\n"
+        text_list += f"   RGB({r}, {g}, {b})\n"
+        text_list += f"   {percentage:.1f}% coverage\n\n"
+
+    return text_list
+
+
+def tile_map_to_dict(tile_map):
+    """Build the per-tile palette map export from extract_tile_palettes() output"""
+    global_hex = rgb_to_hex_array(_palette_centers(tile_map["palette"]))
+    tiles = []
+    for tile in tile_map["tiles"]:
+        left, top, right, bottom = tile["box"]
+        tile_hex = rgb_to_hex_array(_palette_centers(tile["palette"]))
+        tiles.append({
+            "row": tile["row"],
+            "col": tile["col"],
+            "box": {"left": left, "top": top, "right": right, "bottom": bottom},
+            "palette": [
+                {"hex": str(tile_hex[i]), "percentage": round(float(percentage), 1)}
+                for i, (_, percentage) in enumerate(tile["palette"])
+            ],
+            "global_shares": {
+                str(global_hex[i]): round(float(share), 1) for i, share in enumerate(tile["shares"]) if share > 0
+            },
+        })
+
+    rows, cols = tile_map["grid"]
+    width, height = tile_map["size"]
+    return {
+        "grid": {"rows": rows, "cols": cols},
+        "image_size": {"width": width, "height": height},
+        "palette": palette_to_dict(tile_map["palette"])["palette"],
+        "tiles": tiles,
+        "extracted_from": "Wild Pick 2.0",
+        "timestamp": str(datetime.now())
+    }
+
+
+def tile_heatmap(image, tile_map, color_index, opacity=0.8):
+    """Overlay where one global color lives: each tile is tinted by its share of that color
+
+    Returns a PIL image the size of the source, with tiles tinted in proportion
+    to the color's share relative to the tile where it is densest.
+    """
+    base = Image.fromarray(image) if isinstance(image, np.ndarray) else image.convert("RGB")
+    # Dim and desaturate the photo so the overlay reads clearly
+    base = Image.blend(base.convert("L").convert("RGB"), Image.new("RGB", base.size, (255, 255, 255)), 0.4)
+
+    color = tuple(int(c) for c in tile_map["palette"][color_index][0])
+    # Scale to the tile where the color is densest, so small accent colors still show up
+    peak = max(float(tile["shares"][color_index]) for tile in tile_map["tiles"]) or 1.0
+    alpha = Image.new("L", base.size, 0)
+    for tile in tile_map["tiles"]:
+        share = float(tile["shares"][color_index]) / peak
+        alpha.paste(int(255 * opacity * share), tile["box"])
+    return Image.composite(Image.new("RGB", base.size, color), base, alpha)
+
+
+def animation_to_dict(animation):
+    """Build the animation export: aggregate palette plus the per-frame timeline"""
+    timeline = []
+    for entry in animation["timeline"]:
+        frame_hex = rgb_to_hex_array(_palette_centers(entry["palette"]))
+        timeline.append({
+            "frame": entry["frame"],
+            "duration_ms": entry["duration"],
+            "palette": [
+                {"hex": str(frame_hex[i]), "percentage": round(float(percentage), 1)}
+                for i, (_, percentage) in enumerate(entry["palette"])
+            ],
+        })
+
+    return {
+        "frames": animation["frames"],
+        "sampled_frames": animation["sampled_frames"],
+        "palette": palette_to_dict(animation["palette"])["palette"],
+        "timeline": timeline,
+        "extracted_from": "Wild Pick 2.0",
+        "timestamp": str(datetime.now())
+    }
+
+
+def thumbnail_jpeg(image, size, quality=REPORT_THUMBNAIL_QUALITY):
+    """Shrink an image (PIL, array, file path or file object) to fit size and encode it as a JPEG buffer
+
+    Files are decoded with decode_image() at about four times the
+    thumbnail's pixel count, so JPEGs use DCT scaling; the last step is a
+    bilinear resize instead of LANCZOS, which is indistinguishable at this size.
+    """
+    if not isinstance(image, (np.ndarray, Image.Image)):
+        image = decode_image(image, max_pixels=size[0] * size[1] * 4)
+    with stage("export.thumbnail", pixels=size[0] * size[1]):
+        thumbnail = Image.fromarray(image) if isinstance(image, np.ndarray) else image.convert("RGB")
+        thumbnail.thumbnail(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format="JPEG", quality=quality)
+    buffer.seek(0)
+    return buffer
+
+
+def palette_to_pdf(colors, image=None):
+    """Build the "PDF Report" export as bytes (raises ImportError without reportlab)"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors as rl_colors
+    from reportlab.lib.enums import TA_CENTER
+
+    # Generate PDF with image and color data
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                          rightMargin=0.7*inch, leftMargin=0.7*inch,
+                          topMargin=0.8*inch, bottomMargin=0.8*inch)
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    story = []
+    story.append(Paragraph("Wild Pick 2.0", title_style))
+    story.append(Paragraph("Color Palette Analysis Report", styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Add source image if available
+    if image is not None:
+        story.append(Paragraph("Source Image", styles['Heading2']))
+        img_buffer = thumbnail_jpeg(image, (400, 300), quality=90)
+
+        img = RLImage(img_buffer, width=400, height=300)
+        story.append(img)
+        story.append(Spacer(1, 20))
+
+    # Color palette table
+    story.append(Paragraph("Extracted Color Palette", styles['Heading2']))
+    story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
+    story.append(Spacer(1, 15))
+
+    table_data = [['Color', 'Name', 'HEX', 'RGB', 'CMYK', 'Coverage', 'Tints']]
+
+    for color, percentage in colors:
+        r, g, b = int(color[0]), int(color[1]), int(color[2])
+        hex_color = rgb_to_hex(color)
+        color_name = get_color_name(color)
+        c, m, y, k = rgb_to_cmyk(r, g, b)
+        tint_75 = rgb_to_hex(create_tint((r, g, b), 75))
+        tint_50 = rgb_to_hex(create_tint((r, g, b), 50))
+
+        color_cell = f'<font color="{hex_color}">●●●●●</font>'
+
+        table_data.append([
+            Paragraph(color_cell, styles['Normal']),
+            color_name,
+            hex_color,
+            f"rgb({r}, {g}, {b})",
+            f"cmyk({c}%, {m}%, {y}%, {k}%)",
+            f"{percentage:.1f}%",
+            f"75%: {tint_75}\n50%: {tint_50}"
+        ])
+
+    table = Table(table_data, colWidths=[0.8*inch, 0.8*inch, 0.8*inch, 1.2*inch, 1.4*inch, 0.6*inch, 1.4*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), rl_colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), rl_colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), rl_colors.beige),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, rl_colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+
+    story.append(table)
+    story.append(Spacer(1, 20))
+
+    # Footer
+    story.append(Paragraph("Generated by Wild Pick 2.0 - Your Color Palette Explorer", styles['Normal']))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def iter_jsonl_records(stream):
+    """Yield palette_batch records from a JSONL text stream, one line at a time"""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+class _StreamingPDF:
+    """Minimal PDF writer that writes each page's objects as soon as the page is finished
+
+    Covers what the batch report draws: the standard Helvetica fonts,
+    filled and stroked rectangles, lines, text and JPEG images (embedded
+    as-is with DCTDecode). Only object offsets and page ids are kept until
+    close(), so memory does not grow with the page count and output can be
+    any writable binary stream, including a pipe.
+    """
+
+    # Fixed object ids: catalog, page tree, fonts and document info are known up front
+    CATALOG, PAGES, INFO = 1, 2, 3
+    FONTS = {"Helvetica": 4, "Helvetica-Bold": 5}
+
+    # Advance widths (1/1000 em) of the printable ASCII characters, from the standard Type 1 metrics
+    FONT_WIDTHS = {
+        "Helvetica": (
+            278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556,
+            556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778,
+            722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278,
+            278, 278, 469, 556, 333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+            556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+        ),
+        "Helvetica-Bold": (
+            278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556,
+            556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611, 975, 722, 722, 722, 722, 667, 611, 778,
+            722, 278, 556, 722, 611, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333,
+            278, 333, 584, 556, 333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+            611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+        ),
+    }
+
+    def __init__(self, stream, page_size, title, creator):
+        self.stream = stream
+        self.page_width, self.page_height = page_size
+        self.position = 0
+        self.offsets = {}
+        self.next_id = max(self.FONTS.values()) + 1
+        self.page_ids = []
+        self._operators = []
+        self._images = {}
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for name, font_id in self.FONTS.items():
+            self._write_object(font_id, f"<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>")
+        self._write_object(self.INFO, f"<< /Title {self._string(title)} /Creator {self._string(creator)} >>")
+
+    @staticmethod
+    def _string(text):
+        """PDF literal string in WinAnsi encoding"""
+        data = str(text).encode("cp1252", "replace")
+        return "(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").decode("latin-1") + ")"
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+
+    def _write_object(self, object_id, body, stream=None):
+        self.offsets[object_id] = self.position
+        self._write(f"{object_id} 0 obj\n{body}\n".encode("latin-1"))
+        if stream is not None:
+            self._write(b"stream\n" + stream + b"\nendstream\n")
+        self._write(b"endobj\n")
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    @staticmethod
+    def _color(rgb):
+        return " ".join(f"{channel / 255:.3f}" for channel in rgb)
+
+    def rect(self, x, y, width, height, fill=None, stroke=None, line_width=1):
+        """Rectangle with its lower left corner at (x, y), filled and/or stroked with RGB colors"""
+        operators = [f"{x:.2f} {y:.2f} {width:.2f} {height:.2f} re"]
+        if fill is not None:
+            operators.insert(0, f"{self._color(fill)} rg")
+        if stroke is not None:
+            operators.insert(0, f"{line_width:g} w {self._color(stroke)} RG")
+        operators.append("B" if fill is not None and stroke is not None else "f" if fill is not None else "S")
+        self._operators.append(" ".join(operators))
+
+    def line(self, x1, y1, x2, y2, color, line_width=1):
+        self._operators.append(f"{line_width:g} w {self._color(color)} RG {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    @classmethod
+    def text_width(cls, text, font="Helvetica", size=8):
+        """Width of one line of text in points (characters outside ASCII count as a digit)"""
+        widths = cls.FONT_WIDTHS[font]
+        return sum(widths[ord(c) - 32] if 32 <= ord(c) < 127 else 556 for c in str(text)) * size / 1000
+
+    def text(self, x, y, text, font="Helvetica", size=8, color=(0, 0, 0), align="left"):
+        """One line of text with its baseline at y, starting (or with align="right", ending) at x"""
+        if align == "right":
+            x -= self.text_width(text, font, size)
+        self._operators.append(
+            f"BT {self._color(color)} rg /F{self.FONTS[font]} {size:g} Tf {x:.2f} {y:.2f} Td {self._string(text)} Tj ET"
+        )
+
+    def jpeg(self, data, x, top):
+        """Draw JPEG bytes at their pixel size in points, hanging from top; returns (width, height)"""
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            components = {"L": 1, "RGB": 3, "CMYK": 4}[image.mode]
+        image_id = self._new_id()
+        color_space = {1: "/DeviceGray", 3: "/DeviceRGB", 4: "/DeviceCMYK"}[components]
+        # The image is written now, so only its id waits for the page
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace {color_space} "
+            f"/BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>"
+        ), data)
+        name = f"Im{image_id}"
+        self._images[name] = image_id
+        self._operators.append(f"q {width} 0 0 {height} {x:.2f} {top - height:.2f} cm /{name} Do Q")
+        return width, height
+
+    def show_page(self):
+        """Write the current page and start a new one"""
+        content = zlib.compress("\n".join(self._operators).encode("latin-1"))
+        content_id = self._new_id()
+        self._write_object(content_id, f"<< /Length {len(content)} /Filter /FlateDecode >>", content)
+        fonts = " ".join(f"/F{font_id} {font_id} 0 R" for font_id in self.FONTS.values())
+        images = " ".join(f"/{name} {image_id} 0 R" for name, image_id in self._images.items())
+        page_id = self._new_id()
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {self.page_width:.2f} {self.page_height:.2f}] "
+            f"/Resources << /Font << {fonts} >> /XObject << {images} >> >> /Contents {content_id} 0 R >>"
+        ))
+        self.page_ids.append(page_id)
+        self._operators = []
+        self._images = {}
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer"""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        self._write_object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>")
+        xref_offset = self.position
+        size = self.next_id
+        entries = [b"0000000000 65535 f \n"] + [
+            (f"{self.offsets[i]:010d} 00000 n \n" if i in self.offsets else "0000000000 65535 f \n").encode("ascii")
+            for i in range(1, size)
+        ]
+        self._write(f"xref\n0 {size}\n".encode("ascii") + b"".join(entries))
+        self._write((
+            f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R /Info {self.INFO} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        ).encode("ascii"))
+
+
+def write_palette_report(records, output, title="Wild Pick 2.0 - Palette Report", per_page=REPORT_PER_PAGE):
+    """Write a PDF report covering many palettes, streaming one page at a time
+
+    records is any iterable of palette_batch records ({"path", "palette",
+    ...} or {"path", "error"}) and is consumed lazily. output is a file
+    name or a writable binary stream. Every page, with its thumbnails, is
+    written out before the next records are read, so peak memory stays
+    flat however many pages the report has. Only Pillow is needed, not
+    reportlab. Returns (palettes, pages).
+    """
+    page_width, page_height = REPORT_PAGE_SIZE
+    margin = 0.7 * 72
+    header_height = 0.5 * 72
+    slot_height = (page_height - 2 * margin - header_height) / per_page
+    thumb_width, thumb_height = REPORT_THUMBNAIL_SIZE
+    table_left = margin + thumb_width + 0.25 * 72
+    table_width = page_width - margin - table_left
+
+    # One column layout and color scheme shared by every palette table
+    column_widths = [0.3 * 72, table_width - 3.3 * 72, 0.8 * 72, 1.4 * 72, 0.8 * 72]
+    table_header = ['', 'Name', 'HEX', 'RGB', 'Coverage']
+    grey, whitesmoke, lightgrey, red = (128, 128, 128), (245, 245, 245), (211, 211, 211), (255, 0, 0)
+    cell_padding = 6
+    font_size = 7
+
+    stream = open(output, "wb") if isinstance(output, str) else output
+    try:
+        pdf = _StreamingPDF(stream, REPORT_PAGE_SIZE, title, "Wild Pick 2.0")
+
+        def start_page(page):
+            pdf.text(margin, page_height - margin - 14, title, "Helvetica-Bold", 14)
+            pdf.text(page_width - margin, page_height - margin - 14, f"Page {page}", size=8, align="right")
+            pdf.text(margin, margin / 2, "Generated by Wild Pick 2.0 - Your Color Palette Explorer", size=8)
+
+        def draw_table(rows, swatches, top, row_height):
+            for i, row in enumerate(rows):
+                row_top = top - i * row_height
+                if i == 0:
+                    pdf.rect(table_left, row_top - row_height, table_width, row_height, fill=grey)
+                else:
+                    pdf.rect(table_left, row_top - row_height, column_widths[0], row_height, fill=swatches[i - 1])
+                pdf.line(table_left, row_top - row_height, table_left + table_width, row_top - row_height, lightgrey, 0.25)
+                baseline = row_top - row_height + (row_height - font_size * 0.72) / 2
+                x = table_left
+                for width, cell in zip(column_widths, row):
+                    if cell:
+                        pdf.text(x + cell_padding, baseline, cell, "Helvetica-Bold" if i == 0 else "Helvetica", font_size,
+                                 whitesmoke if i == 0 else (0, 0, 0))
+                    x += width
+
+        palettes = pages = 0
+        for index, record in enumerate(records):
+            slot = index % per_page
+            if slot == 0:
+                if pages:
+                    pdf.show_page()
+                pages += 1
+                start_page(pages)
+            top = page_height - margin - header_height - slot * slot_height
+
+            path = record.get("path", "")
+            pdf.text(margin, top - 10, str(path)[-110:], "Helvetica-Bold", 9)
+            body_top = top - 16
+
+            try:
+                thumbnail = thumbnail_jpeg(path, REPORT_THUMBNAIL_SIZE).getvalue()
+            except Exception:
+                thumbnail = None
+            if thumbnail is not None:
+                pdf.jpeg(thumbnail, margin, body_top)
+            else:
+                pdf.rect(margin, body_top - thumb_height, thumb_width, thumb_height, stroke=lightgrey)
+
+            if "error" in record:
+                pdf.text(table_left, body_top - 10, f"Extraction failed: {record['error']}"[:120], color=red)
+                continue
+
+            palette = record["palette"]
+            details = [record.get("method"), record.get("color_space")]
+            pdf.text(table_left, body_top - 7, " · ".join(
+                [f"{len(palette)} colors"] + [str(detail) for detail in details if detail]
+            ), size=7)
+
+            rows = [table_header] + [
+                ['', entry["name"], entry["hex"], "rgb({}, {}, {})".format(*entry["rgb"]), f"{entry['percentage']:.1f}%"]
+                for entry in palette
+            ]
+            row_height = min(11, (slot_height - 34) / len(rows))
+            draw_table(rows, [entry["rgb"] for entry in palette], body_top - 12, row_height)
+            palettes += 1
+
+        if not pages:
+            start_page(1)
+            pages = 1
+        pdf.show_page()
+        pdf.close()
+    finally:
+        if stream is not output:
+            stream.close()
+    return palettes, pages
+
+
+def export_palette(colors, export_format, image=None):
+    """Build one of EXPORT_FORMATS as bytes"""
+    # Timed as export.json, export.pdf, export.css or export.text
+    with stage(f"export.{export_format.split()[0].lower()}", colors=len(colors)) as timer:
+        if export_format == "JSON (Complete Data)":
+            data = json.dumps(palette_to_dict(colors), indent=2).encode("utf-8")
+        elif export_format == "PDF Report":
+            data = palette_to_pdf(colors, image)
+        elif export_format == "CSS Variables":
+            data = palette_to_css(colors).encode("utf-8")
+        elif export_format == "Text List":
+            data = palette_to_text(colors).encode("utf-8")
+        else:
+            raise ValueError(f"Unknown export format: {export_format}")
+        timer.set(bytes=len(data))
+    return data
+
+
+def bundle_formats():
+    """Export formats that go into the ZIP bundle (PDF only when reportlab is installed)"""
+    return [export_format for export_format in EXPORT_FORMATS if export_format != "PDF Report" or REPORTLAB_AVAILABLE]
+
+
+def write_zip_bundle(stream, members):
+    """Write (file_name, data) members into a ZIP archive on stream, one at a time
+
+    members may be a generator, so each file can be built just before it is
+    written; stream only needs write(), so it can be a socket or stdout.
+    """
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for file_name, data in members:
+            archive.writestr(file_name, data)
+
+
+def palette_to_zip(colors, image=None):
+    """Build the ZIP bundle of every available export as bytes"""
+    buffer = io.BytesIO()
+    write_zip_bundle(buffer, (
+        (EXPORT_FORMATS[export_format][0], export_palette(colors, export_format, image))
+        for export_format in bundle_formats()
+    ))
+    return buffer.getvalue()
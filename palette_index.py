@@ -0,0 +1,188 @@
+"""Perceptual-hash index of extracted palettes for near-duplicate uploads.
+
+The same asset re-exported at another size or JPEG quality has different
+bytes, so the content-addressed palette cache never hits for it. Here each
+image is fingerprinted from a 9 x 8 thumbnail: a 64-bit difference hash
+(dHash) of its luminance plus a coarse 2 x 2 average color, which keeps
+recolored variants of one layout apart. Entries live in SQLite so they
+survive restarts and can be bulk-loaded from batch runs; lookups compare
+the query against every hash of the same method with one vectorized XOR
+and popcount.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from PIL import Image
+
+from palette_metrics import stage
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "wild_pick", "palette_index.sqlite")
+
+# Most dHash bits two near-duplicates may differ in (of 64); resized and
+# re-compressed copies usually differ in 0-4
+DEFAULT_MAX_DISTANCE = 5
+
+# Largest difference of any channel of the 2 x 2 average colors, so a
+# recolored copy with the same shapes is not mistaken for a duplicate
+COLOR_TOLERANCE = 16
+
+HASH_BITS = 64
+
+# Set bits per byte value, for popcounts on uint64 hashes viewed as bytes
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS palettes (
+    id INTEGER PRIMARY KEY,
+    method TEXT NOT NULL,
+    hash INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    value TEXT NOT NULL
+)
+"""
+
+
+def image_fingerprint(image):
+    """(dHash, color signature) of an H x W x 3 (or x 4) uint8 image
+
+    The dHash compares horizontally adjacent luminance samples of a 9 x 8
+    thumbnail; the signature is the thumbnail's average color in each
+    quadrant, as 12 bytes.
+    """
+    with stage("index.fingerprint", pixels=image.shape[0] * image.shape[1]):
+        thumbnail = Image.fromarray(np.ascontiguousarray(image[:, :, :3])).resize((9, 8), Image.Resampling.BOX)
+        rgb = np.asarray(thumbnail, dtype=np.int16)
+        gray = np.asarray(thumbnail.convert("L"), dtype=np.int16)
+        bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+        image_hash = int(np.packbits(bits).view(">u8")[0])
+        quadrants = [rgb[rows, cols] for rows in (slice(0, 4), slice(4, 8)) for cols in (slice(0, 5), slice(4, 9))]
+        signature = bytes(np.array([q.reshape(-1, 3).mean(axis=0) for q in quadrants]).round().astype(np.uint8).ravel())
+    return image_hash, signature
+
+
+def hamming_distances(hashes, image_hash):
+    """Differing bits between each uint64 in hashes and image_hash"""
+    xor = np.bitwise_xor(hashes, np.uint64(image_hash))
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _to_signed(image_hash):
+    # SQLite integers are signed 64-bit
+    return image_hash - (1 << 64) if image_hash >= 1 << 63 else image_hash
+
+
+class PaletteIndex:
+    """Persistent near-duplicate index of JSON-serializable extraction results
+
+    Entries are grouped by method, a string naming the extraction settings
+    (only results of the same method are interchangeable). Hashes are kept
+    in memory per method and topped up from the database before each
+    lookup, so rows added by other processes (a batch run, another server)
+    are picked up without reopening.
+    """
+
+    def __init__(self, path=None, max_distance=DEFAULT_MAX_DISTANCE, color_tolerance=COLOR_TOLERANCE):
+        self.path = path or ":memory:"
+        self.max_distance = max_distance
+        self.color_tolerance = color_tolerance
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        if path:
+            # Readers in other processes are not blocked while a batch run writes
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+        self._lock = threading.Lock()
+
+        # method -> (row ids, uint64 hashes, N x 12 uint8 signatures)
+        self._methods = {}
+        self._last_id = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, fingerprint, method, max_distance=None):
+        """(value, distance) of the closest near-duplicate stored for method, or None"""
+        image_hash, signature = fingerprint
+        max_distance = self.max_distance if max_distance is None else max_distance
+        with stage("index.lookup") as s, self._lock:
+            self._refresh()
+            ids, hashes, signatures = self._methods.get(method, (None, None, None))
+            s.set(entries=0 if ids is None else len(ids))
+            row_id = distance = None
+            if ids is not None:
+                distances = hamming_distances(hashes, image_hash)
+                candidates = np.flatnonzero(distances <= max_distance)
+                # Colors are only compared for the few hashes that are close enough
+                color_difference = np.abs(signatures[candidates] - np.frombuffer(signature, dtype=np.uint8)).max(axis=1)
+                candidates = candidates[color_difference <= self.color_tolerance]
+                if len(candidates):
+                    best = candidates[np.argmin(distances[candidates])]
+                    row_id, distance = int(ids[best]), int(distances[best])
+            if row_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            (value,) = self._connection.execute("SELECT value FROM palettes WHERE id = ?", (row_id,)).fetchone()
+        return json.loads(value), distance
+
+    def add(self, fingerprint, method, value):
+        """Store value for an image's fingerprint under method"""
+        self.add_many([(fingerprint, method, value)])
+
+    def add_many(self, entries):
+        """Store (fingerprint, method, value) entries in one transaction"""
+        rows = [
+            (method, _to_signed(image_hash), signature, json.dumps(value, separators=(",", ":")))
+            for (image_hash, signature), method, value in entries
+        ]
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO palettes (method, hash, signature, value) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._connection.close()
+
+    def stats(self):
+        """Hit/miss counters and entries per method"""
+        with self._lock:
+            self._refresh()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": {method: len(ids) for method, (ids, _, _) in self._methods.items()},
+            }
+
+    # In-memory hashes (callers hold self._lock)
+    def _refresh(self):
+        rows = self._connection.execute(
+            "SELECT id, method, hash, signature FROM palettes WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        if not rows:
+            return
+        self._last_id = rows[-1][0]
+        grouped = {}
+        for row_id, method, image_hash, signature in rows:
+            grouped.setdefault(method, []).append((row_id, image_hash, signature))
+        for method, new_rows in grouped.items():
+            ids = np.array([row[0] for row in new_rows], dtype=np.int64)
+            hashes = np.array([row[1] for row in new_rows], dtype=np.int64).view(np.uint64)
+            signatures = np.frombuffer(b"".join(row[2] for row in new_rows), dtype=np.uint8).reshape(-1, 12).astype(np.int16)
+            if method in self._methods:
+                old_ids, old_hashes, old_signatures = self._methods[method]
+                ids = np.concatenate([old_ids, ids])
+                hashes = np.concatenate([old_hashes, hashes])
+                signatures = np.concatenate([old_signatures, signatures])
+            self._methods[method] = (ids, hashes, signatures)
@@ -0,0 +1,200 @@
+"""Background extraction jobs shared by every session.
+
+Extractions run on a small bounded thread pool instead of the Streamlit
+script thread. Each owner (one browser session) has at most one job: a
+new submission cancels the previous one, and when the pool already holds
+max_pending jobs new work is refused rather than queued without limit. A
+cancelled job keeps counting toward max_pending until its thread returns.
+Jobs report progress through a progress(stage, fraction) callback, which
+is also where a cancelled job stops, at the next stage or chunk boundary.
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from palette_metrics import record
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+
+# Share of the overall progress bar given to each stage
+STAGE_SPANS = {
+    "decode": (0.0, 0.1),
+    "fit": (0.1, 0.7),
+    "assign": (0.7, 1.0),
+}
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled"""
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already queued or running"""
+
+
+class Job:
+    """One submitted extraction: its status, current stage and result"""
+
+    def __init__(self, job_id, owner, key):
+        self.id = job_id
+        self.owner = owner
+        self.key = key
+
+        self.status = "queued"
+        self.stage = None
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+
+        self._cancelled = threading.Event()
+        self._future = None
+
+    @property
+    def active(self):
+        """Whether the job is still queued or running"""
+        return self.status in ("queued", "running")
+
+    @property
+    def cancelled(self):
+        """Whether cancel() has been called"""
+        return self._cancelled.is_set()
+
+    def report(self, stage, fraction):
+        """Progress callback handed to the extraction; raises JobCancelled after cancel()"""
+        if self._cancelled.is_set():
+            raise JobCancelled(self.id)
+        low, high = STAGE_SPANS.get(stage, (self.progress, self.progress))
+        self.stage = stage
+        self.progress = max(self.progress, low + (high - low) * min(max(fraction, 0.0), 1.0))
+
+    def cancel(self):
+        """Ask the job to stop; returns True when it had not started and was dropped at once"""
+        self._cancelled.set()
+        if self._future is not None and self._future.cancel():
+            self._finish("cancelled")
+            return True
+        return False
+
+    def _finish(self, status, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished_at = time.monotonic()
+        self.status = status
+
+
+class JobQueue:
+    """Bounded pool of background jobs with one job per owner"""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="palette-job")
+        self._jobs = {}
+        # Every job whose future is not done yet, including cancelled jobs
+        # that have already been replaced in _jobs but are still running
+        self._unfinished = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def submit(self, owner, key, func, *args, **kwargs):
+        """Run func(*args, progress=job.report, **kwargs) in the background for owner
+
+        Returns the owner's current job unchanged when it is for the same key,
+        so Streamlit reruns do not restart work. Any other job of the owner's
+        is cancelled. Raises QueueFull when the pool is saturated.
+        """
+        with self._lock:
+            current = self._jobs.get(owner)
+            if current is not None and current.key == key and current.status in ("queued", "running", "done"):
+                return current
+            if current is not None and current.active and current.cancel():
+                self.cancelled += 1
+
+            active = len(self._prune())
+            if active >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"{active} extraction jobs already pending")
+
+            job = Job(next(self._ids), owner, key)
+            self._jobs[owner] = job
+            job._future = self._executor.submit(self._run, job, func, args, kwargs)
+            self._unfinished.add(job)
+            return job
+
+    def get(self, owner):
+        """The owner's most recent job, or None"""
+        with self._lock:
+            return self._jobs.get(owner)
+
+    def cancel(self, owner):
+        """Cancel the owner's job if it is still queued or running"""
+        with self._lock:
+            job = self._jobs.get(owner)
+            if job is not None and job.active and job.cancel():
+                self.cancelled += 1
+
+    def discard(self, owner):
+        """Forget the owner's job once its result has been collected"""
+        with self._lock:
+            job = self._jobs.get(owner)
+            if job is not None and not job.active:
+                del self._jobs[owner]
+
+    def stats(self):
+        """Current load and lifetime counters"""
+        with self._lock:
+            jobs = list(self._prune())
+        return {
+            "running": sum(job.status == "running" for job in jobs),
+            "queued": sum(job.status == "queued" for job in jobs),
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        """Cancel everything and stop the worker threads"""
+        with self._lock:
+            jobs = list(self._prune())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    # Drops jobs whose futures are done (callers hold self._lock)
+    def _prune(self):
+        self._unfinished = {job for job in self._unfinished if not job._future.done()}
+        return self._unfinished
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancelled:
+            self._record(job, "cancelled")
+            return
+        job.status = "running"
+        record("job.queue_wait", time.monotonic() - job.submitted_at)
+        try:
+            result = func(*args, progress=job.report, **kwargs)
+        except JobCancelled:
+            self._record(job, "cancelled")
+        except Exception as e:
+            self._record(job, "failed", error=f"{type(e).__name__}: {e}")
+        else:
+            self._record(job, "done", result=result)
+
+    def _record(self, job, status, result=None, error=None):
+        with self._lock:
+            job._finish(status, result, error)
+            if status == "done":
+                self.completed += 1
+            elif status == "cancelled":
+                self.cancelled += 1
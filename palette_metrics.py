@@ -0,0 +1,230 @@
+"""Per-stage timing and size metrics for the upload -> extract -> render -> export pipeline.
+
+Hot paths wrap each stage in `with stage("kmeans.fit") as s:` and attach
+sizes with s.set(pixels=..., iterations=..., array_bytes=...). While
+metrics are disabled (the default) stage() returns one shared no-op
+object, so the cost is a function call and a flag check per stage.
+
+Enable with WILD_PICK_METRICS=1 or enable(). Every finished stage then
+updates a latency histogram, pixel and iteration totals and the peak
+array size for its name, is kept in a short ring buffer for the app's
+debug panel, and is logged as one JSON line on the "wild_pick.metrics"
+logger. render_prometheus() and write_prometheus() export the totals in
+Prometheus text format for scraping.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_EVENTS = 200
+
+logger = logging.getLogger("wild_pick.metrics")
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+    def render(self, name, labels=""):
+        """Prometheus text lines for this histogram"""
+        prefix = f"{labels}," if labels else ""
+        lines = [f'{name}_bucket{{{prefix}le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.total}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.total}")
+        return lines
+
+
+class StageTotals:
+    """Everything recorded for one stage name"""
+
+    def __init__(self):
+        self.seconds = Histogram(LATENCY_BUCKETS)
+        self.max_seconds = 0.0
+        self.pixels = 0
+        self.iterations = 0
+        self.peak_array_bytes = 0
+        self.errors = 0
+
+
+class _NullStage:
+    """Stand-in returned by stage() while metrics are disabled"""
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """Times one stage and records it, with any fields set, when the block exits"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        record(self.name, time.perf_counter() - self._start, **self.fields)
+        return False
+
+
+_enabled = os.environ.get("WILD_PICK_METRICS", "") not in ("", "0")
+_totals = {}
+_recent = deque(maxlen=RECENT_EVENTS)
+_lock = threading.Lock()
+_last_write = 0.0
+
+
+def is_enabled():
+    """Whether stages are being recorded"""
+    return _enabled
+
+
+def enable(log=True):
+    """Start recording stages; with log, make sure JSON lines reach stderr"""
+    global _enabled
+    _enabled = True
+    if log and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def disable():
+    """Stop recording; totals collected so far are kept"""
+    global _enabled
+    _enabled = False
+
+
+def stage(name, **fields):
+    """Context manager timing one pipeline stage (a shared no-op while disabled)"""
+    if not _enabled:
+        return NULL_STAGE
+    return Stage(name, fields)
+
+
+def record(name, seconds, **fields):
+    """Record a finished stage measured by the caller"""
+    if not _enabled:
+        return
+    event = {"stage": name, "seconds": round(seconds, 6), "ts": round(time.time(), 3), **fields}
+    with _lock:
+        totals = _totals.get(name)
+        if totals is None:
+            totals = _totals[name] = StageTotals()
+        totals.seconds.observe(seconds)
+        totals.max_seconds = max(totals.max_seconds, seconds)
+        totals.pixels += int(fields.get("pixels", 0))
+        totals.iterations += int(fields.get("iterations", 0))
+        totals.peak_array_bytes = max(totals.peak_array_bytes, int(fields.get("array_bytes", 0)))
+        totals.errors += "error" in fields
+        _recent.append(event)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(event, default=str))
+
+
+def snapshot():
+    """Per-stage summary rows, slowest total first"""
+    with _lock:
+        rows = [{
+            "stage": name,
+            "count": totals.seconds.total,
+            "total_ms": round(totals.seconds.sum * 1000, 2),
+            "mean_ms": round(totals.seconds.sum / totals.seconds.total * 1000, 2),
+            "max_ms": round(totals.max_seconds * 1000, 2),
+            "pixels": totals.pixels,
+            "iterations": totals.iterations,
+            "peak_array_mb": round(totals.peak_array_bytes / (1024 * 1024), 2),
+            "errors": totals.errors,
+        } for name, totals in _totals.items()]
+    return sorted(rows, key=lambda row: -row["total_ms"])
+
+
+def recent_events(limit=50):
+    """The most recent stage events, newest first"""
+    with _lock:
+        events = list(_recent)
+    return events[::-1][:limit]
+
+
+def reset():
+    """Forget all totals and recent events"""
+    with _lock:
+        _totals.clear()
+        _recent.clear()
+
+
+def render_prometheus(prefix="wild_pick"):
+    """All stage totals in the Prometheus text exposition format"""
+    with _lock:
+        items = sorted(_totals.items())
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per pipeline stage",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for name, totals in items:
+            lines += totals.seconds.render(f"{prefix}_stage_seconds", f'stage="{name}"')
+        for metric, kind, help_text, attribute in (
+            ("stage_pixels_total", "counter", "Pixels processed per stage", "pixels"),
+            ("stage_iterations_total", "counter", "Clustering iterations per stage", "iterations"),
+            ("stage_peak_array_bytes", "gauge", "Largest array allocated by a stage", "peak_array_bytes"),
+            ("stage_errors_total", "counter", "Stages that raised", "errors"),
+        ):
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} {kind}"]
+            lines += [f'{prefix}_{metric}{{stage="{name}"}} {getattr(totals, attribute)}' for name, totals in items]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, min_interval=0.0):
+    """Atomically write render_prometheus() to path (node_exporter textfile style)
+
+    With min_interval, writes closer together than that many seconds are
+    skipped. Returns whether the file was written.
+    """
+    global _last_write
+    now = time.monotonic()
+    if now - _last_write < min_interval:
+        return False
+    _last_write = now
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(temp_path, path)
+    return True
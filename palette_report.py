@@ -0,0 +1,46 @@
+"""Build one PDF report covering many palettes from palette_batch JSONL.
+
+Usage:
+    python palette_report.py palettes.jsonl --output brand_audit.pdf
+    python palette_batch.py catalog/ --colors 6 | python palette_report.py - -o brand_audit.pdf
+
+Records are read one line at a time and drawn page by page (four palettes
+per page by default), each with a small JPEG thumbnail of its image and a
+table of its colors. Piping palette_batch into this script builds the
+report as the directory run progresses, without an intermediate file.
+Use --output - to write the PDF to stdout.
+"""
+import argparse
+import sys
+import time
+
+from palette_export import REPORT_PER_PAGE, iter_jsonl_records, write_palette_report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="palette_batch JSONL files, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="PDF file to write, or - for stdout")
+    parser.add_argument("--title", default="Wild Pick 2.0 - Palette Report", help="Title printed on every page")
+    parser.add_argument("--per-page", type=int, default=REPORT_PER_PAGE,
+                        help=f"Palettes per page (default: {REPORT_PER_PAGE})")
+    args = parser.parse_args(argv)
+
+    def records():
+        for name in args.inputs:
+            if name == "-":
+                yield from iter_jsonl_records(sys.stdin)
+                continue
+            with open(name, encoding="utf-8") as f:
+                yield from iter_jsonl_records(f)
+
+    output = sys.stdout.buffer if args.output == "-" else args.output
+    start = time.perf_counter()
+    palettes, pages = write_palette_report(records(), output, title=args.title, per_page=args.per_page)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {palettes} palettes on {pages} pages in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""Headless HTTP/JSON palette extraction service.
+
+Usage:
+    python palette_server.py --port 8765 --workers 4
+    curl --data-binary @photo.jpg "http://127.0.0.1:8765/palette?n_colors=6"
+
+Endpoints:
+    POST /palette?n_colors=6&color_space=rgb   raw image bytes in, the "JSON (Complete Data)" export out
+    GET  /healthz                              liveness check
+    GET  /metrics                              Prometheus text format counters and latency histograms
+
+Requests are answered from a shared palette cache when possible. Otherwise
+they are queued for a dispatcher thread that groups concurrent small
+requests into micro-batches (up to --max-batch images or --max-batch-kb
+bytes, waiting at most --max-wait-ms for a batch to fill) and hands each
+batch to a worker process as one task. Bodies over --max-request-mb are
+refused with 413, and once --max-in-flight requests are queued or being
+extracted new ones get 503 with Retry-After instead of waiting. With
+--budget, each micro-batch's K-means work is sized to finish within that
+many seconds (see palette_calibrate.py). If a worker process dies (say an
+out-of-memory kill), the requests of its batch fail and the pool is
+replaced.
+"""
+import argparse
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from palette_cache import (
+    PaletteCache, content_digest, make_digest_key, palette_to_payload, palette_from_payload
+)
+from palette_core import COLOR_SPACES, decode_image, extract_palette, mask_pixels
+from palette_export import palette_to_dict
+from palette_metrics import Histogram
+
+DEFAULT_PORT = 8765
+MAX_COLORS = 32
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+def extract_batch(items, budget=None):
+    """Worker task: extract every (image bytes, n_colors, color_space) item of one micro-batch
+
+    With budget, the whole batch shares it: each item gets an equal share,
+    since every request in the batch is answered only when the batch ends.
+    Returns one palette payload or {"error": message} per item, in order.
+    """
+    item_budget = budget / len(items) if budget else None
+    results = []
+    for data, n_colors, color_space in items:
+        try:
+            image = mask_pixels(decode_image(io.BytesIO(data), keep_alpha=True))
+            colors = extract_palette(image, n_colors, color_space=color_space, budget=item_budget)
+            results.append(palette_to_payload(colors))
+        except Exception as e:
+            results.append({"error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+class Overloaded(Exception):
+    """Raised when max_in_flight requests are already queued or running"""
+
+
+class PaletteService:
+    """Cache, micro-batching dispatcher and worker pool behind the HTTP handler"""
+
+    def __init__(self, workers=None, max_batch=8, max_batch_bytes=512 * 1024, max_wait=0.005,
+                 max_in_flight=64, cache=None, budget=None):
+        self.max_batch = max_batch
+        self.max_batch_bytes = max_batch_bytes
+        self.max_wait = max_wait
+        self.max_in_flight = max_in_flight
+        self.budget = budget
+        self.workers = workers
+        self.cache = cache if cache is not None else PaletteCache()
+
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._running = True
+
+        self.in_flight = 0
+        self.request_seconds = Histogram(LATENCY_BUCKETS)
+        self.queue_seconds = Histogram(LATENCY_BUCKETS)
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.responses = {}
+        self.cache_hits = 0
+        self.pool_restarts = 0
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="palette-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def extract(self, data, n_colors, color_space="rgb", timeout=30):
+        """Return the palette payload for image bytes, blocking until it is ready
+
+        Raises Overloaded when the service is saturated, TimeoutError after
+        timeout seconds and ValueError when the image cannot be processed.
+        """
+        method = f"server-masked-{color_space}-budget-{self.budget:g}" if self.budget else f"server-masked-{color_space}"
+        key = make_digest_key(content_digest(data), n_colors, method)
+        payload = self.cache.get(key)
+        if payload is not None:
+            with self._lock:
+                self.cache_hits += 1
+            return payload
+
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded(f"{self.max_in_flight} requests already in flight")
+        with self._lock:
+            self.in_flight += 1
+        future = Future()
+        # The slot is held until the work is done, not until this request gives up waiting,
+        # so clients that time out cannot pile up extractions past max_in_flight
+        future.add_done_callback(self._release_slot)
+        self._queue.put((data, n_colors, color_space, time.perf_counter(), future))
+        payload = future.result(timeout=timeout)
+
+        if isinstance(payload, dict):
+            raise ValueError(payload["error"])
+        self.cache.put(key, payload)
+        return payload
+
+    def record(self, status, seconds):
+        """Count one finished HTTP request"""
+        with self._lock:
+            self.responses[status] = self.responses.get(status, 0) + 1
+            self.request_seconds.observe(seconds)
+
+    def metrics(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP palette_requests_total Finished HTTP requests by status code",
+                "# TYPE palette_requests_total counter",
+            ]
+            lines += [f'palette_requests_total{{status="{status}"}} {count}'
+                      for status, count in sorted(self.responses.items())]
+            lines += ["# HELP palette_request_seconds End-to-end request latency",
+                      "# TYPE palette_request_seconds histogram"]
+            lines += self.request_seconds.render("palette_request_seconds")
+            lines += ["# HELP palette_queue_seconds Time from enqueue to the start of a batch",
+                      "# TYPE palette_queue_seconds histogram"]
+            lines += self.queue_seconds.render("palette_queue_seconds")
+            lines += ["# HELP palette_batch_size Images per micro-batch",
+                      "# TYPE palette_batch_size histogram"]
+            lines += self.batch_sizes.render("palette_batch_size")
+            lines += [
+                "# HELP palette_in_flight Requests queued or being extracted",
+                "# TYPE palette_in_flight gauge",
+                f"palette_in_flight {self.in_flight}",
+                "# HELP palette_cache_hits_total Requests answered from the palette cache",
+                "# TYPE palette_cache_hits_total counter",
+                f"palette_cache_hits_total {self.cache_hits}",
+                "# HELP palette_pool_restarts_total Worker pools replaced after a worker process died",
+                "# TYPE palette_pool_restarts_total counter",
+                f"palette_pool_restarts_total {self.pool_restarts}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Stop dispatching and shut the worker pool down"""
+        self._running = False
+        self._queue.put(None)
+        self._dispatcher.join()
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    def _release_slot(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _dispatch(self):
+        while self._running:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            batch_bytes = len(item[0])
+            # Keep collecting until the batch is full, too large or max_wait has passed
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch and batch_bytes < self.max_batch_bytes:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._running = False
+                    break
+                batch.append(item)
+                batch_bytes += len(item[0])
+            # The dispatcher must outlive any one batch, or every later request would hang
+            try:
+                self._submit(batch)
+            except Exception as e:
+                self._fail(batch, e)
+
+    def _fail(self, batch, error):
+        for *_, future in batch:
+            if not future.done():
+                future.set_result({"error": f"{type(error).__name__}: {error}"})
+
+    def _replace_pool(self, broken):
+        # Called once per broken pool: the first caller swaps it, later ones see the new pool
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.pool_restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, batch):
+        started = time.perf_counter()
+        with self._lock:
+            self.batch_sizes.observe(len(batch))
+            for _, _, _, enqueued, _ in batch:
+                self.queue_seconds.observe(started - enqueued)
+
+        # Identical requests in one batch are extracted once
+        unique = {}
+        for data, n_colors, color_space, _, _ in batch:
+            unique.setdefault((content_digest(data), n_colors, color_space), (data, n_colors, color_space))
+        keys = list(unique)
+        with self._lock:
+            executor = self._executor
+        try:
+            task = executor.submit(extract_batch, [unique[key] for key in keys], self.budget)
+        except BrokenProcessPool as e:
+            self._replace_pool(executor)
+            self._fail(batch, e)
+            return
+
+        def deliver(task):
+            try:
+                results = dict(zip(keys, task.result()))
+            except BrokenProcessPool as e:
+                self._replace_pool(executor)
+                results = {key: {"error": f"{type(e).__name__}: {e}"} for key in keys}
+            except Exception as e:
+                results = {key: {"error": f"{type(e).__name__}: {e}"} for key in keys}
+            for data, n_colors, color_space, _, future in batch:
+                if not future.done():
+                    future.set_result(results[(content_digest(data), n_colors, color_space)])
+
+        task.add_done_callback(deliver)
+
+
+class PaletteRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end; the service and limits live on the server object"""
+
+    server_version = "WildPickPalette/1.0"
+
+    def do_GET(self):
+        start = time.perf_counter()
+        path = urlparse(self.path).path
+        if path == "/healthz":
+            self._send_json(200, {"status": "ok"}, start)
+        elif path == "/metrics":
+            self._send(200, self.server.service.metrics().encode("utf-8"), "text/plain; version=0.0.4", start)
+        else:
+            self._send_json(404, {"error": f"Unknown path: {path}"}, start)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != "/palette":
+            self._send_json(404, {"error": f"Unknown path: {url.path}"}, start)
+            return
+
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self._send_json(411, {"error": "Content-Length is required"}, start)
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        # A negative length would make rfile.read() consume the stream with no size limit
+        if length < 0:
+            self.close_connection = True
+            self._send_json(400, {"error": "Content-Length must be a non-negative integer"}, start)
+            return
+        if length > self.server.max_request_bytes:
+            self.close_connection = True
+            self._send_json(413, {"error": f"Request body over {self.server.max_request_bytes} bytes"}, start)
+            return
+
+        query = parse_qs(url.query)
+        try:
+            n_colors = int(query.get("n_colors", ["6"])[0])
+        except ValueError:
+            n_colors = 0
+        color_space = query.get("color_space", ["rgb"])[0]
+        if not 1 <= n_colors <= MAX_COLORS:
+            self._send_json(400, {"error": f"n_colors must be between 1 and {MAX_COLORS}"}, start)
+            return
+        if color_space not in COLOR_SPACES:
+            self._send_json(400, {"error": f"color_space must be one of {', '.join(COLOR_SPACES)}"}, start)
+            return
+
+        data = self.rfile.read(length)
+        try:
+            payload = self.server.service.extract(data, n_colors, color_space, timeout=self.server.request_timeout)
+        except Overloaded as e:
+            self._send_json(503, {"error": str(e)}, start, headers={"Retry-After": "1"})
+        except TimeoutError:
+            self._send_json(504, {"error": "Extraction timed out"}, start)
+        except ValueError as e:
+            self._send_json(422, {"error": str(e)}, start)
+        else:
+            self._send_json(200, palette_to_dict(palette_from_payload(payload)), start)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, start, headers=None):
+        self._send(status, json.dumps(body, indent=2).encode("utf-8"), "application/json", start, headers)
+
+    def _send(self, status, body, content_type, start, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.service.record(status, time.perf_counter() - start)
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, max_request_bytes=20 * 1024 * 1024, request_timeout=30,
+                verbose=False, **service_options):
+    """Build a ThreadingHTTPServer wired to a new PaletteService (port 0 picks a free port)"""
+    server = ThreadingHTTPServer((host, port), PaletteRequestHandler)
+    server.daemon_threads = True
+    server.service = PaletteService(**service_options)
+    server.max_request_bytes = max_request_bytes
+    server.request_timeout = request_timeout
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-batch", type=int, default=8, help="Images per micro-batch (default: 8)")
+    parser.add_argument("--max-batch-kb", type=int, default=512, help="Bytes per micro-batch in KB (default: 512)")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="How long a batch waits to fill (default: 5)")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Queued plus running requests (default: 64)")
+    parser.add_argument("--max-request-mb", type=float, default=20, help="Largest accepted body in MB (default: 20)")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request gets 504 (default: 30)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Extraction seconds per micro-batch; K-means is sized to fit (default: run to convergence)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    server = make_server(
+        args.host, args.port,
+        max_request_bytes=int(args.max_request_mb * 1024 * 1024),
+        request_timeout=args.timeout,
+        verbose=args.verbose,
+        workers=args.workers,
+        max_batch=args.max_batch,
+        max_batch_bytes=args.max_batch_kb * 1024,
+        max_wait=args.max_wait_ms / 1000,
+        max_in_flight=args.max_in_flight,
+        budget=args.budget,
+    )
+    host, port = server.server_address[:2]
+    print(f"Serving palettes on http://{host}:{port} (POST /palette, GET /metrics)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
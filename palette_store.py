@@ -0,0 +1,251 @@
+"""Uploaded images shared by every session under one memory budget.
+
+Sessions keep only a content digest. The store holds each upload's
+original compressed bytes plus its decoded working copy (at most
+WORKING_MAX_PIXELS), counted against a single byte budget across all
+sessions. When the budget is exceeded the least recently used images
+leave memory: their working copy is dropped and their bytes are spilled
+to a disk directory, from which they are decoded again on next use. The
+spill directory has its own budget; an image evicted from both tiers is
+gone, and get_working() returns None until it is put again. Transparent
+uploads also keep their opacity plane next to the working copy, for
+masking transparent pixels out before extraction. The disk
+index lives in memory, so spill files left by a previous process are
+removed on startup.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from palette_cache import content_digest
+from palette_core import decode_image, split_alpha, WORKING_MAX_PIXELS
+from palette_metrics import stage
+
+DEFAULT_MEMORY_BYTES = 256 * 1024 * 1024
+DEFAULT_DISK_BYTES = 2 * 1024 * 1024 * 1024
+
+
+class StoredImage:
+    """One upload: compressed bytes and working copy (plus opacity plane) when resident, and its decode stats"""
+
+    def __init__(self, data, working, stats, alpha=None):
+        self.data = data
+        self.working = working
+        self.stats = stats
+        self.alpha = alpha
+
+    @property
+    def nbytes(self):
+        """Memory held by this image"""
+        return (
+            (len(self.data) if self.data is not None else 0)
+            + (self.working.nbytes if self.working is not None else 0)
+            + (self.alpha.nbytes if self.alpha is not None else 0)
+        )
+
+
+class ImageStore:
+    """Content-addressed upload store with a global LRU byte budget and disk spill"""
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, spill_dir=None, disk_max_bytes=DEFAULT_DISK_BYTES,
+                 max_pixels=WORKING_MAX_PIXELS):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.max_pixels = max_pixels
+
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.decodes = 0
+        self.spills = 0
+        self.evictions = 0
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            for name in os.listdir(spill_dir):
+                if name.endswith(".img"):
+                    os.remove(os.path.join(spill_dir, name))
+
+    def put(self, data, stats=None):
+        """Store an upload's bytes and decoded working copy; returns its content digest
+
+        stats receives decode_image()'s decode statistics (size, frames, ...).
+        """
+        with stage("upload.digest", bytes=len(data)):
+            digest = content_digest(data)
+        with self._lock:
+            image = self._images.get(digest)
+            if image is not None and image.working is not None:
+                self._images.move_to_end(digest)
+                if stats is not None:
+                    stats.update(image.stats)
+                return digest
+        self._load(digest, data, stats)
+        return digest
+
+    def get_working(self, digest, stats=None):
+        """The working-resolution H x W x 3 array for digest (read-only), or None if it was evicted"""
+        with self._lock:
+            image = self._images.get(digest)
+            if image is not None and image.working is not None:
+                self._images.move_to_end(digest)
+                if stats is not None:
+                    stats.update(image.stats)
+                return image.working
+        data = self.get_bytes(digest)
+        if data is None:
+            return None
+        return self._load(digest, data, stats).working
+
+    def get_alpha(self, digest):
+        """The working copy's H x W opacity plane (read-only), or None for opaque or evicted images"""
+        if self.get_working(digest) is None:
+            return None
+        with self._lock:
+            image = self._images.get(digest)
+            return image.alpha if image is not None else None
+
+    def get_bytes(self, digest):
+        """The original compressed bytes for digest, reading spilled images back from disk"""
+        with self._lock:
+            image = self._images.get(digest)
+            if image is not None and image.data is not None:
+                self._images.move_to_end(digest)
+                return image.data
+        data = self._disk_read(digest)
+        if data is None:
+            return None
+        with self._lock:
+            image = self._images.get(digest)
+            if image is None:
+                image = self._images[digest] = StoredImage(None, None, {})
+            if image.data is None:
+                image.data = data
+                self._bytes += len(data)
+            self._images.move_to_end(digest)
+            self._evict()
+        return data
+
+    def open(self, digest):
+        """get_bytes() wrapped in a file object, or None"""
+        data = self.get_bytes(digest)
+        return None if data is None else io.BytesIO(data)
+
+    def discard(self, digest):
+        """Forget an image in memory and on disk"""
+        with self._lock:
+            image = self._images.pop(digest, None)
+            if image is not None:
+                self._bytes -= image.nbytes
+            self._disk_remove(digest)
+
+    def stats(self):
+        """Current usage of both tiers and lifetime counters"""
+        with self._lock:
+            resident = [image for image in self._images.values() if image.data is not None or image.working is not None]
+            return {
+                "images": len(resident),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "working_bytes": sum(image.working.nbytes for image in resident if image.working is not None),
+                "spilled": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "decodes": self.decodes,
+                "spills": self.spills,
+                "evictions": self.evictions,
+            }
+
+    def _load(self, digest, data, stats):
+        decode_stats = {}
+        working, alpha = split_alpha(decode_image(io.BytesIO(data), max_pixels=self.max_pixels, stats=decode_stats,
+                                                  keep_alpha=True))
+        working = np.ascontiguousarray(working)
+        # A transparency flag with every pixel opaque needs no mask
+        alpha = alpha.copy() if alpha is not None and alpha.min() < 255 else None
+        # Shared by every session that uploads the same file, so nobody may modify it in place
+        working.setflags(write=False)
+        if alpha is not None:
+            alpha.setflags(write=False)
+        with self._lock:
+            self.decodes += 1
+            previous = self._images.pop(digest, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            image = self._images[digest] = StoredImage(data, working, decode_stats, alpha)
+            self._bytes += image.nbytes
+            self._evict()
+        if stats is not None:
+            stats.update(decode_stats)
+        return image
+
+    # Eviction (callers hold self._lock); the most recently used image always stays
+    def _evict(self):
+        for digest in list(self._images)[:-1]:
+            if self._bytes <= self.max_bytes:
+                break
+            image = self._images.get(digest)
+            if image is None:
+                # Already dropped when its spill file was evicted
+                continue
+            if image.data is not None and self.spill_dir and digest not in self._disk:
+                self._disk_write(digest, image.data)
+            self._bytes -= image.nbytes
+            image.data = None
+            image.working = None
+            image.alpha = None
+            if digest not in self._disk:
+                del self._images[digest]
+                self.evictions += 1
+
+    # Disk tier: one file per digest, least recently spilled or read evicted first
+    def _disk_path(self, digest):
+        return os.path.join(self.spill_dir, f"{digest}.img")
+
+    def _disk_write(self, digest, data):
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(digest)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with stage("store.spill", bytes=len(data)), open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._disk[digest] = len(data)
+        self._disk_bytes += len(data)
+        self.spills += 1
+        while self._disk_bytes > self.disk_max_bytes:
+            oldest = next(iter(self._disk))
+            self._disk_remove(oldest)
+            image = self._images.get(oldest)
+            if image is not None and image.data is None and image.working is None:
+                del self._images[oldest]
+                self.evictions += 1
+
+    def _disk_read(self, digest):
+        with self._lock:
+            if digest not in self._disk:
+                return None
+            self._disk.move_to_end(digest)
+        try:
+            with stage("store.disk_read"), open(self._disk_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_remove(digest)
+            return None
+
+    def _disk_remove(self, digest):
+        size = self._disk.pop(digest, None)
+        if size is None:
+            return
+        self._disk_bytes -= size
+        try:
+            os.remove(self._disk_path(digest))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from palette_cache import PaletteCache, make_digest_key, make_key
+
+
+def value(size):
+    # JSON-encodes to exactly size bytes
+    return "x" * (size - 2)
+
+
+def test_keys_combine_content_colors_and_method():
+    data = b"image bytes"
+    key = make_key(data, 5, "kmeans-rgb")
+    assert key == f"{hashlib.sha256(data).hexdigest()}-5-kmeans-rgb"
+    assert key == make_digest_key(hashlib.sha256(data).hexdigest(), 5, "kmeans-rgb")
+    assert len({key, make_key(b"other bytes", 5, "kmeans-rgb"), make_key(data, 6, "kmeans-rgb"),
+                make_key(data, 5, "kmeans-lab")}) == 4
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = PaletteCache(max_bytes=30)
+    for key in "abc":
+        cache.put(key, value(10))
+    assert cache.get("a") == value(10)
+    cache.put("d", value(10))
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == [value(10)] * 3
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["memory_bytes"] == 30
+    assert (stats["hits"], stats["misses"]) == (4, 1)
+
+    # Replacing a key does not double count it; oversized values are not kept
+    cache.put("a", value(5))
+    assert cache.stats()["memory_bytes"] == 25
+    cache.put("huge", value(31))
+    assert cache.get("huge") is None and cache.stats()["entries"] == 3
+
+
+def test_disk_tier_survives_restart_and_evicts_oldest(tmp_path):
+    cache = PaletteCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=25)
+    cache.put("a", value(10))
+    cache.put("b", value(10))
+    now = time.time()
+    os.utime(tmp_path / "a.json", (now - 100, now - 100))
+    os.utime(tmp_path / "b.json", (now - 50, now - 50))
+
+    restarted = PaletteCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=25)
+    assert restarted.stats()["disk_bytes"] == 20
+    # Reading a touches it, so b is now the oldest file
+    assert restarted.get("a") == value(10)
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.put("c", value(10))
+
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert restarted.stats()["disk_bytes"] == 20
+    assert restarted.get("b") is None
+
+
+def test_palette_trees_round_trip():
+    cache = PaletteCache()
+    tree = {1: [(np.array([10.0, 20.0, 30.0]), 100.0)], 2: [(np.array([1.0, 2.0, 3.0]), 60.0),
+                                                            (np.array([4.0, 5.0, 6.0]), 40.0)]}
+    cache.put_palette_tree("key", tree)
+    restored = cache.get_palette_tree("key")
+    assert sorted(restored) == [1, 2]
+    assert all(np.array_equal(color, tree[n][i][0]) and share == tree[n][i][1]
+               for n, palette in restored.items() for i, (color, share) in enumerate(palette))
@@ -0,0 +1,293 @@
+import colorsys
+import io
+import time
+
+import numpy as np
+import pytest
+from PIL import Image, ImageOps
+from threadpoolctl import threadpool_info, threadpool_limits
+
+from palette_core import (
+    budgeted_restarts, extract_colors_budgeted, extract_colors_streaming, extract_palette, extract_tile_palettes, extract_animation_palette, decode_image, detect_background, mask_pixels, BUDGET_MAX_INIT,
+    COLOR_NAMES,
+    rgb_to_hex, rgb_to_cmyk, get_color_name, create_tint, create_color_harmony,
+    rgb_to_hex_array, rgb_to_cmyk_array, rgb_to_hsv_array, get_color_name_index_array, create_tint_array,
+    create_color_harmony_array,
+)
+
+
+def native_threads():
+    return {pool["internal_api"]: pool["num_threads"] for pool in threadpool_info()}
+
+
+def two_tone_image(height=120, width=160):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, : width // 2] = (200, 40, 40)
+    image[:, width // 2:] = (40, 40, 200)
+    return image
+
+
+def encoded(image, format="PNG", **options):
+    data = io.BytesIO()
+    image.save(data, format, **options)
+    data.seek(0)
+    return data
+
+
+def test_decode_palette_and_gray_alpha_modes():
+    palette = Image.new("P", (40, 30), 1)
+    palette.putpalette([255, 0, 0, 0, 0, 255] + [0] * 762)
+    palette.putpixel((0, 0), 0)
+    for data in (encoded(palette, transparency=0), encoded(palette, "GIF", transparency=0)):
+        rgba = decode_image(data, keep_alpha=True)
+        assert rgba.shape == (30, 40, 4) and rgba.dtype == np.uint8 and rgba.flags.c_contiguous
+        assert rgba[0, 0].tolist() == [255, 0, 0, 0] and rgba[1, 1].tolist() == [0, 0, 255, 255]
+    assert decode_image(encoded(palette, transparency=0)).shape == (30, 40, 3)
+
+    gray = Image.new("LA", (40, 30), (100, 255))
+    gray.putpixel((0, 0), (50, 0))
+    rgba = decode_image(encoded(gray), keep_alpha=True)
+    assert rgba[0, 0].tolist() == [50, 50, 50, 0] and rgba[1, 1].tolist() == [100, 100, 100, 255]
+    # Opaque images stay RGB even with keep_alpha
+    assert decode_image(encoded(Image.new("L", (40, 30), 100)), keep_alpha=True).shape == (30, 40, 3)
+
+
+def test_decode_16_bit_gray_keeps_the_full_range():
+    samples = (np.arange(3000 * 1000) % 65536).astype("<u2").reshape(1000, 3000)
+    image = Image.frombytes("I;16", (3000, 1000), samples.tobytes())
+    working = decode_image(encoded(image.crop((0, 0, 256, 10))))
+    assert working[0, :, 0].tolist() == [(value >> 8) for value in samples[0, :256]]
+    # Large enough to be reduced on the way in
+    working = decode_image(encoded(image))
+    assert working.shape[0] * working.shape[1] <= 2_000_000
+    assert working.max() > 200
+
+
+def test_decode_cmyk_jpeg():
+    working = decode_image(encoded(Image.new("CMYK", (40, 30), (0, 255, 255, 0)), "JPEG", quality=95))
+    assert working.shape == (30, 40, 3)
+    assert np.abs(working[15, 20].astype(int) - (255, 0, 0)).max() <= 8
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_decode_applies_exif_orientation(orientation):
+    image = Image.new("RGB", (64, 32), (0, 0, 255))
+    image.paste((255, 0, 0), (0, 0, 16, 8))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    data = encoded(image, exif=exif)
+    expected = np.asarray(ImageOps.exif_transpose(Image.open(data)).convert("RGB"))
+    data.seek(0)
+    assert np.array_equal(decode_image(data), expected)
+
+    # Orientation is applied after downscaling as well
+    data.seek(0)
+    small = decode_image(data, max_pixels=512)
+    assert small.shape[:2] == ((16, 32) if orientation < 5 else (32, 16))
+    assert small[0, 0].tolist() == expected[0, 0].tolist()
+
+
+def logo_on_white():
+    # A 40 x 40 white canvas with a red square and a slightly noisy blue bar
+    image = np.full((40, 40, 3), 255, dtype=np.uint8)
+    image[10:20, 10:20] = (200, 30, 30)
+    image[25:30, 5:35] = (30, 30, 200)
+    image[0, :8] = (250, 250, 250)
+    return image
+
+
+def test_mask_pixels_drops_transparent_pixels():
+    image = logo_on_white()
+    alpha = np.zeros((40, 40), dtype=np.uint8)
+    alpha[10:20, 10:20] = 255
+    alpha[25:30, 5:35] = 127
+    stats = {}
+    masked = mask_pixels(np.dstack([image, alpha]), stats=stats)
+    assert masked.shape == (1, 100, 3) and (masked == (200, 30, 30)).all()
+    assert stats["transparent_pixels"] == 1500 and stats["excluded_fraction"] == pytest.approx(1500 / 1600)
+
+    # A separate plane overrides, and min_opacity decides what counts as transparent
+    assert mask_pixels(image, alpha=alpha, min_opacity=127).shape == (1, 250, 3)
+    # Fully opaque or fully transparent images are left whole
+    assert mask_pixels(np.dstack([image, np.full((40, 40), 255, np.uint8)])).shape == (40, 40, 3)
+    for plane in (np.full((40, 40), 255, np.uint8), np.zeros((40, 40), np.uint8)):
+        stats = {}
+        assert mask_pixels(image, alpha=plane, stats=stats).shape == (40, 40, 3)
+        assert stats["excluded_fraction"] == 0.0
+
+
+def test_mask_pixels_drops_a_flat_background():
+    image = logo_on_white()
+    assert detect_background(image) == (255, 255, 255)
+    stats = {}
+    masked = mask_pixels(image, exclude_background=True, stats=stats)
+    # Near-white border pixels go with the background, the logo stays
+    assert masked.shape == (1, 250, 3)
+    assert stats["background_pixels"] == 1350 and stats["background_color"] == (255, 255, 255)
+    assert mask_pixels(image).shape == (40, 40, 3)
+
+    # Transparent pixels are not counted twice
+    alpha = np.full((40, 40), 255, dtype=np.uint8)
+    alpha[:, :2] = 0
+    stats = {}
+    assert mask_pixels(image, alpha=alpha, exclude_background=True, stats=stats).shape == (1, 250, 3)
+    assert stats["transparent_pixels"] + stats["background_pixels"] == 1350
+
+    # Busy borders have no background
+    noise = np.random.default_rng(0).integers(0, 256, size=(40, 40, 3), dtype=np.uint8)
+    assert detect_background(noise) is None
+    assert mask_pixels(noise, exclude_background=True).shape == (40, 40, 3)
+
+
+@pytest.mark.parametrize("format", ["GIF", "PNG"])
+def test_animation_palette_skips_transparent_pixels(format):
+    # A red and blue square moving over a transparent 100 x 100 canvas, then
+    # a frame with nothing visible
+    frames = []
+    for step in range(3):
+        frame = Image.new("RGBA", (100, 100), (0, 0, 0, 0))
+        frame.paste((255, 0, 0, 255), (10 + 5 * step, 10, 20 + 5 * step, 30))
+        frame.paste((0, 0, 255, 255), (20 + 5 * step, 10, 30 + 5 * step, 30))
+        frames.append(frame)
+    frames.append(Image.new("RGBA", (100, 100), (0, 0, 0, 0)))
+    options = {"disposal": 2} if format == "GIF" else {}
+    data = encoded(frames[0], format, save_all=True, append_images=frames[1:], duration=100, loop=0, **options)
+
+    stats = {}
+    result = extract_animation_palette(data, 3, stats=stats)
+    colors = sorted((tuple(np.round(color).astype(int)), round(percentage)) for color, percentage in result["palette"])
+    assert colors == [((0, 0, 255), 50), ((255, 0, 0), 50)]
+    assert [len(entry["palette"]) for entry in result["timeline"]] == [2, 2, 2, 0]
+    assert all(sum(percentage for _, percentage in entry["palette"]) == pytest.approx(100.0)
+               for entry in result["timeline"][:3])
+    assert stats["excluded_fraction"] == pytest.approx(1 - 3 * 400 / 40000)
+
+
+def kernel_colors():
+    # Random colors plus the edge cases of each scalar function: black,
+    # white, grays, primaries and hue boundaries
+    edges = [(0, 0, 0), (255, 255, 255), (128, 128, 128), (1, 1, 1), (255, 0, 0), (0, 255, 0), (0, 0, 255),
+             (255, 255, 0), (0, 255, 255), (255, 0, 255), (255, 64, 0), (255, 0, 64), (51, 51, 52), (204, 170, 170)]
+    colors = np.random.default_rng(0).integers(0, 256, size=(2000, 3))
+    return np.vstack([edges, colors])
+
+
+def test_vectorized_kernels_match_scalar_functions():
+    colors = kernel_colors()
+    tuples = [tuple(int(c) for c in color) for color in colors]
+
+    assert rgb_to_hex_array(colors).tolist() == [rgb_to_hex(color) for color in tuples]
+    assert rgb_to_cmyk_array(colors).tolist() == [list(rgb_to_cmyk(*color)) for color in tuples]
+    assert np.allclose(rgb_to_hsv_array(colors), [colorsys.rgb_to_hsv(*(np.array(color) / 255)) for color in tuples])
+    names = [COLOR_NAMES[i] for i in get_color_name_index_array(colors)]
+    assert names == [get_color_name(color) for color in tuples]
+    for percentage in (0, 30, 75, 100):
+        assert create_tint_array(colors, percentage).tolist() == [list(create_tint(color, percentage)) for color in tuples]
+    for harmony_type in ("complementary", "triadic", "analogous"):
+        expected = [[list(c) for c in create_color_harmony(color, harmony_type)] for color in tuples]
+        assert create_color_harmony_array(colors, harmony_type).tolist() == expected
+
+
+def test_tile_palettes_leave_the_callers_thread_pools_alone():
+    seen = []
+    with threadpool_limits(limits=2):
+        expected = native_threads()
+        extract_tile_palettes(two_tone_image(), (2, 2), 2, progress=lambda stage, fraction: seen.append(native_threads()))
+        assert native_threads() == expected
+    assert seen and all(threads == expected for threads in seen)
+
+
+def test_tile_palettes_collapse_identical_colors():
+    flat = np.full((120, 160, 3), 77, dtype=np.uint8)
+    result = extract_tile_palettes(flat, (4, 4), 5)
+    assert len(result["palette"]) == 1
+    color, percentage = result["palette"][0]
+    assert np.allclose(color, 77) and percentage == pytest.approx(100.0)
+    assert all(tile["shares"].tolist() == [pytest.approx(100.0)] for tile in result["tiles"])
+
+    result = extract_tile_palettes(two_tone_image(), (2, 2), 5)
+    assert sorted(tuple(np.round(color).astype(int)) for color, _ in result["palette"]) == [(40, 40, 200), (200, 40, 40)]
+
+
+def test_tile_palettes_skip_masked_pixels():
+    image = np.full((120, 160, 3), 255, dtype=np.uint8)
+    image[30:90, 20:70] = (200, 40, 40)
+    image[30:90, 90:140] = (40, 40, 200)
+    alpha = np.zeros((120, 160), dtype=np.uint8)
+    alpha[30:90, 20:70] = 255
+    alpha[30:90, 90:140] = 255
+
+    for options in ({"alpha": alpha}, {"exclude_background": True}):
+        result = extract_tile_palettes(image, (2, 2), 3, **options)
+        colors = sorted(tuple(np.round(color).astype(int)) for color, _ in result["palette"])
+        assert colors == [(40, 40, 200), (200, 40, 40)]
+        assert sum(percentage for _, percentage in result["palette"]) == pytest.approx(100.0)
+
+    # Fully transparent tiles get an empty palette and no shares
+    alpha[:60] = 0
+    result = extract_tile_palettes(image, (2, 2), 3, alpha=alpha)
+    assert [len(tile["palette"]) for tile in result["tiles"]][:2] == [0, 0]
+    assert not result["tiles"][0]["shares"].any()
+
+
+def noisy_image(height=60, width=80, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def test_budgeted_extraction_reports_exhaustion_only_when_the_deadline_stops_it():
+    stats = {}
+    colors = extract_colors_budgeted(noisy_image(), 4, budget=60.0, stats=stats)
+    assert len(colors) == 4
+    assert stats["n_init"] == BUDGET_MAX_INIT
+    assert stats["budget_exhausted"] is False
+
+    stats = {}
+    colors = extract_colors_budgeted(noisy_image(), 4, budget=0.001, stats=stats)
+    assert len(colors) == 4
+    assert stats["n_init"] == 1
+    assert stats["budget_exhausted"] is True
+
+
+def test_budget_applies_to_the_unique_color_path():
+    # Few enough distinct colors for extract_palette to cluster them by weight
+    image = noisy_image(200, 300)
+    image[:, :150] //= 16
+
+    stats = {}
+    colors = extract_palette(image, 6, stats=stats, budget=0.001)
+    assert stats["sample_method"] == "unique" and stats["budget_seconds"] == 0.001
+    assert stats["n_init"] == 1 and stats["budget_exhausted"] is True
+    assert len(colors) == 6 and sum(percentage for _, percentage in colors) == pytest.approx(100.0)
+
+    stats = {}
+    extract_palette(image, 6, stats=stats, budget=60.0)
+    assert stats["n_init"] == BUDGET_MAX_INIT and stats["budget_exhausted"] is False
+
+    stats = {}
+    extract_palette(image, 6, stats=stats)
+    assert "budget_seconds" not in stats
+
+
+def test_budget_applies_to_the_streaming_path():
+    image = noisy_image(200, 300)
+    stats = {}
+    colors = extract_colors_streaming(image, 4, tile_pixels=3000, stats=stats, budget=0.001)
+    assert stats["budget_exhausted"] is True
+    assert stats["coverage_pixels"] < stats["total_pixels"] == 60000
+    assert len(colors) == 4 and sum(percentage for _, percentage in colors) == pytest.approx(100.0)
+
+    stats = {}
+    extract_colors_streaming(image, 4, tile_pixels=3000, stats=stats, budget=60.0)
+    assert stats["budget_exhausted"] is False and stats["coverage_pixels"] == 60000
+
+
+def test_budgeted_restarts_report_convergence_against_the_cap_used():
+    data = noisy_image().reshape((-1, 3)).astype(np.float64)
+    best, stats = budgeted_restarts(data, 4, 1, deadline=0.0)
+    assert best.n_iter_ == 1 and stats["n_init"] == 1
+    assert stats["converged"] is False and stats["budget_exhausted"] is True
+
+    weights = np.arange(1, len(data) + 1, dtype=np.float64)
+    best, stats = budgeted_restarts(data, 4, 300, deadline=time.perf_counter() + 60, sample_weight=weights)
+    assert stats["converged"] is True and stats["n_init"] == BUDGET_MAX_INIT
+    assert stats["inertia"] == pytest.approx(best.inertia_ / weights.sum())
@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+from PIL import Image
+
+from palette_export import _StreamingPDF, write_palette_report
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PALETTE = [
+    {"name": "Red", "hex": "#dc1e1e", "rgb": [220, 30, 30], "percentage": 52.6},
+    {"name": "Blue", "hex": "#1e28dc", "rgb": [30, 40, 220], "percentage": 47.4},
+]
+
+# Runs write_palette_report() on the first N records of a JSONL file and prints peak RSS in KB
+REPORT_SCRIPT = textwrap.dedent("""
+    import itertools, json, resource, sys
+    sys.path.insert(0, sys.argv[1])
+    from palette_export import _StreamingPDF, write_palette_report
+    with open(sys.argv[2]) as f:
+        records = (json.loads(line) for line in itertools.islice(f, int(sys.argv[3])))
+        write_palette_report(records, sys.argv[4])
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+""")
+
+
+def test_report_pages_and_errors(tmp_path):
+    image_path = tmp_path / "photo.jpg"
+    Image.new("RGB", (64, 48), (200, 100, 50)).save(image_path)
+    records = [{"path": str(image_path), "palette": PALETTE, "method": "auto"}] * 5
+    records.append({"path": str(tmp_path / "missing.jpg"), "error": "OSError: missing"})
+    output = tmp_path / "report.pdf"
+
+    palettes, pages = write_palette_report(iter(records), str(output), per_page=4)
+
+    data = output.read_bytes()
+    assert (palettes, pages) == (5, 2)
+    assert data.startswith(b"%PDF-") and data.rstrip().endswith(b"%%EOF")
+    assert data.count(b"/Type /Page ") == 2
+    assert b"/Count 2" in data
+
+
+def test_report_does_not_need_reportlab(tmp_path):
+    image_path = tmp_path / "photo.jpg"
+    Image.new("RGB", (64, 48), (200, 100, 50)).save(image_path)
+    records_path = tmp_path / "records.jsonl"
+    records_path.write_text(json.dumps({"path": str(image_path), "palette": PALETTE}) + "\n")
+    output = tmp_path / "report.pdf"
+
+    # A None entry in sys.modules makes every reportlab import fail
+    script = "import sys; sys.modules['reportlab'] = None\n" + REPORT_SCRIPT
+    subprocess.run([sys.executable, "-c", script, REPO_ROOT, str(records_path), "1", str(output)],
+                   capture_output=True, text=True, check=True)
+    data = output.read_bytes()
+    assert data.startswith(b"%PDF-") and data.rstrip().endswith(b"%%EOF")
+    assert b"/Count 1" in data
+
+
+def test_text_width_matches_helvetica_metrics():
+    # Widths from the Adobe Helvetica AFM files
+    assert _StreamingPDF.text_width("Page 10", "Helvetica", 1000) == 667 + 556 + 556 + 556 + 278 + 556 + 556
+    assert _StreamingPDF.text_width("W", "Helvetica-Bold", 10) == 9.44
+
+
+def test_report_peak_memory_is_flat(tmp_path):
+    # Distinct noisy thumbnails, so nothing can be shared between pages
+    rng = np.random.default_rng(0)
+    records_path = tmp_path / "records.jsonl"
+    with open(records_path, "w") as f:
+        for i in range(500):
+            image_path = tmp_path / f"image{i}.jpg"
+            Image.fromarray(rng.integers(0, 255, (120, 160, 3), dtype=np.uint8)).save(image_path, quality=90)
+            f.write(json.dumps({"path": str(image_path), "palette": PALETTE}) + "\n")
+
+    def peak_rss_kb(count):
+        result = subprocess.run(
+            [sys.executable, "-c", REPORT_SCRIPT, REPO_ROOT, str(records_path), str(count), str(tmp_path / "out.pdf")],
+            capture_output=True, text=True, check=True
+        )
+        return int(result.stdout.strip())
+
+    small, large = peak_rss_kb(50), peak_rss_kb(500)
+    # The 500-record PDF is about 6 MB, so growth with the output would show
+    assert (tmp_path / "out.pdf").stat().st_size > 4 * 1024 * 1024
+    assert large - small < 3 * 1024
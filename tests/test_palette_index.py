@@ -0,0 +1,87 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from palette_index import PaletteIndex, hamming_distances, image_fingerprint
+
+
+def photo(seed=0, size=(240, 320)):
+    # Smooth random blobs, so resizing keeps the luminance gradients
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    return np.asarray(Image.fromarray(small).resize(size[::-1], Image.Resampling.BICUBIC))
+
+
+def recompressed(image, scale=0.5, quality=70):
+    resized = Image.fromarray(image).resize((int(image.shape[1] * scale), int(image.shape[0] * scale)))
+    data = io.BytesIO()
+    resized.save(data, "JPEG", quality=quality)
+    return np.asarray(Image.open(data).convert("RGB"))
+
+
+def with_hash_bits(fingerprint, bits):
+    image_hash, signature = fingerprint
+    for bit in range(bits):
+        image_hash ^= 1 << bit
+    return image_hash, signature
+
+
+def test_hamming_distances():
+    hashes = np.array([0, 1, 0xFF, 2**64 - 1], dtype=np.uint64)
+    assert hamming_distances(hashes, 0).tolist() == [0, 1, 8, 64]
+    assert hamming_distances(hashes, 2**64 - 1).tolist() == [64, 63, 56, 0]
+
+
+def test_resized_copy_hits_and_other_images_miss():
+    index = PaletteIndex()
+    original = photo()
+    index.add(image_fingerprint(original), "kmeans", {"palette": 1})
+
+    value, distance = index.lookup(image_fingerprint(recompressed(original)), "kmeans")
+    assert value == {"palette": 1} and distance <= index.max_distance
+    assert index.lookup(image_fingerprint(photo(seed=1)), "kmeans") is None
+    # Results of other methods are never served
+    assert index.lookup(image_fingerprint(original), "median-cut") is None
+    assert (index.stats()["hits"], index.stats()["misses"]) == (1, 2)
+
+
+def test_hash_distance_threshold():
+    index = PaletteIndex(max_distance=5)
+    fingerprint = image_fingerprint(photo())
+    index.add(fingerprint, "kmeans", "original")
+
+    assert index.lookup(with_hash_bits(fingerprint, 5), "kmeans") == ("original", 5)
+    assert index.lookup(with_hash_bits(fingerprint, 6), "kmeans") is None
+    assert index.lookup(with_hash_bits(fingerprint, 6), "kmeans", max_distance=6) == ("original", 6)
+
+    # The closest of several candidates wins
+    index.add(with_hash_bits(fingerprint, 2), "kmeans", "closer")
+    assert index.lookup(with_hash_bits(fingerprint, 3), "kmeans") == ("closer", 1)
+
+
+@pytest.mark.parametrize("shift, hit", [(16, True), (17, False)])
+def test_color_tolerance_threshold(shift, hit):
+    index = PaletteIndex(color_tolerance=16)
+    image_hash, signature = image_fingerprint(photo())
+    index.add((image_hash, signature), "kmeans", "original")
+
+    # Same hash, one channel of one quadrant recolored
+    recolored = bytearray(signature)
+    recolored[0] = recolored[0] + shift if recolored[0] + shift <= 255 else recolored[0] - shift
+    result = index.lookup((image_hash, bytes(recolored)), "kmeans")
+    assert (result == ("original", 0)) if hit else result is None
+
+
+def test_entries_from_another_connection_are_picked_up(tmp_path):
+    path = str(tmp_path / "index.sqlite")
+    reader, writer = PaletteIndex(path), PaletteIndex(path)
+    fingerprint = image_fingerprint(photo())
+    assert reader.lookup(fingerprint, "kmeans") is None
+
+    writer.add_many([(fingerprint, "kmeans", [1, 2]), (image_fingerprint(photo(seed=1)), "kmeans", [3])])
+    assert reader.lookup(fingerprint, "kmeans") == ([1, 2], 0)
+    assert reader.stats()["entries"] == {"kmeans": 2}
+    reader.close()
+    writer.close()
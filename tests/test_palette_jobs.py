@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from palette_jobs import JobQueue, QueueFull
+
+
+def blocking(release, started=None, progress=None):
+    # Never calls progress, like an extraction stuck in a long native call
+    if started is not None:
+        started.set()
+    release.wait(5)
+    return "done"
+
+
+def stepping(release, progress=None):
+    while not release.wait(0.01):
+        progress("fit", 0.5)
+    return "done"
+
+
+def test_same_key_returns_the_current_job():
+    queue = JobQueue(max_workers=1, max_pending=4)
+    release = threading.Event()
+    try:
+        job = queue.submit("a", "key", blocking, release)
+        assert queue.submit("a", "key", blocking, release) is job
+    finally:
+        release.set()
+        queue.shutdown()
+
+
+def test_queued_job_is_dropped_on_cancel():
+    queue = JobQueue(max_workers=1, max_pending=4)
+    release, started = threading.Event(), threading.Event()
+    try:
+        queue.submit("a", "key", blocking, release, started)
+        assert started.wait(5)
+        queued = queue.submit("b", "key", blocking, release)
+        assert queued.status == "queued"
+        queue.cancel("b")
+        assert queued.status == "cancelled"
+        assert queue.stats()["cancelled"] == 1
+    finally:
+        release.set()
+        queue.shutdown()
+
+
+def test_running_job_stops_at_next_progress_call():
+    queue = JobQueue(max_workers=1, max_pending=4)
+    release = threading.Event()
+    try:
+        job = queue.submit("a", "key", stepping, release)
+        while job.stage is None:
+            release.wait(0.01)
+        queue.cancel("a")
+        job._future.result(5)
+        assert job.status == "cancelled"
+    finally:
+        release.set()
+        queue.shutdown()
+
+
+def test_full_queue_rejects_new_owners():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+    try:
+        queue.submit("a", "key", blocking, release)
+        queue.submit("b", "key", blocking, release)
+        with pytest.raises(QueueFull):
+            queue.submit("c", "key", blocking, release)
+        assert queue.stats()["rejected"] == 1
+    finally:
+        release.set()
+        queue.shutdown()
+
+
+def test_replaced_running_job_counts_until_it_returns():
+    queue = JobQueue(max_workers=2, max_pending=2)
+    release, started = threading.Event(), threading.Event()
+    try:
+        first = queue.submit("a", "first", blocking, release, started)
+        assert started.wait(5)
+        # Cancelling cannot stop the running job, so it still holds a slot
+        queue.submit("a", "second", blocking, release)
+        assert first.status == "running"
+        with pytest.raises(QueueFull):
+            queue.submit("b", "key", blocking, release)
+        assert queue.stats()["running"] == 2
+
+        release.set()
+        first._future.result(5)
+        queue.get("a")._future.result(5)
+        release.clear()
+        queue.submit("b", "key", blocking, release)
+    finally:
+        release.set()
+        queue.shutdown()
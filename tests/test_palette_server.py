@@ -0,0 +1,103 @@
+import http.client
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import palette_server
+from palette_server import Overloaded, PaletteService, make_server
+
+
+@pytest.fixture
+def server():
+    server = make_server(port=0, workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.service.close()
+    server.server_close()
+
+
+def post_with_length(server, length):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    connection.putrequest("POST", "/palette")
+    connection.putheader("Content-Length", length)
+    connection.endheaders()
+    response = connection.getresponse()
+    body = json.loads(response.read())
+    connection.close()
+    return response.status, body
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1.5"])
+def test_bad_content_length_is_rejected(server, length):
+    status, body = post_with_length(server, length)
+    assert status == 400
+    assert "Content-Length" in body["error"]
+
+
+def test_timed_out_request_keeps_its_slot_until_the_work_finishes(monkeypatch):
+    release = threading.Event()
+
+    def slow_extract_batch(items, budget=None):
+        release.wait(5)
+        return [[[[1.0, 2.0, 3.0], 100.0]] for _ in items]
+
+    monkeypatch.setattr(palette_server, "extract_batch", slow_extract_batch)
+    service = PaletteService(max_in_flight=1, max_wait=0)
+    service._executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        with pytest.raises(TimeoutError):
+            service.extract(b"first", 3, timeout=0.05)
+        # The first extraction is still running, so it still counts against max_in_flight
+        with pytest.raises(Overloaded):
+            service.extract(b"second", 3, timeout=0.05)
+        assert service.in_flight == 1
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while service.in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert service.in_flight == 0
+        assert service.extract(b"third", 3, timeout=5) == [[[1.0, 2.0, 3.0], 100.0]]
+    finally:
+        release.set()
+        service.close()
+
+
+def crashing_extract_batch(items, budget=None):
+    # Stands in for a worker killed mid-batch, e.g. by the OOM killer
+    if any(data == b"crash" for data, _, _ in items):
+        os.kill(os.getpid(), signal.SIGKILL)
+    return [[[[1.0, 2.0, 3.0], 100.0]] for _ in items]
+
+
+def test_dead_worker_process_does_not_hang_the_service(monkeypatch):
+    monkeypatch.setattr(palette_server, "extract_batch", crashing_extract_batch)
+    service = PaletteService(workers=1, max_wait=0, max_in_flight=2)
+    try:
+        assert service.extract(b"first", 3, timeout=10) == [[[1.0, 2.0, 3.0], 100.0]]
+        with pytest.raises(ValueError, match="BrokenProcessPool"):
+            service.extract(b"crash", 3, timeout=10)
+        assert service.extract(b"second", 3, timeout=10) == [[[1.0, 2.0, 3.0], 100.0]]
+
+        # A worker killed while idle breaks the pool at the next submit
+        for pid in list(service._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        time.sleep(0.5)
+        results = []
+        for i in range(4):
+            try:
+                results.append(service.extract(b"after %d" % i, 3, timeout=10))
+            except ValueError as e:
+                results.append(str(e))
+        assert results[-2:] == [[[[1.0, 2.0, 3.0], 100.0]]] * 2
+        assert service._dispatcher.is_alive()
+        assert service.in_flight == 0 and service.pool_restarts == 2
+    finally:
+        service.close()
@@ -0,0 +1,132 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from palette_store import ImageStore
+
+
+def png(seed, mode="RGB", size=(40, 30)):
+    # Noise, so every image compresses to a different, non-trivial size
+    channels = len(mode)
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], channels), dtype=np.uint8)
+    if mode == "RGBA":
+        pixels[..., 3] = np.where(pixels[..., 3] < 128, 0, 255)
+    data = io.BytesIO()
+    Image.fromarray(pixels, mode).save(data, "PNG")
+    return data.getvalue()
+
+
+def image_bytes(data):
+    # Memory one resident RGB upload takes: its bytes plus the 40 x 30 working copy
+    return len(data) + 40 * 30 * 3
+
+
+def check_accounting(store):
+    stats = store.stats()
+    assert stats["memory_bytes"] == sum(image.nbytes for image in store._images.values())
+    # The most recently used image stays even when it alone is over budget
+    holding = [image for image in store._images.values() if image.nbytes]
+    assert stats["memory_bytes"] <= store.max_bytes or len(holding) == 1
+    assert stats["images"] == len(holding)
+    if store.spill_dir:
+        files = {name: os.path.getsize(os.path.join(store.spill_dir, name)) for name in os.listdir(store.spill_dir)}
+        assert files == {f"{digest}.img": size for digest, size in store._disk.items()}
+        assert stats["disk_bytes"] == sum(files.values()) <= store.disk_max_bytes
+    assert stats["spilled"] == len(store._disk)
+
+
+def test_least_recently_used_images_leave_memory_first():
+    images = [png(seed) for seed in range(3)]
+    store = ImageStore(max_bytes=image_bytes(images[0]) + image_bytes(images[1]) + 100)
+    a, b = store.put(images[0]), store.put(images[1])
+    assert store.get_working(a) is not None
+    c = store.put(images[2])
+
+    # b was used longest ago; without a spill directory it is gone for good
+    assert store.get_working(b) is None and store.get_bytes(b) is None
+    assert store.get_working(a) is not None and store.get_working(c) is not None
+    stats = store.stats()
+    assert (stats["images"], stats["evictions"], stats["spills"]) == (2, 1, 0)
+    check_accounting(store)
+
+
+def test_spilled_images_are_decoded_again_on_next_use(tmp_path):
+    images = [png(seed) for seed in range(3)]
+    store = ImageStore(max_bytes=image_bytes(images[0]) + image_bytes(images[1]) + 100, spill_dir=str(tmp_path))
+    digests = [store.put(data) for data in images]
+    expected = np.asarray(Image.open(io.BytesIO(images[0])))
+    assert store.stats()["spilled"] == 1 and os.listdir(tmp_path) == [f"{digests[0]}.img"]
+    check_accounting(store)
+
+    working = store.get_working(digests[0])
+    assert np.array_equal(working, expected) and not working.flags.writeable
+    stats = store.stats()
+    # The reload pushed the next least recently used image out
+    assert stats["decodes"] == 4 and stats["spills"] == 2 and stats["evictions"] == 0
+    assert store.get_bytes(digests[1]) == images[1]
+    check_accounting(store)
+
+
+def test_images_evicted_from_both_tiers_are_gone(tmp_path):
+    images = [png(seed) for seed in range(3)]
+    store = ImageStore(max_bytes=image_bytes(images[0]) + 100, spill_dir=str(tmp_path),
+                       disk_max_bytes=max(map(len, images)) + 100)
+    digests = [store.put(data) for data in images]
+
+    # Only the latest spill fits on disk, so the first image lost its placeholder too
+    assert store.get_working(digests[0]) is None and store.get_alpha(digests[0]) is None
+    assert digests[0] not in store._images
+    assert store.stats()["evictions"] == 1 and store.stats()["spilled"] == 1
+    check_accounting(store)
+
+    # Putting it again brings it back
+    assert store.put(images[0]) == digests[0]
+    assert store.get_working(digests[0]) is not None
+    check_accounting(store)
+
+
+def test_alpha_plane_survives_spill_and_reload(tmp_path):
+    rgba, opaque = png(0, "RGBA"), png(1)
+    store = ImageStore(max_bytes=len(rgba) + 40 * 30 * 4 + 100, spill_dir=str(tmp_path))
+    digest = store.put(rgba)
+    alpha = store.get_alpha(digest)
+    assert alpha.shape == (30, 40) and set(np.unique(alpha)) == {0, 255}
+
+    store.put(opaque)
+    assert store.stats()["spilled"] == 1
+    assert np.array_equal(store.get_alpha(digest), alpha)
+    assert store.get_alpha(store.put(opaque)) is None
+    check_accounting(store)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_accounting_stays_consistent_over_random_cycles(tmp_path, seed):
+    images = [png(i) for i in range(6)]
+    store = ImageStore(max_bytes=3 * image_bytes(images[0]), spill_dir=str(tmp_path),
+                       disk_max_bytes=2 * max(map(len, images)) + 100)
+    digests = {}
+    rng = np.random.default_rng(seed)
+    for _ in range(60):
+        i = int(rng.integers(len(images)))
+        action = rng.choice(["put", "working", "bytes", "discard"], p=[0.4, 0.3, 0.2, 0.1])
+        if action == "put" or i not in digests:
+            digests[i] = store.put(images[i])
+        elif action == "working":
+            working = store.get_working(digests[i])
+            assert working is None or working.shape == (30, 40, 3)
+        elif action == "bytes":
+            assert store.get_bytes(digests[i]) in (None, images[i])
+        else:
+            store.discard(digests[i])
+            assert store.get_working(digests[i]) is None
+        check_accounting(store)
+
+
+def test_stale_spill_files_are_removed_on_startup(tmp_path):
+    (tmp_path / "left_over.img").write_bytes(b"old")
+    (tmp_path / "other.txt").write_bytes(b"keep")
+    ImageStore(spill_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == ["other.txt"]
@@ -1,19 +1,71 @@
 import streamlit as st
 import numpy as np
-from PIL import Image
 import io
+import os
 import json
-from typing import List, Tuple, Dict
-from sklearn.cluster import KMeans
-import colorsys
-from datetime import datetime
+import importlib
+import tempfile
+import threading
+import time
+import uuid
+from functools import partial
+import palette_metrics
+from palette_cache import PaletteCache, make_digest_key, palette_digest, palette_tree_from_payload, palette_tree_to_payload
+from palette_index import PaletteIndex, image_fingerprint, DEFAULT_INDEX_PATH, DEFAULT_MAX_DISTANCE, HASH_BITS
+from palette_jobs import JobQueue, QueueFull
+from palette_store import ImageStore
+from palette_core import (
+    rgb_to_hex, rgb_to_cmyk, get_color_name, create_tint, create_color_harmony,
+    build_palette_tree, palette_from_tree, mask_pixels, extract_tile_palettes, extract_animation_palette, ANIMATION_MAX_FRAMES, WORKING_MAX_PIXELS, PALETTE_TREE_MAX_COLORS, COLOR_SPACES,
+    DEFAULT_BUDGET_SECONDS, BUDGET_MAX_INIT,
+    COLOR_NAMES, rgb_to_hex_array, rgb_to_cmyk_array, get_color_name_index_array, create_tint_array
+)
+from palette_export import (
+    harmony_to_dict, tile_map_to_dict, tile_heatmap, animation_to_dict, export_palette, bundle_formats,
+    write_zip_bundle, EXPORT_FORMATS, BUNDLE_FORMAT, BUNDLE_FILE, REPORTLAB_AVAILABLE
+)
+
+# Seconds an extraction may take (WILD_PICK_EXTRACTION_BUDGET); K-means is sized by the calibrated
+# cost model to fit it, and 0 runs the unbudgeted engine to convergence instead
+EXTRACTION_BUDGET_SECONDS = float(os.environ.get("WILD_PICK_EXTRACTION_BUDGET", DEFAULT_BUDGET_SECONDS)) or None
+
+# Palette cache: shared in-memory LRU plus an optional on-disk tier (set WILD_PICK_CACHE_DIR to enable)
+PALETTE_METHOD = f"tree-auto-masked-{WORKING_MAX_PIXELS}" + (f"-budget-{EXTRACTION_BUDGET_SECONDS:g}" if EXTRACTION_BUDGET_SECONDS else "")
+PALETTE_CACHE_MEMORY_BYTES = 16 * 1024 * 1024
+PALETTE_CACHE_DIR = os.environ.get("WILD_PICK_CACHE_DIR")
+PALETTE_CACHE_DISK_BYTES = 256 * 1024 * 1024
+
+# Near-duplicate uploads (the same asset at another size or quality) reuse an earlier palette tree;
+# WILD_PICK_PALETTE_INDEX="" keeps the index in memory only
+PALETTE_INDEX_PATH = os.environ.get("WILD_PICK_PALETTE_INDEX", DEFAULT_INDEX_PATH)
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.environ.get("WILD_PICK_NEAR_DUPLICATE_DISTANCE", DEFAULT_MAX_DISTANCE))
+
+# Uploaded images: one memory budget across all sessions; least recently used images spill to disk
+IMAGE_STORE_MEMORY_BYTES = int(os.environ.get("WILD_PICK_IMAGE_STORE_MB", 256)) * 1024 * 1024
+IMAGE_STORE_SPILL_DIR = os.environ.get("WILD_PICK_IMAGE_SPILL_DIR")
+IMAGE_STORE_DISK_BYTES = 2 * 1024 * 1024 * 1024
+
+# Background extraction: worker threads shared by all sessions and how many jobs may wait
+EXTRACTION_WORKERS = int(os.environ.get("WILD_PICK_EXTRACTION_WORKERS", 2))
+EXTRACTION_MAX_PENDING = int(os.environ.get("WILD_PICK_EXTRACTION_MAX_PENDING", 8))
+EXTRACTION_POLL_SECONDS = 0.5
+EXTRACTION_STAGE_LABELS = {"decode": "Decoding image...", "fit": "Fitting colors...", "assign": "Measuring coverage..."}
+
+# Pipeline metrics (WILD_PICK_METRICS=1): stage timings are logged as JSON lines and, with
+# WILD_PICK_METRICS_FILE set, written there in Prometheus text format at most every few seconds
+METRICS_FILE = os.environ.get("WILD_PICK_METRICS_FILE")
+METRICS_WRITE_SECONDS = 5
+if palette_metrics.is_enabled():
+    palette_metrics.enable()
 
-# Optional libraries
-try:
-    from colorthief import ColorThief
-    COLORTHIEF_AVAILABLE = True
-except ImportError:
-    COLORTHIEF_AVAILABLE = False
+# Export artifacts kept per palette and format (st.cache_data evicts the least recently used)
+EXPORT_CACHE_ENTRIES = 64
+
+# Tile grids offered for mapping where colors live (n x n tiles)
+TILE_GRID_OPTIONS = [2, 3, 4, 6, 8]
+
+# Labels for the clustering color spaces offered in the UI
+COLOR_SPACE_LABELS = {"rgb": "RGB", "lab": "CIELAB (perceptual)", "oklab": "OKLab (perceptual)"}
 
 # Set page config
 st.set_page_config(
@@ -23,613 +75,363 @@ st.set_page_config(
 )
 
 # Brand Guidelines CSS - Minimal, Clean Design
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Raleway+Dots&family=Inter:wght@300;400;500;600;700&family=Poppins:wght@300&display=swap');
-    
-    /* Reset and base styles */
-    .stApp {
-        background-color: #faf9f7;
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-    }
-    
-    .main .block-container {
-        background-color: #faf9f7;
-        padding: 10px 3rem 2rem 3rem !important;
-        max-width: 100%;
-    }
-    
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Main title */
-    .brand-title {
-        font-family: 'Raleway Dots', cursive !important;
-        font-size: 6rem !important;
-        color: #1a1a1a !important;
-        text-align: center;
-        margin: 0 0 0.5rem 0 !important;
-        font-weight: 400 !important;
-        letter-spacing: normal;
-    }
-    
-    .brand-subtitle {
-        text-align: center;
-        font-size: 1.1rem;
-        color: #666;
-        margin-top: -60px;
-        margin-bottom: 3rem;
-        font-family: 'Poppins', sans-serif;
-        font-weight: 300;
-    }
-    
-    /* Section headers */
-    .section-header {
-        font-family: 'Inter', sans-serif !important;
-        font-size: 1.5rem !important;
-        color: #1a1a1a !important;
-        margin: 3rem 0 2rem 0 !important;
-        font-weight: 500 !important;
-        position: relative;
-    }
-    
-    .section-header::after {
-        content: '';
-        position: absolute;
-        bottom: -0.5rem;
-        left: 0;
-        width: 3rem;
-        height: 1px;
-        background-color: #d0d0d0;
-    }
-    
-    /* Color grid - Large circular swatches */
-    .color-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-        gap: 3rem;
-        margin: 3rem 0;
-        padding: 2rem 0;
-    }
-    
-    .color-swatch-container {
-        text-align: center;
-        cursor: pointer;
-        transition: transform 0.3s ease;
-        margin-bottom: 3rem;
-        padding-bottom: 2rem;
-    }
-    
-    .color-swatch-container:hover {
-        transform: translateY(-4px);
-    }
-    
-    .color-swatch {
-        width: 120px;
-        height: 120px;
-        border-radius: 50%;
-        margin: 0 auto 1.5rem auto;
-        box-shadow: 0 8px 25px rgba(0,0,0,0.15);
-        border: none;
-        transition: box-shadow 0.3s ease;
-        position: relative;
-    }
-    
-    .color-swatch:hover {
-        box-shadow: 0 12px 35px rgba(0,0,0,0.25);
-    }
-    
-    .color-swatch.selected {
-        box-shadow: 0 0 0 4px #007acc;
-    }
-    
-    .color-name {
-        font-size: 1.2rem;
-        font-weight: 600;
-        color: #1a1a1a;
-        margin-bottom: 0.5rem;
-    }
-    
-    .color-values {
-        font-family: 'Monaco', 'Menlo', 'Consolas', monospace;
-        font-size: 0.9rem;
-        color: #666;
-        line-height: 1.6;
-    }
-    
-    /* Tints strip */
-    .tints-strip {
-        display: flex;
-        justify-content: center;
-        gap: 0;
-        margin: 1rem 0;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.15);
-        border-radius: 0;
-        overflow: hidden;
-    }
-    
-    .tint-swatch {
-        width: 60px;
-        height: 250px;
-        border: none;
-        position: relative;
-        cursor: pointer;
-        flex: 1;
-    }
-    
-    .tint-label {
-        position: absolute;
-        bottom: 8px;
-        left: 50%;
-        transform: translateX(-50%);
-        font-size: 0.8rem;
-        color: rgba(255, 255, 255, 0.9);
-        font-weight: 600;
-        text-shadow: 0 1px 3px rgba(0,0,0,0.5);
-        white-space: nowrap;
-    }
-    
-    /* Harmony playground */
-    .harmony-tray {
-        background: white;
-        border-radius: 12px;
-        padding: 2rem;
-        margin: 2rem 0;
-        box-shadow: 0 4px 20px rgba(0,0,0,0.08);
-        border: 1px solid #e8e8e8;
-        display: none;
-    }
-    
-    .harmony-tray.expanded {
-        display: block;
-        animation: slideDown 0.3s ease;
-    }
-    
-    @keyframes slideDown {
-        from {
-            opacity: 0;
-            transform: translateY(-10px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .harmony-group {
-        margin-bottom: 2rem;
-    }
-    
-    .harmony-title {
-        font-size: 1rem;
-        font-weight: 600;
-        color: #1a1a1a;
-        margin-bottom: 1rem;
-    }
-    
-    .harmony-colors {
-        display: flex;
-        gap: 1rem;
-        align-items: center;
-    }
-    
-    .harmony-mini {
-        width: 50px;
-        height: 50px;
-        border-radius: 50%;
-        border: none;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-        position: relative;
-    }
-    
-    .harmony-hex {
-        font-family: 'Monaco', 'Menlo', 'Consolas', monospace;
-        font-size: 0.8rem;
-        color: #666;
-        margin-left: 0.5rem;
-    }
-    
-    /* Upload area */
-    .upload-section {
-        background: white;
-        border-radius: 12px;
-        padding: 3rem;
-        text-align: center;
-        border: 2px dashed #d0d0d0;
-        margin: 2rem 0;
-        transition: all 0.3s ease;
-    }
-    
-    .upload-section:hover {
-        border-color: #007acc;
-        background: #f8fafe;
-    }
-    
-    /* Buttons */
-    .extract-button {
-        background: #1a1a1a;
-        color: white;
-        border: none;
-        padding: 1rem 2rem;
-        border-radius: 8px;
-        font-family: 'Inter', sans-serif;
-        font-weight: 500;
-        font-size: 1rem;
-        cursor: pointer;
-        transition: all 0.2s ease;
-        margin: 2rem 0;
-    }
-    
-    .extract-button:hover {
-        background: #333;
-        transform: translateY(-1px);
-    }
-    
-    .export-button {
-        background: #007acc;
-        color: white;
-        border: none;
-        padding: 0.75rem 1.5rem;
-        border-radius: 6px;
-        font-family: 'Inter', sans-serif;
-        font-weight: 500;
-        font-size: 0.9rem;
-        cursor: pointer;
-        transition: all 0.2s ease;
-        margin: 1rem 0;
-    }
+# Served from static/ (server.enableStaticServing), so reruns send a link instead of the stylesheet
+st.markdown('<link rel="stylesheet" href="app/static/wild_pick_2.css">', unsafe_allow_html=True)
+
+@st.cache_resource
+def get_palette_cache():
+    """Palette cache shared by every session of this server process"""
+    return PaletteCache(
+        max_bytes=PALETTE_CACHE_MEMORY_BYTES,
+        disk_dir=PALETTE_CACHE_DIR,
+        disk_max_bytes=PALETTE_CACHE_DISK_BYTES
+    )
+
+@st.cache_resource
+def get_palette_index():
+    """Near-duplicate palette index shared by every session of this server process"""
+    return PaletteIndex(PALETTE_INDEX_PATH or None, max_distance=NEAR_DUPLICATE_MAX_DISTANCE)
+
+@st.cache_resource
+def get_image_store():
+    """Uploaded image store shared by every session of this server process"""
+    return ImageStore(
+        max_bytes=IMAGE_STORE_MEMORY_BYTES,
+        spill_dir=IMAGE_STORE_SPILL_DIR or tempfile.mkdtemp(prefix="wild_pick_images_"),
+        disk_max_bytes=IMAGE_STORE_DISK_BYTES
+    )
+
+def session_image(uploaded_file):
+    """The session's working image from the shared store, or None
+
+    An image evicted from both tiers is added again from the upload widget
+    while it still holds the file.
+    """
+    digest = st.session_state.uploaded_digest
+    if digest is None:
+        return None
+    image = get_image_store().get_working(digest)
+    if image is None and uploaded_file is not None:
+        get_image_store().put(uploaded_file.getvalue())
+        image = get_image_store().get_working(digest)
+    return image
+
+@st.cache_resource
+def get_job_queue():
+    """Background extraction pool shared by every session of this server process"""
+    # Import scikit-learn now, off the page script, so the first extraction's budget is not spent on it
+    threading.Thread(target=importlib.import_module, args=("sklearn.cluster",), daemon=True).start()
+    return JobQueue(max_workers=EXTRACTION_WORKERS, max_pending=EXTRACTION_MAX_PENDING)
+
+def extract_palette_tree(cache, cache_key, image, color_space, alpha=None, exclude_background=False,
+                         index=None, fingerprint=None, index_method=None, progress=None):
+    """Job body: mask out transparent (and background) pixels, build the palette tree and store it in the shared cache
+    
+    With index, the tree is also filed under the image's fingerprint so
+    near-duplicate uploads can reuse it.
+    """
+    stats = {}
+    pixels = mask_pixels(image, alpha, exclude_background=exclude_background, stats=stats)
+    tree = build_palette_tree(pixels, color_space=color_space, stats=stats, progress=progress, budget=EXTRACTION_BUDGET_SECONDS)
+    cache.put_palette_tree(cache_key, tree)
+    if index is not None:
+        index.add(fingerprint, index_method, palette_tree_to_payload(tree))
+    return tree, stats
+
+def use_palette_tree(tree, note):
+    """Show a freshly extracted palette tree and remember what to say about it"""
+    st.session_state.palette_tree = tree
+    st.session_state.extracted_colors = []
+    st.session_state.selected_color_index = None
+    st.session_state.expanded_harmony = {}
+    st.session_state.extraction_note = note
+
+def palette_strip_html(palette):
+    """Proportional color bar for one palette"""
+    hexes = rgb_to_hex_array(np.array([color for color, _ in palette]))
+    segments = "".join(
+        f'<div style="background-color: {hexes[i]}; flex: {percentage:.2f};" title="{hexes[i]} {percentage:.1f}%"></div>'
+        for i, (_, percentage) in enumerate(palette)
+    )
+    return f'<div class="palette-strip">{segments}</div>'
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def palette_grid_html(palette_rgb, selected_index):
+    """Swatches, color values and tint strips for a whole palette as one HTML fragment
+
+    Memoized on the palette's RGB tuples and the selected index, so reruns
+    that do not change the palette reuse the same markup.
+    """
+    rgb = np.array(palette_rgb, dtype=np.int64).reshape((-1, 3))
+    names = get_color_name_index_array(rgb)
+    hexes = rgb_to_hex_array(rgb)
+    cmyk = rgb_to_cmyk_array(rgb)
+    tints_75 = rgb_to_hex_array(create_tint_array(rgb, 75))
+    tints_50 = rgb_to_hex_array(create_tint_array(rgb, 50))
+    
+    swatches = []
+    for i in range(len(rgb)):
+        r, g, b = rgb[i].tolist()
+        c, m, y, k = cmyk[i].tolist()
+        selected_class = "selected" if selected_index == i else ""
+        swatches.append(
+            f'<div class="color-swatch-container">'
+            f'<div class="color-swatch {selected_class}" style="background-color: {hexes[i]};"></div>'
+            f'<div class="color-name">{COLOR_NAMES[names[i]]}</div>'
+            f'<div class="color-values">CMYK: {c}, {m}, {y}, {k}<br>RGB: {r}, {g}, {b}<br>HEX: {hexes[i]}</div>'
+            f'<div class="tints-strip">'
+            f'<div class="tint-swatch" style="background-color: {hexes[i]};"><div class="tint-label">100%</div></div>'
+            f'<div class="tint-swatch" style="background-color: {tints_75[i]};"><div class="tint-label">75%</div></div>'
+            f'<div class="tint-swatch" style="background-color: {tints_50[i]};"><div class="tint-label">50%</div></div>'
+            f'</div>'
+            f'</div>'
+        )
+    return f'<div class="color-grid">{"".join(swatches)}</div>'
+
+def harmony_tray_html(base_color, harmony_types):
+    """Harmony Playground swatches for the chosen harmony types as one HTML fragment"""
+    groups = []
+    for harmony_type in harmony_types:
+        swatches = "".join(
+            f'<div style="text-align: center;">'
+            f'<div class="harmony-mini" style="background-color: {hex_color}; margin: 0 auto;"></div>'
+            f'<span class="harmony-hex">{hex_color}</span>'
+            f'</div>'
+            for hex_color in (rgb_to_hex(color) for color in create_color_harmony(base_color, harmony_type))
+        )
+        groups.append(
+            f'<div class="harmony-group">'
+            f'<div class="harmony-title">{harmony_type.capitalize()}</div>'
+            f'<div class="harmony-colors" style="justify-content: center;">{swatches}</div>'
+            f'</div>'
+        )
+    return f'<div class="harmony-tray expanded">{"".join(groups)}</div>'
+
+def finish_extraction(job):
+    """Show a finished extraction job's palette tree, or remember its error"""
+    if job.status == "done":
+        tree, stats = job.result
+        note = f"Fitted on {stats['sample_size']:,} of {stats['total_pixels']:,} pixels in {stats['seconds']:.2f}s"
+        if "n_init" in stats:
+            note += f" ({stats['n_init']} of {BUDGET_MAX_INIT} restarts within the {stats['budget_seconds']:g}s budget)"
+        if stats["excluded_fraction"]:
+            parts = [
+                f"{label} {stats[key] / stats['masked_pixels']:.0%}"
+                for label, key in (("transparent", "transparent_pixels"), ("background", "background_pixels"))
+                if stats[key]
+            ]
+            note += f" · excluded {stats['excluded_fraction']:.0%} of pixels ({', '.join(parts)})"
+        use_palette_tree(tree, note)
+    elif job.status == "failed":
+        st.session_state.extraction_error = job.error
+
+def finish_animation(job):
+    """Keep a finished animation job's palette and timeline, or remember its error"""
+    if job.status == "done":
+        st.session_state.animation = job.result
+        st.session_state.animation_key = job.key
+    elif job.status == "failed":
+        st.session_state.animation_error = job.error
+
+def finish_tile_map(job):
+    """Keep a finished tile mapping job's result, or remember its error"""
+    if job.status == "done":
+        st.session_state.tile_map = job.result
+        st.session_state.tile_map_key = job.key
+    elif job.status == "failed":
+        st.session_state.tile_map_error = job.error
+
+@st.fragment(run_every=EXTRACTION_POLL_SECONDS)
+def job_progress(owner, on_finish):
+    """Poll a background job until it finishes, then hand it to on_finish and redraw the page"""
+    jobs = get_job_queue()
+    job = jobs.get(owner)
+    if job is None:
+        return
+    
+    if job.active:
+        if job.cancelled:
+            # Cancelled jobs stop at their next stage or chunk boundary
+            st.progress(job.progress, text="Cancelling...")
+            return
+        label = EXTRACTION_STAGE_LABELS.get(job.stage, "Waiting for a free worker...")
+        st.progress(job.progress, text=label)
+        if st.button("Cancel", key=f"cancel_{owner}", use_container_width=True):
+            jobs.cancel(owner)
+        return
+    
+    jobs.discard(owner)
+    on_finish(job)
+    # Redraw the whole page with the result (or without the progress bar)
+    st.rerun()
+
+def select_color(index):
+    """Button callback: highlight a palette color and open its Harmony Playground"""
+    st.session_state.selected_color_index = index
+
+@st.fragment
+def palette_playground():
+    """Palette grid, color selection and Harmony Playground
+
+    Runs as a fragment: picking a color or toggling a harmony redraws only
+    this section instead of the whole page.
+    """
+    # The whole grid is one HTML element, rebuilt only when the palette or selection changes
+    colors = st.session_state.extracted_colors
+    palette_rgb = np.array([color for color, _ in colors], dtype=np.float64).astype(np.int64)
+    palette_names = [COLOR_NAMES[n] for n in get_color_name_index_array(palette_rgb)]
+    with palette_metrics.stage("render.grid", colors=len(colors)):
+        st.markdown(
+            palette_grid_html(tuple(map(tuple, palette_rgb.tolist())), st.session_state.selected_color_index),
+            unsafe_allow_html=True
+        )
     
-    .export-button:hover {
-        background: #0066aa;
-    }
+    # Color selection buttons (fallback for when JavaScript doesn't work)
+    st.markdown("**Select a color to explore harmonies:**")
     
-    /* Dividers */
-    .section-divider {
-        height: 1px;
-        background: linear-gradient(to right, transparent, #d0d0d0, transparent);
-        margin: 4rem 0;
-    }
+    cols = st.columns(len(colors))
+    for i, color_name in enumerate(palette_names):
+        with cols[i]:
+            # The callback runs before this fragment redraws, so the grid shows the new selection
+            st.button(f"Select {color_name}", key=f"select_{i}", on_click=select_color, args=(i,))
     
-    /* Responsive - Mobile Optimized */
-    @media (max-width: 768px) {
-        .color-grid {
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 3rem;
-        }
-        
-        .brand-title {
-            font-size: 3rem !important;
-            margin-bottom: 1rem !important;
-            margin-top: 0.5rem !important;
-            white-space: nowrap !important;
-        }
-        
-        .brand-subtitle {
-            font-size: 1.1rem !important;
-            margin-bottom: 3rem !important;
-            margin-top: -20px !important;
-        }
-        
-        .section-header {
-            font-size: 2rem !important;
-            margin: 3rem 0 2rem 0 !important;
-        }
-        
-        .color-swatch {
-            width: 160px !important;
-            height: 160px !important;
-            margin: 0 auto 2rem auto !important;
-        }
-        
-        .color-name {
-            font-size: 1.6rem !important;
-            margin-bottom: 1rem !important;
-        }
-        
-        .color-values {
-            font-size: 1.2rem !important;
-            line-height: 1.8 !important;
-        }
-        
-        .tints-strip {
-            margin: 1.5rem 0 !important;
-        }
-        
-        .tint-swatch {
-            width: 80px !important;
-            height: 300px !important;
-        }
-        
-        .tint-label {
-            font-size: 1rem !important;
-            bottom: 12px !important;
-        }
-        
-        .harmony-mini {
-            width: 70px !important;
-            height: 70px !important;
-        }
-        
-        .harmony-hex {
-            font-size: 1rem !important;
-        }
-        
-        .harmony-title {
-            font-size: 1.4rem !important;
-            margin-bottom: 1.5rem !important;
-        }
-        
-        .main .block-container {
-            padding: 0.5rem 1rem 2rem 1rem !important;
-        }
+    # Harmony Playground
+    if st.session_state.selected_color_index is not None:
+        selected_color, _ = st.session_state.extracted_colors[st.session_state.selected_color_index]
+        r, g, b = [int(c) for c in selected_color]
+        color_name = get_color_name((r, g, b))
         
-        /* Make buttons bigger on mobile */
-        .stButton > button {
-            font-size: 1.2rem !important;
-            padding: 1rem 2rem !important;
-            min-height: 3rem !important;
-        }
+        st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="section-header">Harmony Playground - {color_name}</div>', unsafe_allow_html=True)
         
-        /* Bigger file uploader on mobile */
-        .stFileUploader {
-            font-size: 1.1rem !important;
-        }
+        # Harmony controls
+        col1, col2, col3 = st.columns([1, 1, 1])
         
-        .stFileUploader label {
-            font-size: 1.3rem !important;
-        }
+        with col1:
+            show_complementary = st.checkbox("Complementary", value=True)
+        with col2:
+            show_analogous = st.checkbox("Analogous (±30°)", value=True)
+        with col3:
+            show_triadic = st.checkbox("Triadic (±120°)", value=True)
         
-        .stFileUploader > div {
-            padding: 3rem 1rem !important;
-        }
+        # All shown harmonies as one HTML element
+        harmony_types = [
+            harmony_type for harmony_type, shown in [
+                ("complementary", show_complementary),
+                ("analogous", show_analogous),
+                ("triadic", show_triadic),
+            ] if shown
+        ]
+        if harmony_types:
+            with palette_metrics.stage("render.harmony", harmonies=len(harmony_types)):
+                st.markdown(harmony_tray_html((r, g, b), harmony_types), unsafe_allow_html=True)
         
-        /* Bigger slider on mobile */
-        .stSlider label {
-            font-size: 1.3rem !important;
-        }
-    }
-    
-    /* Form styling */
-    .stSelectbox > div > div {
-        border: 1px solid #d0d0d0;
-        border-radius: 8px;
-        background: white;
-    }
-    
-    /* Simple slider styling */
-    .stSlider {
-        text-align: center;
-    }
-    
-    .stSlider > div {
-        max-width: 600px;
-        margin: 0 auto;
-    }
-    
-    .stSlider label {
-        font-family: 'Inter', sans-serif !important;
-        font-size: 1rem !important;
-        font-weight: 400 !important;
-        color: #333 !important;
-    }
-    
-    .stFileUploader {
-        background: transparent;
-    }
-    
-    .stFileUploader > div {
-        border: 2px dashed #007acc !important;
-        background: #f8fafe !important;
-        border-radius: 12px !important;
-        padding: 2rem !important;
-        text-align: center !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stFileUploader > div:hover {
-        border-color: #0066aa !important;
-        background: #f0f7ff !important;
-    }
-    
-    .stFileUploader label {
-        font-weight: 500 !important;
-        color: #007acc !important;
-        font-size: 1.1rem !important;
-    }
-    
-    .stFileUploader button {
-        border-radius: 0 !important;
-    }
-    
-    /* Make the X button 2X larger */
-    .stFileUploader button[title="Remove file"] {
-        font-size: 2rem !important;
-        width: 2rem !important;
-        height: 2rem !important;
-        border-radius: 0 !important;
-    }
-    
-    .stFileUploader button[title="Remove file"] svg {
-        width: 1.5rem !important;
-        height: 1.5rem !important;
-    }
-    
-    /* Button styling - square corners */
-    .stButton > button {
-        border-radius: 0 !important;
-        border: 1px solid #d0d0d0 !important;
-        background: white !important;
-        color: #333 !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 400 !important;
-        transition: all 0.2s ease !important;
-    }
-    
-    .stButton > button:hover {
-        border-color: #d65745 !important;
-        background: #faf8f7 !important;
-    }
-    
-    .stButton > button:focus {
-        border-color: #d65745 !important;
-        box-shadow: 0 0 0 2px rgba(214, 87, 69, 0.2) !important;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Color math and helper functions
-def rgb_to_hex(rgb):
-    """Convert RGB tuple to hex string"""
-    return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
-
-def hex_to_rgb(hex_color):
-    """Convert hex string to RGB tuple"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-
-def rgb_to_cmyk(r, g, b):
-    """Convert RGB values to CMYK"""
-    if r == 0 and g == 0 and b == 0:
-        return 0, 0, 0, 100
-    
-    # Normalize RGB values to 0-1 range
-    r_norm = r / 255.0
-    g_norm = g / 255.0 
-    b_norm = b / 255.0
-    
-    # Calculate K (black)
-    k = 1 - max(r_norm, g_norm, b_norm)
-    
-    # Calculate CMY
-    c = (1 - r_norm - k) / (1 - k) if (1 - k) != 0 else 0
-    m = (1 - g_norm - k) / (1 - k) if (1 - k) != 0 else 0
-    y = (1 - b_norm - k) / (1 - k) if (1 - k) != 0 else 0
-    
-    # Convert to percentages
-    return round(c * 100), round(m * 100), round(y * 100), round(k * 100)
+        # Export Harmony button
+        if st.button("Export Harmony (JSON)", key="export_harmony"):
+            harmony_data = harmony_to_dict((r, g, b), harmony_types)
+            
+            st.download_button(
+                "Download Harmony JSON",
+                json.dumps(harmony_data, indent=2),
+                file_name=f"wild_pick_2_harmony_{color_name.lower()}.json",
+                mime="application/json"
+            )
 
-def get_color_name(rgb):
-    """Get approximate color name based on RGB values"""
-    r, g, b = rgb
-    
-    # Convert to HSV for better color classification
-    h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
-    h *= 360
-    s *= 100
-    v *= 100
-    
-    if v < 20:
-        return "Black"
-    elif v > 80 and s < 20:
-        return "White"
-    elif s < 20:
-        return "Gray"
-    elif h < 15 or h > 345:
-        return "Red"
-    elif h < 45:
-        return "Orange"
-    elif h < 75:
-        return "Yellow"
-    elif h < 150:
-        return "Green"
-    elif h < 210:
-        return "Cyan"
-    elif h < 270:
-        return "Blue"
-    elif h < 330:
-        return "Purple"
-    else:
-        return "Pink"
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+def export_artifact(palette_key, export_format, _colors, _open_image):
+    """One export's bytes, built on its first download and cached per palette
 
-def create_tint(rgb, percentage):
-    """Create a tint (lighter version) of a color"""
-    r, g, b = rgb
-    # Mix with white
-    factor = percentage / 100
-    new_r = r + (255 - r) * (1 - factor)
-    new_g = g + (255 - g) * (1 - factor)
-    new_b = b + (255 - b) * (1 - factor)
-    return (int(new_r), int(new_g), int(new_b))
+    palette_key identifies the palette and source image; the underscored
+    arguments are not hashed. _open_image returns the upload's original
+    bytes as a file (only the PDF reads it). The ZIP bundle reuses the
+    cached formats.
+    """
+    if export_format == BUNDLE_FORMAT:
+        buffer = io.BytesIO()
+        write_zip_bundle(buffer, (
+            (EXPORT_FORMATS[member][0], export_artifact(palette_key, member, _colors, _open_image))
+            for member in bundle_formats()
+        ))
+        return buffer.getvalue()
+    return export_palette(_colors, export_format, _open_image() if export_format == "PDF Report" else None)
 
-def create_color_harmony(base_color, harmony_type="complementary"):
-    """Generate color harmony based on a base color"""
-    r, g, b = base_color
-    h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
-    
-    harmonies = []
+@st.fragment
+def export_panel():
+    """Export format picker and download; changing the format reruns only this section"""
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-header">Export Your Palette</div>', unsafe_allow_html=True)
     
-    if harmony_type == "complementary":
-        # Complementary color (180 degrees opposite)
-        comp_h = (h + 0.5) % 1.0
-        comp_r, comp_g, comp_b = colorsys.hsv_to_rgb(comp_h, s, v)
-        harmonies.append((int(comp_r*255), int(comp_g*255), int(comp_b*255)))
-        
-    elif harmony_type == "triadic":
-        # Triadic colors (120 degrees apart)
-        for offset in [1/3, 2/3]:
-            tri_h = (h + offset) % 1.0
-            tri_r, tri_g, tri_b = colorsys.hsv_to_rgb(tri_h, s, v)
-            harmonies.append((int(tri_r*255), int(tri_g*255), int(tri_b*255)))
-            
-    elif harmony_type == "analogous":
-        # Analogous colors (30 degrees apart)
-        for offset in [-30/360, 30/360]:
-            ana_h = (h + offset) % 1.0
-            ana_r, ana_g, ana_b = colorsys.hsv_to_rgb(ana_h, s, v)
-            harmonies.append((int(ana_r*255), int(ana_g*255), int(ana_b*255)))
-    
-    return harmonies
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        export_format = st.selectbox(
+            "Choose Export Format",
+            list(EXPORT_FORMATS) + [BUNDLE_FORMAT],
+            help="Select the format for exporting your color palette"
+        )
+        
+        if export_format == "PDF Report" and not REPORTLAB_AVAILABLE:
+            # Fallback if reportlab not available
+            st.error("PDF generation requires the 'reportlab' library. Install with: pip install reportlab")
+            st.info("Alternatively, use JSON or Text List export formats.")
+            return
+        
+        colors = st.session_state.extracted_colors
+        palette_key = f"{palette_digest(colors)}-{st.session_state.uploaded_digest}"
+        file_name, mime = BUNDLE_FILE if export_format == BUNDLE_FORMAT else EXPORT_FORMATS[export_format]
+        # The file is built on a download thread when clicked (not during the rerun), then served from cache
+        st.download_button(
+            "Download Palette",
+            partial(
+                export_artifact, palette_key, export_format, colors,
+                partial(get_image_store().open, st.session_state.uploaded_digest)
+            ),
+            file_name=file_name,
+            mime=mime,
+            type="primary",
+            use_container_width=True,
+            on_click="ignore"
+        )
 
-def extract_colors_kmeans(image, n_colors=5):
-    """Extract dominant colors using K-means clustering"""
-    # Convert image to RGB array
-    img_array = np.array(image.convert('RGB'))
-    img_array = img_array.reshape((-1, 3))
-    
-    # Apply K-means clustering
-    kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
-    kmeans.fit(img_array)
-    
-    colors = kmeans.cluster_centers_
-    
-    # Get the percentage of each color
-    labels = kmeans.labels_
-    label_counts = np.bincount(labels)
-    percentages = label_counts / len(labels) * 100
-    
-    # Sort by percentage (most dominant first)
-    sorted_indices = np.argsort(percentages)[::-1]
-    
-    return [(colors[i], percentages[i]) for i in sorted_indices]
+def metrics_debug_panel():
+    """Stage timings and shared resource usage for this server process (shown with ?debug=1)"""
+    with st.expander("Debug: Pipeline Metrics"):
+        st.caption("Totals since the server started, across all sessions")
+        st.dataframe(palette_metrics.snapshot(), use_container_width=True, hide_index=True)
+        st.markdown("**Recent stages**")
+        st.dataframe(palette_metrics.recent_events(30), use_container_width=True, hide_index=True)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown("**Image store**")
+            st.json(get_image_store().stats())
+        with col2:
+            st.markdown("**Palette cache**")
+            st.json(get_palette_cache().stats())
+            st.markdown("**Near-duplicate index**")
+            st.json(get_palette_index().stats())
+        with col3:
+            st.markdown("**Extraction jobs**")
+            st.json(get_job_queue().stats())
 
-def extract_colors_colorthief(image, n_colors=5):
-    """Extract colors using ColorThief library"""
-    if not COLORTHIEF_AVAILABLE:
-        return []
-    
-    # Save image temporarily
-    temp_buffer = io.BytesIO()
-    image.convert('RGB').save(temp_buffer, format='JPEG')
-    temp_buffer.seek(0)
-    
-    try:
-        color_thief = ColorThief(temp_buffer)
-        palette = color_thief.get_palette(color_count=n_colors, quality=1)
-        
-        # Calculate approximate percentages (ColorThief doesn't provide this)
-        # We'll use a simple approach based on order
-        total = sum(range(1, len(palette) + 1))
-        percentages = [(len(palette) - i) / total * 100 for i in range(len(palette))]
-        
-        return [(color, percentages[i]) for i, color in enumerate(palette)]
-    except:
-        return []
+page_start = time.perf_counter()
 
 # Initialize session state
-if 'uploaded_image' not in st.session_state:
-    st.session_state.uploaded_image = None
+if 'uploaded_file_id' not in st.session_state:
+    st.session_state.uploaded_file_id = None
+if 'uploaded_digest' not in st.session_state:
+    st.session_state.uploaded_digest = None
+if 'session_key' not in st.session_state:
+    st.session_state.session_key = uuid.uuid4().hex
+if 'palette_tree' not in st.session_state:
+    st.session_state.palette_tree = None
+if 'uploaded_frames' not in st.session_state:
+    st.session_state.uploaded_frames = 1
+if 'animation' not in st.session_state:
+    st.session_state.animation = None
+    st.session_state.animation_key = None
+if 'tile_map' not in st.session_state:
+    st.session_state.tile_map = None
+    st.session_state.tile_map_key = None
 if 'extracted_colors' not in st.session_state:
     st.session_state.extracted_colors = []
 if 'selected_color_index' not in st.session_state:
@@ -644,18 +446,33 @@ st.markdown('<p class="brand-subtitle">Your Color Palette Explorer</p>', unsafe_
 # Upload section (no title)
 uploaded_file = st.file_uploader(
     "Upload or Browse Images",
-    type=['png', 'jpg', 'jpeg', 'webp'],
-    help="Drag & drop an image here or click to browse your files. Supports PNG, JPG, JPEG, WEBP formats."
+    type=['png', 'apng', 'jpg', 'jpeg', 'webp', 'gif'],
+    help="Drag & drop an image here or click to browse your files. Supports PNG, JPG, JPEG, WEBP and GIF, including animated GIF, APNG and WebP."
 )
 
 if uploaded_file is not None:
-    # Load and display image
-    image = Image.open(uploaded_file)
-    st.session_state.uploaded_image = image
-    
+    # Decode once per upload, straight to the working resolution
+    if st.session_state.uploaded_file_id != uploaded_file.file_id:
+        # A new upload supersedes any extraction still running for the old one
+        get_job_queue().cancel(st.session_state.session_key)
+        get_job_queue().cancel(f"{st.session_state.session_key}:tiles")
+        get_job_queue().cancel(f"{st.session_state.session_key}:animation")
+        st.session_state.tile_map = None
+        st.session_state.tile_map_key = None
+        st.session_state.animation = None
+        st.session_state.animation_key = None
+        # The shared store keeps the bytes and working copy; the session keeps only the digest
+        decode_stats = {}
+        st.session_state.uploaded_digest = get_image_store().put(uploaded_file.getvalue(), stats=decode_stats)
+        st.session_state.uploaded_frames = decode_stats["frames"]
+        st.session_state.uploaded_file_id = uploaded_file.file_id
+
+uploaded_image = session_image(uploaded_file)
+
+if uploaded_file is not None:
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        st.image(image, caption=f"Uploaded: {uploaded_file.name}", use_container_width=True)
+        st.image(uploaded_image, caption=f"Uploaded: {uploaded_file.name}", use_container_width=True)
 
 # Extraction controls (simplified and centered)
 col1, col2, col3 = st.columns([1, 2, 1])
@@ -666,400 +483,216 @@ with col1:
 with col2:
     # Centered slider
     num_colors = st.slider("Number of Colors", 3, 12, 6)
+    color_space = st.selectbox(
+        "Clustering Space",
+        COLOR_SPACES,
+        format_func=COLOR_SPACE_LABELS.get,
+        help="Perceptual spaces group colors the way the eye sees them: fewer near-identical darks, more distinct light tones"
+    )
+    exclude_background = st.checkbox(
+        "Ignore Flat Background",
+        help="Leave out the solid color around the edges (e.g. a logo's white backdrop); transparent pixels are always left out"
+    )
     
     # Add some spacing
     st.write("")
     
     # Extract Colors button - always visible but only functional with image
-    button_disabled = st.session_state.uploaded_image is None
+    button_disabled = uploaded_image is None
     button_text = "Extract Colors" if not button_disabled else "Upload Image First"
     
+    cache = get_palette_cache()
+    jobs = get_job_queue()
+    cache_key = None
+    palette_method = f"{PALETTE_METHOD}-{color_space}" + ("-no-background" if exclude_background else "")
+    if uploaded_image is not None:
+        # One tree holds every palette size, so the key does not depend on num_colors
+        cache_key = make_digest_key(st.session_state.uploaded_digest, PALETTE_TREE_MAX_COLORS, palette_method)
+    
+    # Switching the clustering space or background option supersedes a running extraction
+    job = jobs.get(st.session_state.session_key)
+    if job is not None and job.active and job.key != cache_key:
+        jobs.cancel(st.session_state.session_key)
+    
     if st.button(button_text, type="primary", use_container_width=True, disabled=button_disabled):
-        if st.session_state.uploaded_image:
-            with st.spinner("Extracting colors..."):
-                # Always use K-Means Clustering (default method)
-                colors = extract_colors_kmeans(st.session_state.uploaded_image, num_colors)
-                
-                st.session_state.extracted_colors = colors
-                st.session_state.selected_color_index = None
-                st.session_state.expanded_harmony = {}
-                st.success(f"✓ Extracted {len(colors)} colors")
+        if uploaded_image is not None:
+            tree = cache.get_palette_tree(cache_key)
+            note = "Served from palette cache"
+            if tree is None:
+                # A resized or re-compressed copy of an earlier upload reuses its palette tree
+                index = get_palette_index()
+                fingerprint = image_fingerprint(uploaded_image)
+                match = index.lookup(fingerprint, palette_method)
+                if match is not None:
+                    payload, distance = match
+                    tree = palette_tree_from_payload(payload)
+                    cache.put_palette_tree(cache_key, tree)
+                    note = f"Served from a near-duplicate upload ({distance} of {HASH_BITS} hash bits differ)"
+            if tree is not None:
+                use_palette_tree(tree, note)
+            else:
+                try:
+                    jobs.submit(
+                        st.session_state.session_key, cache_key, extract_palette_tree,
+                        cache, cache_key, uploaded_image, color_space,
+                        get_image_store().get_alpha(st.session_state.uploaded_digest), exclude_background,
+                        index, fingerprint, palette_method
+                    )
+                except QueueFull:
+                    st.warning("The server is busy extracting other palettes. Please try again in a moment.")
+    
+    if jobs.get(st.session_state.session_key) is not None:
+        job_progress(st.session_state.session_key, finish_extraction)
+    
+    extraction_error = st.session_state.pop("extraction_error", None)
+    if extraction_error:
+        st.error(f"Color extraction failed: {extraction_error}")
 
 with col3:
     st.write("")  # Empty space for balance
 
-# Core Colors section
-if st.session_state.extracted_colors:
-    st.markdown('<div class="section-header">Your Image Palette</div>', unsafe_allow_html=True)
-    
-    # Display color grid using Streamlit columns
-    cols_per_row = 3
-    colors = st.session_state.extracted_colors
-    
-    for i in range(0, len(colors), cols_per_row):
-        cols = st.columns(cols_per_row)
-        
-        for j in range(cols_per_row):
-            if i + j < len(colors):
-                color, percentage = colors[i + j]
-                r, g, b = [int(c) for c in color]
-                hex_color = rgb_to_hex((r, g, b))
-                color_name = get_color_name((r, g, b))
-                c, m, y, k = rgb_to_cmyk(r, g, b)
-                
-                # Create tints
-                tint_75 = create_tint((r, g, b), 75)
-                tint_50 = create_tint((r, g, b), 50)
-                
-                selected_class = "selected" if st.session_state.selected_color_index == (i + j) else ""
-                
-                with cols[j]:
-                    # Color swatch container
-                    st.markdown(f'''
-                    <div class="color-swatch-container">
-                        <div class="color-swatch {selected_class}" style="background-color: {hex_color};"></div>
-                        <div class="color-name">{color_name}</div>
-                        <div class="color-values">
-                            CMYK: {c}, {m}, {y}, {k}<br>
-                            RGB: {r}, {g}, {b}<br>
-                            HEX: {hex_color}
-                        </div>
-                        <div class="tints-strip">
-                            <div class="tint-swatch" style="background-color: {hex_color};">
-                                <div class="tint-label">100%</div>
-                            </div>
-                            <div class="tint-swatch" style="background-color: {rgb_to_hex(tint_75)};">
-                                <div class="tint-label">75%</div>
-                            </div>
-                            <div class="tint-swatch" style="background-color: {rgb_to_hex(tint_50)};">
-                                <div class="tint-label">50%</div>
-                            </div>
-                        </div>
-                    </div>
-                    ''', unsafe_allow_html=True)
-    
-    # Color selection buttons (fallback for when JavaScript doesn't work)
-    st.markdown("**Select a color to explore harmonies:**")
-    
-    cols = st.columns(len(st.session_state.extracted_colors))
-    for i, (color, percentage) in enumerate(st.session_state.extracted_colors):
-        r, g, b = [int(c) for c in color]
-        color_name = get_color_name((r, g, b))
-        
-        with cols[i]:
-            if st.button(f"Select {color_name}", key=f"select_{i}"):
-                st.session_state.selected_color_index = i
-                st.rerun()
-    
-    # Harmony Playground
-    if st.session_state.selected_color_index is not None:
-        selected_color, _ = st.session_state.extracted_colors[st.session_state.selected_color_index]
-        r, g, b = [int(c) for c in selected_color]
-        hex_color = rgb_to_hex((r, g, b))
-        color_name = get_color_name((r, g, b))
-        
-        st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="section-header">Harmony Playground - {color_name}</div>', unsafe_allow_html=True)
-        
-        # Harmony controls
-        col1, col2, col3 = st.columns([1, 1, 1])
-        
-        with col1:
-            show_complementary = st.checkbox("Complementary", value=True)
-        with col2:
-            show_analogous = st.checkbox("Analogous (±30°)", value=True)
-        with col3:
-            show_triadic = st.checkbox("Triadic (±120°)", value=True)
-        
-        # Display harmonies using Streamlit components
-        st.markdown('<div class="harmony-tray expanded">', unsafe_allow_html=True)
-        
-        if show_complementary:
-            complementary = create_color_harmony((r, g, b), "complementary")
-            st.markdown('<div class="harmony-group">', unsafe_allow_html=True)
-            st.markdown('<div class="harmony-title">Complementary</div>', unsafe_allow_html=True)
-            
-            harmony_cols = st.columns([1, 3, 1])
-            with harmony_cols[1]:
-                comp_cols = st.columns(len(complementary))
-                for i, comp_color in enumerate(complementary):
-                    comp_hex = rgb_to_hex(comp_color)
-                    with comp_cols[i]:
-                        st.markdown(f'''
-                        <div style="text-align: center;">
-                            <div class="harmony-mini" style="background-color: {comp_hex}; margin: 0 auto;"></div>
-                            <span class="harmony-hex">{comp_hex}</span>
-                        </div>
-                        ''', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        if show_analogous:
-            analogous = create_color_harmony((r, g, b), "analogous")
-            st.markdown('<div class="harmony-group">', unsafe_allow_html=True)
-            st.markdown('<div class="harmony-title">Analogous</div>', unsafe_allow_html=True)
-            
-            harmony_cols = st.columns([1, 3, 1])
-            with harmony_cols[1]:
-                ana_cols = st.columns(len(analogous))
-                for i, ana_color in enumerate(analogous):
-                    ana_hex = rgb_to_hex(ana_color)
-                    with ana_cols[i]:
-                        st.markdown(f'''
-                        <div style="text-align: center;">
-                            <div class="harmony-mini" style="background-color: {ana_hex}; margin: 0 auto;"></div>
-                            <span class="harmony-hex">{ana_hex}</span>
-                        </div>
-                        ''', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        if show_triadic:
-            triadic = create_color_harmony((r, g, b), "triadic")
-            st.markdown('<div class="harmony-group">', unsafe_allow_html=True)
-            st.markdown('<div class="harmony-title">Triadic</div>', unsafe_allow_html=True)
+# Moving the slider after an extraction is just a lookup in the palette tree
+if st.session_state.palette_tree is not None:
+    tree_colors = palette_from_tree(st.session_state.palette_tree, num_colors)
+    if len(tree_colors) != len(st.session_state.extracted_colors):
+        st.session_state.extracted_colors = tree_colors
+        st.session_state.selected_color_index = None
+        st.session_state.expanded_harmony = {}
+
+# Report the extraction that produced this palette once, right after it lands
+extraction_note = st.session_state.pop("extraction_note", None)
+if extraction_note and st.session_state.extracted_colors:
+    cache_stats = cache.stats()
+    with col2:
+        st.success(f"✓ Extracted {len(st.session_state.extracted_colors)} colors")
+        st.caption(
+            f"{extraction_note} · cache hits {cache_stats['hits'] + cache_stats['disk_hits']}, "
+            f"misses {cache_stats['misses']}"
+        )
+
+# Animated uploads: the palette across all frames and how it changes over time
+if uploaded_file is not None and st.session_state.uploaded_frames > 1:
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        with st.expander(f"Animated upload: {st.session_state.uploaded_frames} frames", expanded=True):
+            frame_col1, frame_col2 = st.columns(2)
+            with frame_col1:
+                frame_step = st.number_input("Use Every Nth Frame", 1, 50, 1)
+            with frame_col2:
+                max_frames = st.number_input("Frame Budget", 1, ANIMATION_MAX_FRAMES, min(60, ANIMATION_MAX_FRAMES))
             
-            harmony_cols = st.columns([1, 3, 1])
-            with harmony_cols[1]:
-                tri_cols = st.columns(len(triadic))
-                for i, tri_color in enumerate(triadic):
-                    tri_hex = rgb_to_hex(tri_color)
-                    with tri_cols[i]:
-                        st.markdown(f'''
-                        <div style="text-align: center;">
-                            <div class="harmony-mini" style="background-color: {tri_hex}; margin: 0 auto;"></div>
-                            <span class="harmony-hex">{tri_hex}</span>
-                        </div>
-                        ''', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Export Harmony button
-        if st.button("Export Harmony (JSON)", key="export_harmony"):
-            harmony_data = {
-                "base_color": {
-                    "name": color_name,
-                    "hex": hex_color,
-                    "rgb": [r, g, b],
-                    "cmyk": list(rgb_to_cmyk(r, g, b))
-                },
-                "harmonies": {}
-            }
+            animation_owner = f"{st.session_state.session_key}:animation"
+            animation_key = make_digest_key(
+                st.session_state.uploaded_digest, num_colors, f"animation-{frame_step}-{max_frames}-{color_space}"
+            )
             
-            if show_complementary:
-                complementary = create_color_harmony((r, g, b), "complementary")
-                harmony_data["harmonies"]["complementary"] = [
-                    {"hex": rgb_to_hex(c), "rgb": list(c)} for c in complementary
-                ]
+            if st.button("Extract Animation Palette", use_container_width=True) and animation_key != st.session_state.animation_key:
+                try:
+                    jobs.submit(
+                        animation_owner, animation_key, extract_animation_palette,
+                        get_image_store().open(st.session_state.uploaded_digest), num_colors,
+                        frame_step=frame_step, max_frames=max_frames, color_space=color_space
+                    )
+                except QueueFull:
+                    st.warning("The server is busy extracting other palettes. Please try again in a moment.")
             
-            if show_analogous:
-                analogous = create_color_harmony((r, g, b), "analogous")
-                harmony_data["harmonies"]["analogous"] = [
-                    {"hex": rgb_to_hex(c), "rgb": list(c)} for c in analogous
-                ]
+            if jobs.get(animation_owner) is not None:
+                job_progress(animation_owner, finish_animation)
             
-            if show_triadic:
-                triadic = create_color_harmony((r, g, b), "triadic")
-                harmony_data["harmonies"]["triadic"] = [
-                    {"hex": rgb_to_hex(c), "rgb": list(c)} for c in triadic
-                ]
+            animation_error = st.session_state.pop("animation_error", None)
+            if animation_error:
+                st.error(f"Animation extraction failed: {animation_error}")
             
-            st.download_button(
-                "Download Harmony JSON",
-                json.dumps(harmony_data, indent=2),
-                file_name=f"wild_pick_2_harmony_{color_name.lower()}.json",
-                mime="application/json"
-            )
+            animation = st.session_state.animation
+            if animation is not None:
+                st.markdown(f"**All frames** ({animation['sampled_frames']} of {animation['frames']} analysed)")
+                st.markdown(palette_strip_html(animation["palette"]), unsafe_allow_html=True)
+                
+                rows = "".join(
+                    f'<div class="frame-row"><div class="frame-label">Frame {entry["frame"] + 1}'
+                    f' · {entry["duration"]:.0f} ms</div>{palette_strip_html(entry["palette"])}</div>'
+                    for entry in animation["timeline"]
+                )
+                st.markdown(f'<div class="frame-timeline">{rows}</div>', unsafe_allow_html=True)
+                
+                st.download_button(
+                    "Download Animation Palette JSON",
+                    json.dumps(animation_to_dict(animation), indent=2),
+                    file_name="wild_pick_2_animation_palette.json",
+                    mime="application/json",
+                    use_container_width=True
+                )
 
-    # Export Palette Section
-    if st.session_state.extracted_colors:
+# Core Colors section
+if st.session_state.extracted_colors:
+    st.markdown('<div class="section-header">Your Image Palette</div>', unsafe_allow_html=True)
+    
+    palette_playground()
+    
+    # Where Colors Live: a palette per tile, merged into a global palette, with a heatmap per color
+    if uploaded_image is not None:
         st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
-        st.markdown('<div class="section-header">Export Your Palette</div>', unsafe_allow_html=True)
+        st.markdown('<div class="section-header">Where Colors Live</div>', unsafe_allow_html=True)
         
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            export_format = st.selectbox(
-                "Choose Export Format",
-                ["JSON (Complete Data)", "PDF Report", "CSS Variables", "Text List"],
-                help="Select the format for exporting your color palette"
+            tile_grid = st.select_slider(
+                "Tile Grid",
+                options=TILE_GRID_OPTIONS,
+                value=4,
+                format_func=lambda n: f"{n} x {n}",
+                help="Each tile gets its own palette; tile palettes merge into the global one by coverage"
+            )
+            tile_owner = f"{st.session_state.session_key}:tiles"
+            tile_key = make_digest_key(
+                st.session_state.uploaded_digest, num_colors,
+                f"tiles-masked-{tile_grid}x{tile_grid}-{color_space}" + ("-no-background" if exclude_background else "")
             )
             
-            if st.button("Export Palette", type="primary", use_container_width=True):
-                colors = st.session_state.extracted_colors
-                
-                if export_format == "JSON (Complete Data)":
-                    palette_data = {
-                        "palette": [],
-                        "extracted_from": "Wild Pick 2.0",
-                        "timestamp": str(datetime.now())
-                    }
-                    
-                    for color, percentage in colors:
-                        r, g, b = int(color[0]), int(color[1]), int(color[2])
-                        h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
-                        c, m, y, k = rgb_to_cmyk(r, g, b)
-                        
-                        palette_data["palette"].append({
-                            "name": get_color_name(color),
-                            "hex": rgb_to_hex(color),
-                            "rgb": [r, g, b],
-                            "hsv": [int(h*360), int(s*100), int(v*100)],
-                            "cmyk": [c, m, y, k],
-                            "percentage": round(percentage, 1),
-                            "tints": {
-                                "75%": rgb_to_hex(create_tint((r, g, b), 75)),
-                                "50%": rgb_to_hex(create_tint((r, g, b), 50))
-                            }
-                        })
-                    
-                    st.download_button(
-                        "Download JSON",
-                        json.dumps(palette_data, indent=2),
-                        file_name="wild_pick_2_palette.json",
-                        mime="application/json"
-                    )
-                
-                elif export_format == "PDF Report":
-                    try:
-                        from reportlab.lib.pagesizes import letter
-                        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
-                        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                        from reportlab.lib.units import inch
-                        from reportlab.lib import colors as rl_colors
-                        from reportlab.lib.enums import TA_CENTER, TA_LEFT
-                        
-                        # Generate PDF with image and color data
-                        buffer = io.BytesIO()
-                        doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                                              rightMargin=0.7*inch, leftMargin=0.7*inch,
-                                              topMargin=0.8*inch, bottomMargin=0.8*inch)
-                        
-                        styles = getSampleStyleSheet()
-                        title_style = ParagraphStyle(
-                            'CustomTitle',
-                            parent=styles['Heading1'],
-                            fontSize=24,
-                            spaceAfter=30,
-                            alignment=TA_CENTER,
-                            fontName='Helvetica-Bold'
-                        )
-                        
-                        story = []
-                        story.append(Paragraph("Wild Pick 2.0", title_style))
-                        story.append(Paragraph("Color Palette Analysis Report", styles['Normal']))
-                        story.append(Spacer(1, 20))
-                        
-                        # Add source image if available
-                        if st.session_state.uploaded_image:
-                            story.append(Paragraph("Source Image", styles['Heading2']))
-                            img_buffer = io.BytesIO()
-                            img_copy = st.session_state.uploaded_image.copy()
-                            img_copy.thumbnail((400, 300), Image.Resampling.LANCZOS)
-                            img_copy.save(img_buffer, format='PNG')
-                            img_buffer.seek(0)
-                            
-                            img = RLImage(img_buffer, width=400, height=300)
-                            story.append(img)
-                            story.append(Spacer(1, 20))
-                        
-                        # Color palette table
-                        story.append(Paragraph("Extracted Color Palette", styles['Heading2']))
-                        story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
-                        story.append(Spacer(1, 15))
-                        
-                        table_data = [['Color', 'Name', 'HEX', 'RGB', 'CMYK', 'Coverage', 'Tints']]
-                        
-                        for color, percentage in colors:
-                            r, g, b = int(color[0]), int(color[1]), int(color[2])
-                            hex_color = rgb_to_hex(color)
-                            color_name = get_color_name(color)
-                            c, m, y, k = rgb_to_cmyk(r, g, b)
-                            tint_75 = rgb_to_hex(create_tint((r, g, b), 75))
-                            tint_50 = rgb_to_hex(create_tint((r, g, b), 50))
-                            
-                            color_cell = f'<font color="{hex_color}">●●●●●</font>'
-                            
-                            table_data.append([
-                                Paragraph(color_cell, styles['Normal']),
-                                color_name,
-                                hex_color,
-                                f"rgb({r}, {g}, {b})",
-                                f"cmyk({c}%, {m}%, {y}%, {k}%)",
-                                f"{percentage:.1f}%",
-                                f"75%: {tint_75}\n50%: {tint_50}"
-                            ])
-                        
-                        table = Table(table_data, colWidths=[0.8*inch, 0.8*inch, 0.8*inch, 1.2*inch, 1.4*inch, 0.6*inch, 1.4*inch])
-                        table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 0), rl_colors.grey),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), rl_colors.whitesmoke),
-                            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('FONTSIZE', (0, 0), (-1, 0), 9),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 1), (-1, -1), rl_colors.beige),
-                            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                            ('FONTSIZE', (0, 1), (-1, -1), 8),
-                            ('GRID', (0, 0), (-1, -1), 1, rl_colors.black),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                        ]))
-                        
-                        story.append(table)
-                        story.append(Spacer(1, 20))
-                        
-                        # Footer
-                        story.append(Paragraph("Generated by Wild Pick 2.0 - Your Color Palette Explorer", styles['Normal']))
-                        
-                        doc.build(story)
-                        buffer.seek(0)
-                        
-                        st.download_button(
-                            "Download PDF Report",
-                            buffer.getvalue(),
-                            file_name="wild_pick_2_palette_report.pdf",
-                            mime="application/pdf"
-                        )
-                    except ImportError:
-                        # Fallback if reportlab not available
-                        st.error("PDF generation requires the 'reportlab' library. Install with: pip install reportlab")
-                        st.info("Alternatively, use JSON or Text List export formats.")
-                
-                elif export_format == "CSS Variables":
-                    css_vars = ":root {\n"
-                    for i, (color, _) in enumerate(colors):
-                        color_name = get_color_name(color).lower()
-                        css_vars += f"  --color-{color_name}-{i+1}: {rgb_to_hex(color)};\n"
-                        # Add tints
-                        css_vars += f"  --color-{color_name}-{i+1}-75: {rgb_to_hex(create_tint(color, 75))};\n"
-                        css_vars += f"  --color-{color_name}-{i+1}-50: {rgb_to_hex(create_tint(color, 50))};\n"
-                    css_vars += "}"
-                    
-                    st.download_button(
-                        "Download CSS",
-                        css_vars,
-                        file_name="wild_pick_2_palette.css",
-                        mime="text/css"
-                    )
-                
-                elif export_format == "Text List":
-                    text_list = "Wild Pick 2.0 - Color Palette\n"
-                    text_list += "=" * 30 + "\n\n"
-                    
-                    for i, (color, percentage) in enumerate(colors, 1):
-                        r, g, b = int(color[0]), int(color[1]), int(color[2])
-                        hex_color = rgb_to_hex(color)
-                        color_name = get_color_name(color)
-                        
-                        text_list += f"{i}. {color_name}\n"
-                        text_list += f"   {hex_color}\n"
-                        text_list += f"   RGB({r}, {g}, {b})\n"
-                        text_list += f"   {percentage:.1f}% coverage\n\n"
-                    
-                    st.download_button(
-                        "Download Text List",
-                        text_list,
-                        file_name="wild_pick_2_palette.txt",
-                        mime="text/plain"
+            if st.button("Map Colors by Tile", use_container_width=True) and tile_key != st.session_state.tile_map_key:
+                try:
+                    # Same pixels as the global palette: transparent (and, when ignored, background) pixels are left out
+                    jobs.submit(
+                        tile_owner, tile_key, extract_tile_palettes,
+                        uploaded_image, (tile_grid, tile_grid), num_colors, color_space=color_space,
+                        alpha=get_image_store().get_alpha(st.session_state.uploaded_digest),
+                        exclude_background=exclude_background
                     )
+                except QueueFull:
+                    st.warning("The server is busy extracting other palettes. Please try again in a moment.")
+            
+            if jobs.get(tile_owner) is not None:
+                job_progress(tile_owner, finish_tile_map)
+            
+            tile_map_error = st.session_state.pop("tile_map_error", None)
+            if tile_map_error:
+                st.error(f"Tile mapping failed: {tile_map_error}")
+            
+            tile_map = st.session_state.tile_map
+            if tile_map is not None:
+                tile_palette = tile_map["palette"]
+                tile_palette_hex = rgb_to_hex_array(np.array([color for color, _ in tile_palette]))
+                heatmap_index = st.selectbox(
+                    "Show Where This Color Lives",
+                    range(len(tile_palette)),
+                    format_func=lambda i: f"{get_color_name(tile_palette[i][0])} {tile_palette_hex[i]} ({tile_palette[i][1]:.1f}%)"
+                )
+                rows, cols = tile_map["grid"]
+                st.image(
+                    tile_heatmap(uploaded_image, tile_map, heatmap_index),
+                    caption=f"Share of {tile_palette_hex[heatmap_index]} in each of the {rows} x {cols} tiles",
+                    use_container_width=True
+                )
+                st.download_button(
+                    "Download Tile Map JSON",
+                    json.dumps(tile_map_to_dict(tile_map), indent=2),
+                    file_name="wild_pick_2_tile_map.json",
+                    mime="application/json",
+                    use_container_width=True
+                )
+    
+    # Export Palette Section
+    export_panel()
 
 else:
     # Show sample colors when no image is uploaded
@@ -1109,3 +742,11 @@ else:
                 </div>
             </div>
             ''', unsafe_allow_html=True)
+
+# Pipeline metrics: this run's page time, the scrape file and, with ?debug=1, the debug panel
+if palette_metrics.is_enabled():
+    palette_metrics.record("render.page", time.perf_counter() - page_start)
+    if METRICS_FILE:
+        palette_metrics.write_prometheus(METRICS_FILE, min_interval=METRICS_WRITE_SECONDS)
+    if st.query_params.get("debug") == "1":
+        metrics_debug_panel()